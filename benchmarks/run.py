@@ -0,0 +1,413 @@
+"""
+Seed a database and measure the latency of the managers and routes.
+
+Run it from the project directory, e.g.
+
+    python -m benchmarks.run --users 10000 --posts 100000 --output report.json
+    python -m benchmarks.run --baseline report.json
+
+Each benchmark records the latency of every call, and the report lists
+their percentiles in milliseconds. With the same options and seed, the
+reports of two commits can be compared with `--baseline`.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from socialnetwork.core import info
+
+# The report fields compared with `--baseline`.
+COMPARED_FIELDS: tuple[str, ...] = ("p50_ms", "p99_ms")
+
+
+def summarize(durations: list[float]) -> dict[str, float]:
+    """
+    Summarize the durations of a benchmark.
+
+    :param list[float] durations: The duration of each call, in seconds.
+    :return dict[str, float]: The number of calls and the latency percentiles in milliseconds.
+    """
+
+    milliseconds = sorted(duration * 1000 for duration in durations)
+    percentiles = (
+        statistics.quantiles(milliseconds, n=100, method="inclusive")
+        if len(milliseconds) > 1
+        else milliseconds * 99
+    )
+    return {
+        "calls": len(milliseconds),
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+        "p50_ms": round(percentiles[49], 3),
+        "p90_ms": round(percentiles[89], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "max_ms": round(milliseconds[-1], 3),
+    }
+
+
+def measure(function: Callable[[], Any], iterations: int) -> dict[str, float]:
+    """
+    Call a function repeatedly, after one warm-up call.
+
+    :param Callable[[], Any] function: The function to measure.
+    :param int iterations: The number of measured calls.
+    :return dict[str, float]: The summary of the durations.
+    """
+
+    function()
+    durations: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+
+    return summarize(durations)
+
+
+def seed_database(arguments: argparse.Namespace) -> dict[str, Any]:
+    """
+    Fill the benchmark database, unless it already has users.
+
+    :param argparse.Namespace arguments: The command line arguments.
+    :return dict[str, Any]: The size of the database.
+    """
+
+    from socialnetwork.core import bulk, database_manager, user_manager
+
+    database_manager.configure_database()
+    database_manager.DatabaseManager().migrate()
+    database_manager.pool.close_all()
+
+    database = database_manager.ConnectionPool.connect(isolation_level=None)
+    if database.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+        bulk.seed(
+            database,
+            arguments.users,
+            arguments.posts,
+            arguments.friends,
+            user_manager.make_password_record(arguments.password),
+            arguments.seed,
+        )
+        # The first user administers the benchmark.
+        database.execute("UPDATE users SET is_admin = 1 WHERE id = 1")
+
+    size = {
+        table: database.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("users", "posts", "friendships", "timelines")
+    }
+    database.close()
+    return size
+
+
+def run_micro_benchmarks(
+    arguments: argparse.Namespace, user_count: int
+) -> dict[str, dict[str, float]]:
+    """
+    Measure the manager methods, one call at a time.
+
+    :param argparse.Namespace arguments: The command line arguments.
+    :param int user_count: The number of users in the database.
+    :return dict[str, dict[str, float]]: The summary of each benchmark.
+    """
+
+    import socialnetwork
+    from socialnetwork.core import (
+        database_manager,
+        post_manager,
+        trending,
+        user_manager,
+    )
+
+    rng = random.Random(arguments.seed)
+    posts = post_manager.PostManager()
+    users = user_manager.UserManager()
+    iterations = arguments.iterations
+    deep_cursor = post_manager.decode_cursor(
+        post_manager.encode_cursor(posts.get_posts(limit=1000)[-1])
+    )
+
+    admin = socialnetwork.app.test_client()
+    with admin.session_transaction() as session:
+        session.update(logged_in=True, user_id=1, username="user1")
+
+    def friend_add_remove() -> None:
+        user_id1, user_id2 = rng.sample(range(1, user_count + 1), 2)
+        if not users.get_friend_graph().are_friends(user_id1, user_id2):
+            users.friend_add(user_id1, user_id2)
+            users.friend_remove(user_id1, user_id2)
+
+    results = {
+        "get_posts": measure(posts.get_posts, iterations),
+        "get_posts_page_50": measure(
+            lambda: posts.get_posts(cursor=deep_cursor), iterations
+        ),
+        "get_posts_by_user": measure(
+            lambda: posts.get_posts(user_id=rng.randint(1, user_count)), iterations
+        ),
+        "get_posts_filtered": measure(
+            lambda: posts.get_posts(
+                filters=post_manager.PostFilters(
+                    since="2024-01-01",
+                    friends_of=rng.randint(1, user_count),
+                    ascending=True,
+                )
+            ),
+            iterations,
+        ),
+        "get_timeline": measure(
+            lambda: posts.get_timeline(rng.randint(1, user_count)), iterations
+        ),
+        "get_hashtag_posts": measure(
+            lambda: posts.get_hashtag_posts(rng.choice(("coffee", "python", "rain"))),
+            iterations,
+        ),
+        "get_trending": measure(
+            lambda: posts.get_trending(
+                trending.HASHTAG, max(info.Server.trending_windows)
+            ),
+            iterations,
+        ),
+        "search_posts": measure(
+            lambda: posts.search_posts(rng.choice(("coffee", "python", "good day"))),
+            iterations,
+        ),
+        "get_all_users": measure(users.get_all_users, max(iterations // 10, 1)),
+        "get_people": measure(
+            lambda: users.get_people(rng.randint(1, user_count)), iterations
+        ),
+        # Hashing dominates, so this mostly measures `info.Server.password_iterations`.
+        "validate_user": measure(
+            lambda: users.validate_user(
+                f"user{rng.randint(1, user_count)}", arguments.password
+            ),
+            max(iterations // 10, 1),
+        ),
+        "friend_add_remove": measure(friend_add_remove, iterations),
+        "admin_friendship_page": measure(
+            lambda: admin.get("/admin/demo/data/friendship", buffered=True).close(),
+            iterations,
+        ),
+    }
+    database_manager.pool.release()
+    return results
+
+
+def check_query_plans(user_count: int) -> dict[str, list[str]]:
+    """
+    Get the query plan of every combination of newsfeed filters, and warn
+    about those that scan a whole table instead of searching an index.
+
+    :param int user_count: The number of users in the database.
+    :return dict[str, list[str]]: The plan of each combination, keyed by its filters.
+    """
+
+    from socialnetwork.core import database_manager, post_manager
+
+    posts = post_manager.PostManager()
+    options: dict[str, dict[str, Any]] = {
+        "author": {"author": f"user{user_count}"},
+        "since": {"since": "2024-01-01"},
+        "until": {"until": "2024-12-31"},
+        "friends": {"friends_of": 1},
+        "ascending": {"ascending": True},
+        "cursor": {},
+    }
+    plans: dict[str, list[str]] = {}
+    for count in range(len(options) + 1):
+        for names in itertools.combinations(options, count):
+            filters = post_manager.PostFilters(
+                **{key: value for name in names for key, value in options[name].items()}
+            )
+            cursor = ("2024-06-01 00:00:00", 1) if "cursor" in names else None
+            plan = plans[",".join(names) or "none"] = posts.explain_posts(
+                cursor=cursor, filters=filters
+            )
+            # "SCAN posts USING INDEX" reads the index in order and stops at the limit.
+            if any(re.match(r"SCAN \w+$", step) for step in plan):
+                print(f"Full table scan with filters {names}: {plan}", file=sys.stderr)
+
+    database_manager.pool.release()
+    return plans
+
+
+def run_load_test(
+    arguments: argparse.Namespace, user_count: int
+) -> dict[str, dict[str, float]]:
+    """
+    Send concurrent requests through the test client of the app, each
+    thread logged in as a different user.
+
+    :param argparse.Namespace arguments: The command line arguments.
+    :param int user_count: The number of users in the database.
+    :return dict[str, dict[str, float]]: The summary of each route, and of all requests.
+    """
+
+    import socialnetwork
+
+    app = socialnetwork.app
+    routes: tuple[tuple[str, str], ...] = (
+        ("newsfeed", "/"),
+        ("newsfeed_friends", "/?feed=friends"),
+        ("newsfeed_filtered", "/?author=user1&since=2024-01-01&order=asc"),
+        ("search", "/?search=coffee"),
+        ("hashtag", "/?hashtag=python"),
+        ("people", "/people"),
+        ("api_posts", "/api/v1/posts"),
+        ("about", "/about"),
+    )
+    admin_route = ("admin_friendship", "/admin/demo/data/friendship")
+    durations: dict[str, list[float]] = {name: [] for name, _ in (*routes, admin_route)}
+    errors: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        rng = random.Random(arguments.seed + index)
+        client = app.test_client()
+        # Log in through the session, since the login route is rate limited.
+        user_id = 1 if index == 0 else rng.randint(1, user_count)
+        with client.session_transaction() as session:
+            session.update(logged_in=True, user_id=user_id, username=f"user{user_id}")
+
+        # Only the first thread is logged in as the admin.
+        choices = (*routes, admin_route) if index == 0 else routes
+        for _ in range(arguments.requests // arguments.concurrency):
+            name, path = rng.choice(choices)
+            started = time.perf_counter()
+            response = client.get(path, buffered=True)
+            response.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                durations[name].append(elapsed)
+                if response.status_code != 200:
+                    errors[name] = errors.get(name, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=arguments.concurrency) as executor:
+        list(executor.map(worker, range(arguments.concurrency)))
+
+    wall_time = time.perf_counter() - started
+    results = {
+        name: {**summarize(values), "errors": errors.get(name, 0)}
+        for name, values in durations.items()
+        if values
+    }
+    every_duration = [value for values in durations.values() for value in values]
+    results["all"] = {
+        **summarize(every_duration),
+        "errors": sum(errors.values()),
+        "requests_per_second": round(len(every_duration) / wall_time, 1),
+    }
+    return results
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> None:
+    """
+    Print the change of each benchmark from a previous report.
+
+    :param dict[str, Any] report: The new report.
+    :param dict[str, Any] baseline: The previous report.
+    """
+
+    for section in ("micro", "load"):
+        for name, result in report[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if previous is None:
+                continue
+
+            changes = []
+            for field in COMPARED_FIELDS:
+                if previous.get(field):
+                    change = (result[field] - previous[field]) / previous[field] * 100
+                    changes.append(
+                        f"{field} {previous[field]:.2f} -> {result[field]:.2f} ({change:+.0f}%)"
+                    )
+
+            print(f"{section}.{name}: {', '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the managers and routes of the social network.",
+    )
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument(
+        "--friends", type=int, default=5, help="the friendships added per user"
+    )
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    parser.add_argument(
+        "--database",
+        type=Path,
+        help="the database to seed or reuse, defaults to a temporary file",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=200, help="the calls per micro-benchmark"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="the threads of the load test"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="the requests of the load test"
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="compare with this previous JSON report"
+    )
+    arguments = parser.parse_args()
+
+    info.Filepath.database = arguments.database or Path(
+        tempfile.mkdtemp(), "benchmark.db"
+    )
+    size = seed_database(arguments)
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    report = {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "options": {
+            key: value
+            for key, value in vars(arguments).items()
+            if key not in ("database", "output", "baseline")
+        },
+        "size": size,
+        "query_plans": check_query_plans(size["users"]),
+        "micro": run_micro_benchmarks(arguments, size["users"]),
+        "load": run_load_test(arguments, size["users"]),
+    }
+
+    from socialnetwork.core import database_manager, password_hasher
+
+    database_manager.writer.stop()
+    password_hasher.hasher.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if arguments.output is None:
+        print(output)
+
+    else:
+        arguments.output.write_text(output + "\n")
+
+    if arguments.baseline is not None:
+        compare(report, json.loads(arguments.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,37 @@
 import logging
-from time import strftime
-from typing import Final
-
-from flask import Flask, abort, flash, redirect, request, session, url_for
+from functools import partial
+from time import perf_counter, strftime
+from typing import Any, Final, Iterator
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    flash,
+    redirect,
+    request,
+    session,
+    url_for,
+)
 from werkzeug.wrappers import Response as WerkzeugResponse
 
 from flask_session import Session
-from socialnetwork.core import info, post_manager, renderer, user_manager
+from socialnetwork.api import api
+from socialnetwork.core import (
+    assets,
+    cache,
+    compression,
+    database_manager,
+    info,
+    metrics,
+    password_hasher,
+    post_manager,
+    rate_limiter,
+    renderer,
+    session_store,
+    trending,
+    user_manager,
+)
 
 # Set up the logger.
 logger: Final[logging.Logger] = logging.getLogger(__name__)
@@ -26,8 +51,125 @@ app: Final[Flask] = Flask(
 
 # App and extension configuration
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+app.secret_key = info.Server.secret_key
+if info.Server.session_backend == "filesystem":
+    app.config["SESSION_TYPE"] = "filesystem"
+    Session(app)
+
+else:
+    app.session_interface = session_store.get_session_interface()
+
+app.json.compact = True  # type: ignore[attr-defined]
+app.register_blueprint(api)
+assets.manifest.init_app(app)
+
+# Limits the login and registration attempts per username and IP address.
+login_limiter: Final[rate_limiter.RateLimiter] = rate_limiter.RateLimiter(
+    info.Server.login_rate_limit, info.Server.login_rate_window
+)
+
+
+@app.teardown_appcontext
+def release_database(_: BaseException | None) -> None:
+    """
+    Return the database connection of the request to the pool.
+    """
+
+    database_manager.pool.release()
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Compress large HTML and JSON responses, if the client accepts it.
+    """
+
+    return compression.compress_response(request, response)
+
+
+@app.before_request
+def start_profiling() -> None:
+    """
+    Start timing the request and recording its SQL statements.
+    """
+
+    metrics.start_request()
+
+
+@app.after_request
+def finish_profiling(response: Response) -> Response:
+    """
+    Record the duration and SQL statements of the request once the
+    response has been sent, so that streamed responses include the
+    rendering of their body.
+    """
+
+    profile = metrics.current_request()
+    if profile is not None:
+        response.call_on_close(
+            partial(
+                record_profile,
+                profile,
+                request.endpoint or "none",
+                request.method,
+                request.full_path.rstrip("?"),
+                str(response.status_code),
+                # Event streams stay open until the client leaves.
+                response.mimetype != "text/event-stream",
+            )
+        )
+
+    return response
+
+
+def record_profile(
+    profile: metrics.RequestProfile,
+    endpoint: str,
+    method: str,
+    request_path: str,
+    status: str,
+    timed: bool,
+) -> None:
+    """
+    Record the duration and SQL statements of a request, and log slow
+    requests and statements repeated in a loop.
+
+    :param metrics.RequestProfile profile: The profile of the request.
+    :param str endpoint: The endpoint of the request.
+    :param str method: The HTTP method of the request.
+    :param str request_path: The path and query string of the request.
+    :param str status: The HTTP status code of the response.
+    :param bool timed: Whether to record the duration of the request.
+    """
+
+    metrics.finish_request()
+    duration = perf_counter() - profile.started
+    if timed:
+        metrics.request_duration.observe(duration, endpoint=endpoint, method=method)
+
+    metrics.requests.inc(endpoint=endpoint, method=method, status=status)
+    metrics.queries.inc(len(profile.queries), endpoint=endpoint)
+    metrics.query_duration.inc(profile.query_time, endpoint=endpoint)
+
+    repeated_queries = profile.repeated_queries()
+    if repeated_queries:
+        metrics.n_plus_one.inc(endpoint=endpoint)
+        logger.warning(
+            f"Possible N+1 queries in {method} {request_path}: "
+            + "; ".join(f"{count} x {sql}" for sql, count in repeated_queries)
+        )
+
+    if timed and duration > info.Server.slow_request_threshold:
+        metrics.slow_requests.inc(endpoint=endpoint)
+        logger.warning(
+            f"Slow request {method} {request_path}: "
+            f"{duration * 1000:.0f} ms, {len(profile.queries)} queries in "
+            f"{profile.query_time * 1000:.0f} ms."
+            + "".join(
+                f"\n  {query_time * 1000:.1f} ms: {sql}"
+                for sql, query_time in profile.slowest_queries()
+            )
+        )
 
 
 @app.route("/favicon.ico")
@@ -55,18 +197,55 @@ def index() -> str | WerkzeugResponse:
         else None,
     )
 
-    posts: list[dict[str, str]] = post_manager.PostManager().get_posts()
-    if request.args.get("search", None) is not None:
-        posts = [
-            post
-            for post in posts
-            if request.args["search"].lower() in post["content"].lower()
-        ]
+    manager = post_manager.PostManager()
+    try:
+        cursor = (
+            post_manager.decode_cursor(request.args["cursor"])
+            if "cursor" in request.args
+            else None
+        )
 
-    return renderer.get_template(
+        if request.args.get("search", None) is not None:
+            sort_key = "rank"
+            posts: Iterator[dict[str, Any]] = manager.iter_search_posts(
+                request.args["search"],
+                cursor=None if cursor is None else (float(cursor[0]), cursor[1]),
+            )
+
+        elif request.args.get("hashtag"):
+            sort_key = "timestamp"
+            posts = manager.iter_hashtag_posts(request.args["hashtag"], cursor=cursor)
+
+        elif request.args.get("mentions"):
+            sort_key = "timestamp"
+            posts = manager.iter_mention_posts(request.args["mentions"], cursor=cursor)
+
+        else:
+            sort_key = "timestamp"
+            posts = manager.iter_posts(
+                cursor=cursor,
+                filters=post_manager.parse_filters(request.args, session["user_id"]),
+            )
+
+    except ValueError:
+        return abort(400)
+
+    # The posts are rendered as they are read from the database.
+    return renderer.stream_template(
         "newsfeed.html",
         server_message=server_message,
-        posts=posts,
+        trending_hashtags=[
+            (window, manager.get_trending(trending.HASHTAG, window))
+            for window in info.Server.trending_windows
+        ],
+        trending_mentions=manager.get_trending(
+            trending.MENTION, max(info.Server.trending_windows)
+        ),
+        posts=renderer.Page(
+            posts,
+            info.Server.posts_per_page,
+            lambda post: post_manager.encode_cursor(post, sort_key),
+        ),
     )
 
 
@@ -84,17 +263,41 @@ def people() -> str | WerkzeugResponse:
         None,
     )
 
-    users = user_manager.UserManager().get_all_users()
-    friends = user_manager.UserManager().get_friends_list(session["user_id"])
-    users_with_friend_status: list[dict[str, str | bool]] = users.copy()  # type: ignore
-    for idx, user in enumerate(users):
-        users_with_friend_status[idx]["is_friend"] = (
-            True if user["user_id"] in friends else False
+    try:
+        after_id = int(request.args["after"]) if "after" in request.args else None
+
+    except ValueError:
+        return abort(400)
+
+    # People you may know, ordered by their number of mutual friends.
+    suggested = (
+        user_manager.UserManager()
+        .get_friend_graph()
+        .suggestions(session["user_id"], limit=info.Server.people_suggestions)
+    )
+    suggested_users = {
+        user["user_id"]: user
+        for user in user_manager.UserManager().get_people(
+            session["user_id"], user_ids=[user_id for user_id, _ in suggested]
         )
-        users_with_friend_status[idx]["is_self"] = user["user_id"] == session["user_id"]
+    }
+    suggestions = [
+        {**suggested_users[user_id], "mutual_friends": mutual_friends}
+        for user_id, mutual_friends in suggested
+        if user_id in suggested_users
+    ]
 
-    return renderer.get_template(
-        "people.html", users=users_with_friend_status, server_message=server_message
+    users = user_manager.UserManager().iter_people(
+        session["user_id"], name=request.args.get("name"), after_id=after_id
+    )
+
+    return renderer.stream_template(
+        "people.html",
+        users=renderer.Page(
+            users, info.Server.people_per_page, lambda user: user["user_id"]
+        ),
+        suggestions=suggestions,
+        server_message=server_message,
     )
 
 
@@ -149,12 +352,12 @@ def profile() -> str | WerkzeugResponse:
 
 
 @app.route("/about")
-def about() -> str:
+def about() -> str | WerkzeugResponse:
     """
     Show the about page of the site.
     """
 
-    return renderer.get_template("about.html")
+    return renderer.get_static_page("about.html")
 
 
 @app.route("/login", methods=["GET", "POST"])
@@ -170,6 +373,12 @@ def login() -> str | WerkzeugResponse:
         try:
             username: str = request.form["username"]
             password: str = request.form["password"]
+            if not all(
+                login_limiter.allow(key)
+                for key in (f"ip:{request.remote_addr}", f"user:{username}")
+            ):
+                return abort(429)
+
             user_id: int | None = user_manager.UserManager().validate_user(
                 username=username, password=password
             )
@@ -186,7 +395,10 @@ def login() -> str | WerkzeugResponse:
             flash(str(error))
             return renderer.get_template("login.html")
 
-    return renderer.get_template("login.html")
+        except password_hasher.HasherBusyError:
+            return abort(429)
+
+    return renderer.get_static_page("login.html")
 
 
 @app.route("/logout")
@@ -220,6 +432,9 @@ def register() -> str | WerkzeugResponse:
             flash("Passwords do not match.")
             return renderer.get_template("register.html")
 
+        elif not login_limiter.allow(f"ip:{request.remote_addr}"):
+            return abort(429)
+
         else:
             try:
                 user_id: int = user_manager.UserManager().register_user(
@@ -238,7 +453,10 @@ def register() -> str | WerkzeugResponse:
                 flash(str(error))
                 return renderer.get_template("register.html")
 
-    return renderer.get_template("register.html")
+            except password_hasher.HasherBusyError:
+                return abort(429)
+
+    return renderer.get_static_page("register.html")
 
 
 @app.route("/post", methods=["POST"])
@@ -252,7 +470,7 @@ def post() -> WerkzeugResponse:
 
     message = request.form["message"]
 
-    if len(message) > 140:
+    if len(message) > info.Server.post_max_length:
         return redirect(url_for("index", server_message="Message is too long!"))
 
     elif len(message) == 0:
@@ -263,6 +481,57 @@ def post() -> WerkzeugResponse:
     return redirect(url_for("index"))
 
 
+@app.route("/metrics")
+def prometheus_metrics() -> Response:
+    """
+    Show the metrics of this process in the Prometheus text format.
+    """
+
+    if request.remote_addr not in info.Server.metrics_allowed_addresses:
+        return abort(403)
+
+    caches = {
+        "user_levels": cache.user_levels,
+        "user_info": cache.user_info,
+        "friends_lists": cache.friends_lists,
+        "post_cards": renderer.post_cards,
+    }
+    lines = [
+        *metrics.request_duration.render(),
+        *metrics.requests.render(),
+        *metrics.queries.render(),
+        *metrics.query_duration.render(),
+        *metrics.n_plus_one.render(),
+        *metrics.slow_requests.render(),
+        *metrics.render_gauges(
+            "socialnetwork_database_pool",
+            "The statistics of the database connection pool.",
+            {
+                (("stat", stat),): value
+                for stat, value in database_manager.pool.stats().items()
+            },
+        ),
+        *metrics.render_gauges(
+            "socialnetwork_password_hasher",
+            "The statistics of the password hashing pool.",
+            {
+                (("stat", stat),): value
+                for stat, value in password_hasher.hasher.stats().items()
+            },
+        ),
+        *metrics.render_gauges(
+            "socialnetwork_cache",
+            "The statistics of the in-memory caches.",
+            {
+                (("cache", name), ("stat", stat)): value
+                for name, ttl_cache in caches.items()
+                for stat, value in ttl_cache.stats().items()
+            },
+        ),
+    ]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/admin", methods=["GET", "POST"])
 def admin_dashboard() -> str | WerkzeugResponse:
     """
@@ -291,35 +560,104 @@ def admin_dashboard() -> str | WerkzeugResponse:
         return renderer.get_template("admin_magic.html")
 
     else:
-        return renderer.get_template("admin_dashboard.html")
+        return renderer.get_template(
+            "admin_dashboard.html",
+            pool_stats=database_manager.pool.stats(),
+            hasher_stats=password_hasher.hasher.stats(),
+            cache_stats={
+                "user levels": cache.user_levels.stats(),
+                "user info": cache.user_info.stats(),
+                "friend lists": cache.friends_lists.stats(),
+            },
+        )
+
+
+def is_admin() -> bool:
+    """
+    Check if the user of the current session is an admin.
+    """
+
+    return (
+        bool(session.get("logged_in"))
+        and user_manager.UserManager().get_user_level(session["user_id"])
+        == user_manager.UserLevel.ADMIN
+    )
 
 
 @app.route("/admin/demo/data/friendship", methods=["GET"])
 def admin_friendship_dsa() -> str:
     """
-    Show the adjacency matrix of the friendship graph.
+    Show a tile of the adjacency matrix of the friendship graph.
     """
 
-    if (
-        not session.get("logged_in")
-        or not user_manager.UserManager().get_user_level(session["user_id"])
-        == user_manager.UserLevel.ADMIN
-    ):
+    if not is_admin():
         return abort(403)
 
-    users = user_manager.UserManager()._run("SELECT * FROM users")
-    friendships = user_manager.UserManager()._run("SELECT * FROM friendships")
+    try:
+        row = max(int(request.args.get("row", 0)), 0)
+        col = max(int(request.args.get("col", 0)), 0)
+
+    except ValueError:
+        return abort(400)
+
+    tile = info.Server.admin_matrix_tile
+    manager = user_manager.UserManager()
+    graph = manager.get_friend_graph()
+    user_count = manager.count_users()
+    row_users = manager.get_usernames(offset=row, limit=tile)
+    col_users = manager.get_usernames(offset=col, limit=tile)
 
-    # Create a matrix of all users, each record containing a value of 1 if the users are friends.
+    # Only the cells of this tile are built, keyed by the actual user IDs.
     matrix: list[list[int]] = [
-        [0 for _ in range(len(users))] for _ in range(len(users))
+        [int(graph.are_friends(row_user[0], col_user[0])) for col_user in col_users]
+        for row_user in row_users
     ]
-    for friendship in friendships:
-        matrix[friendship[0] - 1][friendship[1] - 1] = 1
 
     return renderer.get_template(
         "admin_friendship_dsa.html",
-        col_length=range(len(matrix[0])),
         matrix=matrix,
-        users=users,
+        row_users=row_users,
+        col_users=col_users,
+        row=row,
+        col=col,
+        tile=tile,
+        user_count=user_count,
+    )
+
+
+@app.route("/admin/demo/data/friendship/export", methods=["GET"])
+def admin_friendship_export() -> WerkzeugResponse:
+    """
+    Download the friendship graph as an edge list in CSV or JSON.
+    """
+
+    if not is_admin():
+        return abort(403)
+
+    export_format = request.args.get("format", "csv")
+    if export_format not in ("csv", "json"):
+        return abort(400)
+
+    edges = user_manager.UserManager().get_friend_graph().edges()
+
+    def generate_csv() -> Iterator[str]:
+        yield "user_id1,user_id2\n"
+        for user_id1, user_id2 in edges:
+            yield f"{user_id1},{user_id2}\n"
+
+    def generate_json() -> Iterator[str]:
+        yield '{"edges": ['
+        separator = ""
+        for user_id1, user_id2 in edges:
+            yield f"{separator}[{user_id1}, {user_id2}]"
+            separator = ", "
+
+        yield "]}"
+
+    return Response(
+        generate_csv() if export_format == "csv" else generate_json(),
+        mimetype="text/csv" if export_format == "csv" else "application/json",
+        headers={
+            "Content-Disposition": f"attachment; filename=friendships.{export_format}"
+        },
     )
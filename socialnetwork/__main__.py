@@ -0,0 +1,162 @@
+"""
+Bulk data tools. Run `python -m socialnetwork --help` for the usage.
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from contextlib import ExitStack
+
+from socialnetwork.core import (
+    bulk,
+    database_manager,
+    info,
+    password_hasher,
+    user_manager,
+)
+
+
+def get_format(arguments: argparse.Namespace, path: str) -> str:
+    if arguments.format is not None:
+        return arguments.format
+
+    return "csv" if path.endswith(".csv") else "jsonl"
+
+
+def export_command(arguments: argparse.Namespace) -> None:
+    database = database_manager.ConnectionPool.connect()
+    with ExitStack() as stack:
+        file = (
+            sys.stdout
+            if arguments.file == "-"
+            else stack.enter_context(open(arguments.file, "w", newline=""))
+        )
+        count = bulk.write_records(
+            file,
+            get_format(arguments, arguments.file),
+            bulk.TABLES[arguments.table],
+            bulk.export_table(database, arguments.table),
+        )
+
+    database.close()
+    print(f"Exported {count} {arguments.table} records.", file=sys.stderr)
+
+
+def import_command(arguments: argparse.Namespace) -> None:
+    database = database_manager.ConnectionPool.connect(isolation_level=None)
+    try:
+        with ExitStack() as stack:
+            file = (
+                sys.stdin
+                if arguments.file == "-"
+                else stack.enter_context(open(arguments.file, "r", newline=""))
+            )
+            count = bulk.import_table(
+                database,
+                arguments.table,
+                bulk.read_records(file, get_format(arguments, arguments.file)),
+                arguments.batch_size,
+            )
+
+    finally:
+        # The batches committed before an invalid record are kept, so
+        # their timelines and tags are updated even if the import fails.
+        if arguments.rebuild:
+            bulk.rebuild_timelines(database)
+            bulk.rebuild_tags(database)
+
+        else:
+            bulk.update_imported(database)
+
+        database.close()
+
+    print(f"Imported {count} {arguments.table} records.", file=sys.stderr)
+
+
+def seed_command(arguments: argparse.Namespace) -> None:
+    database = database_manager.ConnectionPool.connect(isolation_level=None)
+    # Every synthetic user shares one password, so it is only hashed once.
+    password = user_manager.make_password_record(arguments.password)
+    password_hasher.hasher.shutdown()
+
+    started = time.perf_counter()
+    counts = bulk.seed(
+        database,
+        arguments.users,
+        arguments.posts,
+        arguments.friends,
+        password,
+        arguments.seed,
+    )
+    database.close()
+    for table, count in counts.items():
+        print(f"Added {count} {table} records.", file=sys.stderr)
+
+    print(f"Done in {time.perf_counter() - started:.1f} s.", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m socialnetwork", description="Import, export and seed data."
+    )
+    commands = parser.add_subparsers(required=True)
+
+    export_parser = commands.add_parser("export", help="export a table")
+    export_parser.add_argument("table", choices=bulk.TABLES)
+    export_parser.add_argument(
+        "file", nargs="?", default="-", help="the output file, defaults to stdout"
+    )
+    export_parser.set_defaults(command=export_command)
+
+    import_parser = commands.add_parser("import", help="import records into a table")
+    import_parser.add_argument("table", choices=bulk.TABLES)
+    import_parser.add_argument(
+        "file", nargs="?", default="-", help="the input file, defaults to stdin"
+    )
+    import_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=info.Server.bulk_batch_size,
+        help="the records per transaction",
+    )
+    import_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="rebuild every timeline, hashtag and mention, not just those of the imported records",
+    )
+    import_parser.set_defaults(command=import_command)
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument(
+            "--format",
+            choices=("jsonl", "csv"),
+            help="the file format, defaults to csv for .csv files and jsonl otherwise",
+        )
+
+    seed_parser = commands.add_parser("seed", help="add synthetic data")
+    seed_parser.add_argument("--users", type=int, default=1000)
+    seed_parser.add_argument("--posts", type=int, default=10000)
+    seed_parser.add_argument(
+        "--friends", type=int, default=5, help="the friendships added per user"
+    )
+    seed_parser.add_argument(
+        "--password", default="password", help="the password of every new user"
+    )
+    seed_parser.add_argument("--seed", type=int, help="the random seed")
+    seed_parser.set_defaults(command=seed_command)
+
+    arguments = parser.parse_args()
+
+    database_manager.configure_database()
+    database_manager.DatabaseManager().migrate()
+    database_manager.pool.close_all()
+    try:
+        arguments.command(arguments)
+
+    except (sqlite3.Error, ValueError) as error:
+        parser.exit(1, f"Error: {error}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import json
+from typing import Any, Iterator
+
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    make_response,
+    request,
+    session,
+    stream_with_context,
+)
+
+from socialnetwork.core import (
+    broadcaster,
+    database_manager,
+    info,
+    post_manager,
+    renderer,
+    trending,
+    user_manager,
+)
+
+api: Blueprint = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def error(message: str, status: int) -> Response:
+    """
+    Create a JSON error response.
+
+    :param str message: The error message.
+    :param int status: The HTTP status code.
+    :return Response: The response.
+    """
+
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+@api.before_request
+def require_login() -> Response | None:
+    """
+    Reject requests from users that are not logged in.
+    """
+
+    if not session.get("logged_in"):
+        return error("You must be logged in.", 401)
+
+    return None
+
+
+def get_limit(maximum: int) -> int:
+    """
+    Get the `limit` query parameter, clamped between 1 and `maximum`.
+
+    Throws ValueError if the parameter is not a number.
+
+    :param int maximum: The maximum and default limit.
+    :return int: The limit.
+    """
+
+    return min(max(int(request.args.get("limit", maximum)), 1), maximum)
+
+
+@api.route("/posts", methods=["GET"])
+def get_posts() -> Response:
+    """
+    Get a page of posts, optionally from the friends feed, search results,
+    a `hashtag` or the `mentions` of a username, filtered by `author`,
+    `since` and `until`, and sorted by `order`.
+
+    Responses have an ETag derived from the newest post ID, so clients
+    polling for new posts get "304 Not Modified" until someone posts.
+    """
+
+    manager = post_manager.PostManager()
+    feed = request.args.get("feed")
+    etag = f"posts-{manager.get_latest_post_id()}"
+    if feed == "friends":
+        # The friends feed also changes when the user's friends change.
+        friends = user_manager.UserManager().get_friends_list(session["user_id"])
+        etag += f"-{session['user_id']}-{hash(tuple(sorted(friends))):x}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        limit = get_limit(info.Server.posts_per_page)
+        cursor = (
+            post_manager.decode_cursor(request.args["cursor"])
+            if "cursor" in request.args
+            else None
+        )
+        if "search" in request.args:
+            sort_key = "rank"
+            posts: list[dict[str, Any]] = manager.search_posts(
+                request.args["search"],
+                limit=limit,
+                cursor=None if cursor is None else (float(cursor[0]), cursor[1]),
+            )
+
+        elif request.args.get("hashtag"):
+            sort_key = "timestamp"
+            posts = manager.get_hashtag_posts(
+                request.args["hashtag"], cursor=cursor, limit=limit
+            )
+
+        elif request.args.get("mentions"):
+            sort_key = "timestamp"
+            posts = manager.get_mention_posts(
+                request.args["mentions"], cursor=cursor, limit=limit
+            )
+
+        else:
+            sort_key = "timestamp"
+            user_id = (
+                int(request.args["user_id"]) if "user_id" in request.args else None
+            )
+            posts = manager.get_posts(
+                user_id=user_id,
+                cursor=cursor,
+                limit=limit,
+                filters=post_manager.parse_filters(request.args, session["user_id"]),
+            )
+
+    except ValueError:
+        return error("Invalid query parameters.", 400)
+
+    response = jsonify(
+        posts=posts,
+        next_cursor=(
+            post_manager.encode_cursor(posts[-1], sort_key)
+            if len(posts) == limit
+            else None
+        ),
+    )
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def format_post_event(post: dict[str, Any]) -> str:
+    """
+    Format a new post as a Server-Sent Event. Requires an app context.
+
+    :param dict[str, Any] post: The post.
+    :return str: The event.
+    """
+
+    data = json.dumps({**post, "html": renderer.render_post(post)})
+    return f"id: {post['id']}\nevent: post\ndata: {data}\n\n"
+
+
+@api.route("/posts/events", methods=["GET"])
+def post_events() -> Response:
+    """
+    Stream new posts as Server-Sent Events, optionally only those in the
+    user's friends feed. A comment is sent as a heartbeat when there are
+    no new posts, and a `reset` event if the client fell too far behind.
+    """
+
+    user_ids = None
+    if request.args.get("feed") == "friends":
+        friends = user_manager.UserManager().get_friends_list(session["user_id"])
+        user_ids = frozenset(friends + [session["user_id"]])
+
+    # The stream may stay open for hours, so do not hold a database connection.
+    database_manager.pool.release()
+    subscription = broadcaster.posts.subscribe(user_ids)
+
+    def generate() -> Iterator[str]:
+        dropped = 0
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                post = subscription.get(timeout=info.Server.sse_heartbeat)
+                if subscription.dropped != dropped:
+                    dropped = subscription.dropped
+                    yield "event: reset\ndata: {}\n\n"
+
+                if post is None:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                yield format_post_event(post)
+
+        finally:
+            broadcaster.posts.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.cache_control.no_cache = True
+    response.headers[
+        "X-Accel-Buffering"
+    ] = "no"  # Do not let proxies buffer the stream.
+    return response
+
+
+@api.route("/posts", methods=["POST"])
+def create_post() -> Response:
+    """
+    Post a message. The request body is a JSON object with a `message`.
+    """
+
+    body = request.get_json(silent=True)
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        return error("Message is empty!", 400)
+
+    if len(message) > info.Server.post_max_length:
+        return error("Message is too long!", 400)
+
+    post_id = post_manager.PostManager().post_message(session["user_id"], message)
+
+    response = jsonify(id=post_id)
+    response.status_code = 201
+    return response
+
+
+@api.route("/trending", methods=["GET"])
+def get_trending() -> Response:
+    """
+    Get the most used hashtags and mentioned usernames of a period, given
+    as `window` in seconds, one of info.Server.trending_windows.
+    """
+
+    try:
+        window = int(request.args.get("window", max(info.Server.trending_windows)))
+        limit = get_limit(info.Server.trending_size)
+        if window not in info.Server.trending_windows:
+            raise ValueError("Invalid window.")
+
+    except ValueError:
+        return error("Invalid query parameters.", 400)
+
+    manager = post_manager.PostManager()
+    return jsonify(
+        window=window,
+        hashtags=[
+            {"tag": tag, "count": count}
+            for tag, count in manager.get_trending(trending.HASHTAG, window, limit)
+        ],
+        mentions=[
+            {"username": username, "count": count}
+            for username, count in manager.get_trending(trending.MENTION, window, limit)
+        ],
+    )
+
+
+@api.route("/users", methods=["GET"])
+def get_users() -> Response:
+    """
+    Get a page of users, optionally filtered by name.
+    """
+
+    try:
+        limit = get_limit(info.Server.people_per_page)
+        after_id = int(request.args["after"]) if "after" in request.args else None
+
+    except ValueError:
+        return error("Invalid query parameters.", 400)
+
+    users = user_manager.UserManager().get_people(
+        session["user_id"],
+        name=request.args.get("name"),
+        after_id=after_id,
+        limit=limit,
+    )
+
+    return jsonify(
+        users=users, next_after=users[-1]["user_id"] if len(users) == limit else None
+    )
+
+
+@api.route("/friends/<int:friend_id>", methods=["PUT", "DELETE"])
+def update_friend(friend_id: int) -> Response:
+    """
+    Add (PUT) or remove (DELETE) a friend.
+    """
+
+    if friend_id == session["user_id"]:
+        return error("You cannot befriend yourself.", 400)
+
+    manager = user_manager.UserManager()
+    try:
+        manager.get_user_level(friend_id)
+
+    except ValueError:
+        return error("User does not exist.", 404)
+
+    # Both are idempotent, so a stale friends list cannot make them fail.
+    if request.method == "PUT":
+        manager.friend_add(session["user_id"], friend_id)
+
+    else:
+        manager.friend_remove(session["user_id"], friend_id)
+
+    return jsonify(friend_id=friend_id, is_friend=request.method == "PUT")
@@ -0,0 +1,234 @@
+"""
+The ASGI entry point of the app, for running it on an ASGI server:
+
+    uvicorn socialnetwork.asgi:app
+
+The event stream of new posts is served natively, so idle clients hold
+no thread. Every other route is the WSGI app, run in a pool of
+`info.Server.asgi_threads` threads. This requires the `asgiref` package.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterator, Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import session
+
+import socialnetwork
+from socialnetwork.api import format_post_event
+from socialnetwork.core import (
+    async_manager,
+    broadcaster,
+    database_manager,
+    info,
+    password_hasher,
+    post_manager,
+)
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+flask_app = socialnetwork.app
+executor = ThreadPoolExecutor(info.Server.asgi_threads, thread_name_prefix="wsgi")
+
+
+def closing_app(environ: dict[str, Any], start_response: Callable) -> Iterator[bytes]:
+    """
+    Run the Flask app, and close its response once it is sent like WSGI
+    servers do, which runs the callbacks of `Response.call_on_close()`.
+    """
+
+    response = flask_app(environ, start_response)
+    try:
+        for chunk in response:
+            yield chunk
+
+    finally:
+        response.close()
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """
+    A `WsgiToAsgiInstance` that runs the WSGI app in `executor`, instead
+    of the one thread asgiref shares between all requests by default.
+    """
+
+    run_wsgi_app = sync_to_async(
+        vars(WsgiToAsgiInstance)["run_wsgi_app"].func,
+        thread_sensitive=False,
+        executor=executor,
+    )
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """
+    A `WsgiToAsgi` serving each request with a `ThreadPoolWsgiToAsgiInstance`.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await ThreadPoolWsgiToAsgiInstance(
+            self.wsgi_application, self.duplicate_header_limit
+        )(scope, receive, send)
+
+
+wsgi_app = ThreadPoolWsgiToAsgi(closing_app)
+
+
+def build_environ(scope: Scope) -> dict[str, Any]:
+    """
+    Build a minimal WSGI environment of a bodiless request, which is
+    enough for Flask to open its session.
+
+    :param Scope scope: The ASGI connection scope.
+    :return dict[str, Any]: The WSGI environment.
+    """
+
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ: dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+    }
+    for name, value in scope["headers"]:
+        key = "HTTP_" + name.decode("latin-1").upper().replace("-", "_")
+        environ[key] = value.decode("latin-1")
+
+    return environ
+
+
+def get_session_user_id(scope: Scope) -> Optional[int]:
+    """
+    Get the user ID of the logged in user of a request.
+
+    :param Scope scope: The ASGI connection scope.
+    :return Optional[int]: The user ID, or None if the user is not logged in.
+    """
+
+    with flask_app.request_context(build_environ(scope)):
+        return session.get("user_id") if session.get("logged_in") else None
+
+
+async def post_events(scope: Scope, receive: Receive, send: Send) -> None:
+    """
+    The async equivalent of `socialnetwork.api.post_events`.
+    """
+
+    user_id = await asyncio.to_thread(get_session_user_id, scope)
+    if user_id is None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b'{"error":"You must be logged in."}',
+            }
+        )
+        return
+
+    user_ids = None
+    if parse_qs(scope["query_string"].decode()).get("feed") == ["friends"]:
+        friends = await async_manager.AsyncUserManager().get_friends_list(user_id)
+        user_ids = frozenset(friends + [user_id])
+
+    async def wait_for_disconnect() -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    subscription = broadcaster.posts.subscribe(user_ids)
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        chunk = "retry: 5000\n\n"
+        dropped = 0
+        while not disconnected.done():
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk.encode(),
+                    "more_body": True,
+                }
+            )
+            post = await subscription.get_async(timeout=info.Server.sse_heartbeat)
+            chunk = ""
+            if subscription.dropped != dropped:
+                dropped = subscription.dropped
+                chunk += "event: reset\ndata: {}\n\n"
+
+            if post is None:
+                chunk += ": heartbeat\n\n"
+
+            else:
+                with flask_app.app_context():
+                    chunk += format_post_event(post)
+
+    finally:
+        broadcaster.posts.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def lifespan(receive: Receive, send: Send) -> None:
+    """
+    Prepare the database on startup, and flush the writes on shutdown.
+    """
+
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+
+            def prepare_database() -> None:
+                database_manager.configure_database()
+                database_manager.DatabaseManager().migrate()
+                post_manager.PostManager().load_hot_posts()
+                post_manager.PostManager().load_trends()
+                database_manager.pool.release()
+
+            await asyncio.to_thread(prepare_database)
+            await send({"type": "lifespan.startup.complete"})
+
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(post_manager.trends_sync.stop)
+            await asyncio.to_thread(lambda: post_manager.PostManager().sync_trends())
+            await asyncio.to_thread(database_manager.writer.stop)
+            password_hasher.hasher.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    """
+    The ASGI app.
+    """
+
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+
+    elif scope["type"] == "http" and scope["path"] == "/api/v1/posts/events":
+        await post_events(scope, receive, send)
+
+    else:
+        await wsgi_app(scope, receive, send)
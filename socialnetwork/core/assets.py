@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from flask import Flask, Response, request
+
+from socialnetwork.core import info
+
+
+class Asset(NamedTuple):
+    filename: str
+    mimetype: str
+    etag: str
+    data: bytes
+    # None if compressing the file does not make it smaller.
+    gzip_data: Optional[bytes]
+
+
+def fingerprint(filename: str, digest: str) -> str:
+    """
+    Add a content hash to a filename, before its extension.
+
+    :param str filename: The filename, e.g. "css/main.css".
+    :param str digest: The content hash.
+    :return str: The fingerprinted filename, e.g. "css/main.0123456789ab.css".
+    """
+
+    path = Path(filename)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+
+class AssetManifest:
+    """
+    The static files, keyed by their fingerprinted filenames.
+
+    Since a fingerprinted URL changes whenever the file does, browsers can
+    cache it forever. Compressible files are gzipped once when loaded.
+    """
+
+    def __init__(self, directory: Path = info.Filepath.static_files) -> None:
+        self.directory = directory
+        self.urls: dict[str, str] = {}
+        self.assets: dict[str, Asset] = {}
+
+    def load(self) -> None:
+        """
+        Hash and compress every file in the static directory.
+        """
+
+        urls: dict[str, str] = {}
+        assets: dict[str, Asset] = {}
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file():
+                continue
+
+            filename = path.relative_to(self.directory).as_posix()
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            gzip_data: Optional[bytes] = None
+            if mimetype in info.Server.gzip_static_mimetypes:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    gzip_data = compressed
+
+            urls[filename] = fingerprint(filename, digest)
+            assets[urls[filename]] = Asset(filename, mimetype, digest, data, gzip_data)
+
+        self.urls, self.assets = urls, assets
+
+    def url_filename(self, filename: str) -> str:
+        """
+        Get the fingerprinted filename of a static file.
+
+        :param str filename: The filename.
+        :return str: The fingerprinted filename, or the filename if the file is unknown.
+        """
+
+        return self.urls.get(filename, filename)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Make `url_for("static", ...)` return fingerprinted URLs, and serve them.
+
+        :param Flask app: The app.
+        """
+
+        self.load()
+        send_static_file = app.view_functions["static"]
+
+        @app.url_defaults
+        def fingerprint_static_urls(endpoint: str, values: dict) -> None:
+            if endpoint == "static" and "filename" in values:
+                values["filename"] = self.url_filename(values["filename"])
+
+        def static(filename: str) -> Response:
+            asset = self.assets.get(filename)
+            if asset is None:
+                # Unfingerprinted URLs are served as usual, without the long cache.
+                return send_static_file(filename=filename)
+
+            use_gzip = (
+                asset.gzip_data is not None and "gzip" in request.accept_encodings
+            )
+            response = Response(
+                asset.gzip_data if use_gzip else asset.data, mimetype=asset.mimetype
+            )
+            if use_gzip:
+                response.content_encoding = "gzip"
+
+            response.vary.add("Accept-Encoding")
+            response.set_etag(f"{asset.etag}-gzip" if use_gzip else asset.etag)
+            response.cache_control.public = True
+            response.cache_control.max_age = info.Server.static_max_age
+            response.cache_control.immutable = True
+            return response.make_conditional(request)
+
+        app.view_functions["static"] = static
+
+
+manifest = AssetManifest()
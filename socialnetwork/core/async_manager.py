@@ -0,0 +1,59 @@
+import asyncio
+from collections.abc import Iterator
+from typing import Any, Callable, Coroutine
+
+from socialnetwork.core import database_manager, post_manager, user_manager
+
+
+class AsyncManager:
+    """
+    An async counterpart of a manager class. Each method runs the method
+    of the same name in a worker thread, so that the event loop is never
+    blocked by the database.
+
+    For example, `await AsyncPostManager().get_posts()` runs
+    `PostManager().get_posts()` in a worker thread.
+
+    Iterators, like those of the `iter_*` methods, are read into a list in
+    the worker thread, because they read from its database connection.
+    """
+
+    manager_class: type[database_manager.DatabaseManager]
+
+    def __getattr__(self, name: str) -> Callable[..., Coroutine[Any, Any, Any]]:
+        if name.startswith("_") or not callable(getattr(self.manager_class, name)):
+            raise AttributeError(name)
+
+        async def method(*args: Any, **kwargs: Any) -> Any:
+            return await asyncio.to_thread(self._call, name, *args, **kwargs)
+
+        return method
+
+    def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            result = getattr(self.manager_class(), name)(*args, **kwargs)
+            if isinstance(result, Iterator):
+                # Read the rows before the connection goes back to the pool.
+                return list(result)
+
+            return result
+
+        finally:
+            # Worker threads are reused, so return their connections to the pool.
+            database_manager.pool.release()
+
+
+class AsyncPostManager(AsyncManager):
+    """
+    The async counterpart of `PostManager`.
+    """
+
+    manager_class = post_manager.PostManager
+
+
+class AsyncUserManager(AsyncManager):
+    """
+    The async counterpart of `UserManager`.
+    """
+
+    manager_class = user_manager.UserManager
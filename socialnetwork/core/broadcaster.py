@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Hashable, Optional
+
+from socialnetwork.core import info
+
+
+class Subscription:
+    """
+    A buffer of the events for one subscriber. When the subscriber falls
+    behind by more than `max_size` events, the oldest ones are dropped.
+    """
+
+    def __init__(
+        self,
+        user_ids: Optional[frozenset[int]] = None,
+        max_size: int = info.Server.sse_buffer_size,
+    ) -> None:
+        self.user_ids = user_ids
+        self.dropped = 0
+        self._events: deque[dict[str, Any]] = deque(maxlen=max_size)
+        self._condition = threading.Condition()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def put(self, event: dict[str, Any]) -> None:
+        """
+        Add an event to the buffer.
+
+        :param dict[str, Any] event: The event.
+        """
+
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+
+            self._events.append(event)
+            self._condition.notify()
+            waiters, self._waiters = self._waiters, []
+
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def get(self, timeout: float) -> Optional[dict[str, Any]]:
+        """
+        Wait for the next event.
+
+        :param float timeout: The maximum seconds to wait.
+        :return Optional[dict[str, Any]]: The event, or None if there was none in time.
+        """
+
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+
+            return self._events.popleft() if self._events else None
+
+    async def get_async(self, timeout: float) -> Optional[dict[str, Any]]:
+        """
+        Wait for the next event without blocking a thread.
+
+        :param float timeout: The maximum seconds to wait.
+        :return Optional[dict[str, Any]]: The event, or None if there was none in time.
+        """
+
+        waiter = asyncio.get_running_loop().create_future()
+        with self._condition:
+            if self._events:
+                return self._events.popleft()
+
+            self._waiters.append((asyncio.get_running_loop(), waiter))
+
+        try:
+            await asyncio.wait_for(waiter, timeout)
+
+        except asyncio.TimeoutError:
+            pass
+
+        with self._condition:
+            self._waiters = [item for item in self._waiters if item[1] is not waiter]
+            return self._events.popleft() if self._events else None
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Broadcaster:
+    """
+    An in-process publish/subscribe hub. Published events are copied to
+    the buffer of every subscriber interested in their author.
+
+    An event may be published twice, e.g. when it is found in the database
+    after being published by the process that wrote it. The keys of the
+    last `max_keys` events are kept, so that such events are only sent once.
+    """
+
+    def __init__(self, max_keys: int = info.Server.sse_buffer_size * 10) -> None:
+        self._subscriptions: set[Subscription] = set()
+        self._keys: deque[Hashable] = deque(maxlen=max_keys)
+        self._key_set: set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_ids: Optional[frozenset[int]] = None) -> Subscription:
+        """
+        Start receiving events.
+
+        :param Optional[frozenset[int]] user_ids: Only receive events by these users, defaults to None
+        :return Subscription: The subscription. Pass it to `unsubscribe()` when done.
+        """
+
+        subscription = Subscription(user_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Stop receiving events.
+
+        :param Subscription subscription: The subscription from `subscribe()`.
+        """
+
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def has_subscribers(self) -> bool:
+        """
+        Check if anyone would receive a published event.
+
+        :return bool: True if there are subscribers, False otherwise.
+        """
+
+        return bool(self._subscriptions)
+
+    def publish(
+        self, user_id: int, event: dict[str, Any], key: Optional[Hashable] = None
+    ) -> bool:
+        """
+        Send an event to the subscribers.
+
+        :param int user_id: The user ID of the author of the event.
+        :param dict[str, Any] event: The event.
+        :param Optional[Hashable] key: Do not send the event if one with this key was sent, defaults to None
+        :return bool: False if the event was already sent, True otherwise.
+        """
+
+        with self._lock:
+            if key is not None:
+                if key in self._key_set:
+                    return False
+
+                if len(self._keys) == self._keys.maxlen:
+                    self._key_set.discard(self._keys[0])
+
+                self._keys.append(key)
+                self._key_set.add(key)
+
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            if subscription.user_ids is None or user_id in subscription.user_ids:
+                subscription.put(event)
+
+        return True
+
+
+# New posts, keyed by their ID, published by `PostManager.post_message()`
+# and `PostManager.publish_posts()`.
+posts = Broadcaster()
@@ -0,0 +1,648 @@
+import csv
+import json
+import random
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import IO, Any, Iterable, Iterator
+
+from socialnetwork.core import info, trending
+
+# The columns of each table that can be imported and exported, in order.
+TABLES: dict[str, tuple[str, ...]] = {
+    "users": ("id", "username", "password", "is_admin", "welcomed"),
+    "user_info": (
+        "user_id",
+        "first_name",
+        "last_name",
+        "email",
+        "phone_number",
+        "address",
+    ),
+    "posts": ("id", "user_id", "content", "timestamp"),
+    "friendships": ("user_id1", "user_id2"),
+}
+
+# The temporary tables of the imported records that `update_imported()`
+# adds to the timelines, hashtags and mentions.
+IMPORTED: dict[str, str] = {
+    "users": "CREATE TEMP TABLE IF NOT EXISTS imported_users (id INTEGER PRIMARY KEY)",
+    "posts": "CREATE TEMP TABLE IF NOT EXISTS imported_posts (id INTEGER PRIMARY KEY)",
+    "friendships": """
+        CREATE TEMP TABLE IF NOT EXISTS imported_friendships (
+            user_id1 INTEGER,
+            user_id2 INTEGER,
+            PRIMARY KEY (user_id1, user_id2)
+        ) WITHOUT ROWID
+    """,
+}
+
+# The values used for the columns missing from an imported record.
+DEFAULTS: dict[str, str] = {
+    "is_admin": "0",
+    "welcomed": "0",
+    "timestamp": "CURRENT_TIMESTAMP",
+}
+
+WORDS: tuple[str, ...] = (
+    "hello world today coffee morning night music movie game book friends "
+    "family work school weekend holiday travel food dinner lunch rain sun "
+    "happy tired excited new old best great good long short city beach "
+    "code python flask sqlite database server fast slow love think know"
+).split()
+FIRST_NAMES: tuple[str, ...] = (
+    "Alex Sam Jamie Robin Chris Pat Jordan Taylor Casey Morgan Drew Kim Lee"
+).split()
+LAST_NAMES: tuple[str, ...] = (
+    "Santos Reyes Cruz Garcia Tan Lim Smith Brown Lopez Rivera Mendoza Chen"
+).split()
+
+
+def read_records(file: IO[str], format: str) -> Iterator[dict[str, Any]]:
+    """
+    Read records from a JSON Lines or CSV file, one at a time.
+
+    Throws ValueError if the format is unknown.
+
+    :param IO[str] file: The file to read.
+    :param str format: "jsonl" or "csv".
+    :return Iterator[dict[str, Any]]: The records.
+    """
+
+    if format == "jsonl":
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+    elif format == "csv":
+        # CSV has no NULL, so empty fields are read as missing values.
+        for row in csv.DictReader(file):
+            yield {key: value for key, value in row.items() if value != ""}
+
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+
+def write_records(
+    file: IO[str], format: str, columns: tuple[str, ...], records: Iterable[tuple]
+) -> int:
+    """
+    Write records to a JSON Lines or CSV file, one at a time.
+
+    Throws ValueError if the format is unknown.
+
+    :param IO[str] file: The file to write.
+    :param str format: "jsonl" or "csv".
+    :param tuple[str, ...] columns: The names of the values of each record.
+    :param Iterable[tuple] records: The records.
+    :return int: The number of records written.
+    """
+
+    count = 0
+    if format == "jsonl":
+        for record in records:
+            file.write(json.dumps(dict(zip(columns, record))) + "\n")
+            count += 1
+
+    elif format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow(record)
+            count += 1
+
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+    return count
+
+
+def export_table(database: sqlite3.Connection, table: str) -> Iterator[tuple]:
+    """
+    Read the rows of a table in primary key order, without loading them all.
+
+    Throws KeyError if the table cannot be exported.
+
+    :param sqlite3.Connection database: The database connection.
+    :param str table: The table name.
+    :return Iterator[tuple]: The rows, with the values in the order of TABLES[table].
+    """
+
+    columns = TABLES[table]
+    order = ", ".join(columns[:2] if table == "friendships" else columns[:1])
+    return database.execute(
+        f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order}"
+    )
+
+
+def import_table(
+    database: sqlite3.Connection,
+    table: str,
+    records: Iterable[dict[str, Any]],
+    batch_size: int = info.Server.bulk_batch_size,
+) -> int:
+    """
+    Insert records into a table, `batch_size` records per transaction.
+    The imported users, posts and friendships are remembered by the
+    connection until `update_imported()` is called.
+
+    Throws KeyError if the table cannot be imported, and sqlite3.Error if a
+    record is invalid, in which case only the batch of that record is undone.
+
+    :param sqlite3.Connection database: A connection in autocommit mode.
+    :param str table: The table name.
+    :param Iterable[dict[str, Any]] records: The records, keyed by column name.
+    :param int batch_size: The records per transaction, defaults to info.Server.bulk_batch_size
+    :return int: The number of records imported.
+    """
+
+    columns = TABLES[table]
+    values = ", ".join(
+        f"COALESCE(?, {DEFAULTS[column]})" if column in DEFAULTS else "?"
+        for column in columns
+    )
+    # Friendships are stored in both directions, so a pair may appear twice.
+    conflict = " OR IGNORE" if table == "friendships" else ""
+    statement = (
+        f"INSERT{conflict} INTO {table} ({', '.join(columns)}) VALUES ({values})"
+    )
+
+    for create in IMPORTED.values():
+        database.execute(create)
+
+    count = 0
+    rows = (tuple(record.get(column) for column in columns) for record in records)
+    while batch := list(islice(rows, batch_size)):
+        database.execute("BEGIN IMMEDIATE")
+        try:
+            max_id = (
+                database.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+                if table in ("users", "posts")
+                else 0
+            )
+            database.executemany(statement, batch)
+            _track_imported(database, table, batch, max_id)
+
+        except Exception:
+            database.execute("ROLLBACK")
+            raise
+
+        database.execute("COMMIT")
+        count += len(batch)
+
+    return count
+
+
+def _track_imported(
+    database: sqlite3.Connection, table: str, batch: list[tuple], max_id: int
+) -> None:
+    if table == "friendships":
+        database.executemany(
+            "INSERT OR IGNORE INTO imported_friendships VALUES (?, ?)",
+            (row[:2] for row in batch),
+        )
+
+    elif table in ("users", "posts"):
+        # Records without an ID got one above the previous maximum.
+        database.executemany(
+            f"INSERT OR IGNORE INTO imported_{table} (id) VALUES (?)",
+            (row[:1] for row in batch if row[0] is not None),
+        )
+        database.execute(
+            f"""
+            INSERT OR IGNORE INTO imported_{table}
+            SELECT id FROM {table} WHERE id > ?
+            """,
+            (max_id,),
+        )
+
+
+def update_imported(database: sqlite3.Connection) -> None:
+    """
+    Add the users, posts and friendships imported by `import_table()` to
+    the home timelines, hashtags and mentions, and update the trending
+    counts. Unlike `rebuild_timelines()` and `rebuild_tags()`, only the
+    timelines and posts affected by the imported records are read.
+
+    :param sqlite3.Connection database: A connection in autocommit mode.
+    """
+
+    for create in IMPORTED.values():
+        database.execute(create)
+
+    database.execute("BEGIN IMMEDIATE")
+    try:
+        _update_imported_timelines(database)
+        _update_imported_tags(database)
+        _rebuild_trending_counts(database)
+        for table in IMPORTED:
+            database.execute(f"DELETE FROM imported_{table}")
+
+    except Exception:
+        database.execute("ROLLBACK")
+        raise
+
+    database.execute("COMMIT")
+
+
+def _update_imported_timelines(database: sqlite3.Connection) -> None:
+    # Like `post_message()`, skip the authors read on demand by `get_timeline()`.
+    fanout = """
+        (
+            SELECT COUNT(*)
+            FROM (
+                SELECT 1 FROM friendships AS others
+                WHERE others.user_id1 = posts.user_id
+                LIMIT ?
+            )
+        ) <= ?
+    """
+    limits = (info.Server.timeline_fanout_limit + 1, info.Server.timeline_fanout_limit)
+    database.execute(
+        """
+        INSERT OR IGNORE INTO timelines (user_id, timestamp, post_id)
+        SELECT posts.user_id, posts.timestamp, posts.id
+        FROM imported_posts
+        INNER JOIN posts
+        ON posts.id = imported_posts.id
+        """
+    )
+    database.execute(
+        f"""
+        INSERT OR IGNORE INTO timelines (user_id, timestamp, post_id)
+        SELECT friendships.user_id1, posts.timestamp, posts.id
+        FROM imported_posts
+        INNER JOIN posts
+        ON posts.id = imported_posts.id
+        INNER JOIN friendships
+        ON friendships.user_id2 = posts.user_id
+        WHERE {fanout}
+        """,
+        limits,
+    )
+    # Only the timelines of the users with new friends change.
+    database.execute(
+        f"""
+        INSERT OR IGNORE INTO timelines (user_id, timestamp, post_id)
+        SELECT imported_friendships.user_id1, posts.timestamp, posts.id
+        FROM imported_friendships
+        INNER JOIN posts
+        ON posts.user_id = imported_friendships.user_id2
+        WHERE {fanout}
+        """,
+        limits,
+    )
+
+
+def _update_imported_tags(database: sqlite3.Connection) -> None:
+    posts: list[tuple[int, str, str]] = database.execute(
+        """
+        SELECT posts.id, posts.content, posts.timestamp
+        FROM imported_posts
+        INNER JOIN posts
+        ON posts.id = imported_posts.id
+        WHERE instr(posts.content, '#') > 0 OR instr(posts.content, '@') > 0
+        """
+    ).fetchall()
+    database.executemany(
+        "INSERT OR IGNORE INTO hashtags (tag, timestamp, post_id) VALUES (?, ?, ?)",
+        (
+            (tag, timestamp, post_id)
+            for post_id, content, timestamp in posts
+            for tag in trending.extract_hashtags(content)
+        ),
+    )
+
+    # The posts mentioning the new users are found with the full-text index.
+    usernames = [
+        row[0]
+        for row in database.execute(
+            """
+            SELECT users.username
+            FROM imported_users
+            INNER JOIN users
+            ON users.id = imported_users.id
+            """
+        )
+        # Only usernames made of word characters can be mentioned.
+        if re.fullmatch(r"\w+", row[0])
+    ]
+    for index in range(0, len(usernames), 100):
+        query = " OR ".join(
+            f'"{username}"' for username in usernames[index : index + 100]
+        )
+        posts.extend(
+            database.execute(
+                """
+                SELECT posts.id, posts.content, posts.timestamp
+                FROM posts_fts
+                INNER JOIN posts
+                ON posts.id = posts_fts.rowid
+                WHERE posts_fts MATCH ?
+                AND instr(posts.content, '@') > 0
+                """,
+                (query,),
+            )
+        )
+
+    mentions = {
+        (username, timestamp, post_id)
+        for post_id, content, timestamp in posts
+        for username in trending.extract_mentions(content)
+    }
+    mentioned = list({username for username, _, _ in mentions})
+    user_ids: dict[str, int] = {}
+    for index in range(0, len(mentioned), 500):
+        chunk = mentioned[index : index + 500]
+        user_ids.update(
+            database.execute(
+                f"""
+                SELECT username, id
+                FROM users
+                WHERE username IN ({", ".join("?" * len(chunk))})
+                """,
+                chunk,
+            )
+        )
+
+    database.executemany(
+        "INSERT OR IGNORE INTO mentions (user_id, timestamp, post_id) VALUES (?, ?, ?)",
+        (
+            (user_ids[username], timestamp, post_id)
+            for username, timestamp, post_id in mentions
+            if username in user_ids
+        ),
+    )
+
+
+def rebuild_timelines(database: sqlite3.Connection) -> None:
+    """
+    Rebuild the home timelines from the posts and friendships, after they
+    were imported without going through `PostManager.post_message()`.
+
+    :param sqlite3.Connection database: A connection in autocommit mode.
+    """
+
+    database.execute("BEGIN IMMEDIATE")
+    try:
+        database.execute("DELETE FROM timelines")
+        database.execute(
+            """
+            INSERT INTO timelines (user_id, timestamp, post_id)
+            SELECT user_id, timestamp, id FROM posts
+            """
+        )
+        # Like `post_message()`, skip the authors read on demand by `get_timeline()`.
+        database.execute(
+            """
+            INSERT OR IGNORE INTO timelines (user_id, timestamp, post_id)
+            SELECT friendships.user_id1, posts.timestamp, posts.id
+            FROM friendships
+            INNER JOIN posts
+            ON posts.user_id = friendships.user_id2
+            WHERE friendships.user_id2 IN (
+                SELECT user_id1
+                FROM friendships
+                GROUP BY user_id1
+                HAVING COUNT(*) <= ?
+            )
+            """,
+            (info.Server.timeline_fanout_limit,),
+        )
+
+    except Exception:
+        database.execute("ROLLBACK")
+        raise
+
+    database.execute("COMMIT")
+
+
+def rebuild_tags(database: sqlite3.Connection) -> None:
+    """
+    Rebuild the hashtags and mentions from the posts, and the trending
+    counts from the recent ones, after the posts or users were imported
+    without going through `PostManager.post_message()`.
+
+    :param sqlite3.Connection database: A connection in autocommit mode.
+    """
+
+    user_ids: dict[str, int] = dict(database.execute("SELECT username, id FROM users"))
+    database.execute("BEGIN IMMEDIATE")
+    try:
+        database.execute("DELETE FROM hashtags")
+        database.executemany(
+            "INSERT INTO hashtags (tag, timestamp, post_id) VALUES (?, ?, ?)",
+            (
+                (tag, timestamp, post_id)
+                for post_id, content, timestamp in database.execute(
+                    "SELECT id, content, timestamp FROM posts WHERE instr(content, '#') > 0"
+                ).fetchall()
+                for tag in trending.extract_hashtags(content)
+            ),
+        )
+        database.execute("DELETE FROM mentions")
+        database.executemany(
+            "INSERT INTO mentions (user_id, timestamp, post_id) VALUES (?, ?, ?)",
+            (
+                (user_ids[username], timestamp, post_id)
+                for post_id, content, timestamp in database.execute(
+                    "SELECT id, content, timestamp FROM posts WHERE instr(content, '@') > 0"
+                ).fetchall()
+                for username in trending.extract_mentions(content)
+                if username in user_ids
+            ),
+        )
+
+        _rebuild_trending_counts(database)
+
+    except Exception:
+        database.execute("ROLLBACK")
+        raise
+
+    database.execute("COMMIT")
+
+
+def _rebuild_trending_counts(database: sqlite3.Connection) -> None:
+    # The running servers discard the counts they have not saved yet,
+    # since those of their posts are counted here.
+    database.execute("INSERT INTO trending_rebuilds DEFAULT VALUES")
+    # Only the recent posts count, so this does not read every post.
+    database.execute("DELETE FROM trending_counts")
+    recent = (
+        info.Server.trending_resolution,
+        (trending.trends.expired_bucket() + 1) * info.Server.trending_resolution,
+    )
+    database.execute(
+        """
+        INSERT INTO trending_counts (bucket, kind, name, count)
+        SELECT CAST(strftime('%s', posts.timestamp) AS INTEGER) / ?,
+               'hashtag', hashtags.tag, COUNT(*)
+        FROM posts
+        INNER JOIN hashtags
+        ON hashtags.post_id = posts.id
+        WHERE posts.timestamp >= datetime(?, 'unixepoch')
+        GROUP BY 1, 3
+        """,
+        recent,
+    )
+    database.execute(
+        """
+        INSERT INTO trending_counts (bucket, kind, name, count)
+        SELECT CAST(strftime('%s', posts.timestamp) AS INTEGER) / ?,
+               'mention', users.username, COUNT(*)
+        FROM posts
+        INNER JOIN mentions
+        ON mentions.post_id = posts.id
+        INNER JOIN users
+        ON users.id = mentions.user_id
+        WHERE posts.timestamp >= datetime(?, 'unixepoch')
+        GROUP BY 1, 3
+        """,
+        recent,
+    )
+
+
+def generate_users(
+    first_id: int, count: int, password: str, rng: random.Random
+) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+    """
+    Generate synthetic users.
+
+    :param int first_id: The user ID of the first user.
+    :param int count: The number of users.
+    :param str password: The password record shared by every user.
+    :param random.Random rng: The random number generator.
+    :return Iterator[tuple[dict[str, Any], dict[str, Any]]]: The `users` and `user_info` records.
+    """
+
+    for user_id in range(first_id, first_id + count):
+        username = f"user{user_id}"
+        yield (
+            {
+                "id": user_id,
+                "username": username,
+                "password": password,
+                "is_admin": 0,
+                "welcomed": 1,
+            },
+            {
+                "user_id": user_id,
+                "first_name": rng.choice(FIRST_NAMES),
+                "last_name": rng.choice(LAST_NAMES),
+                "email": f"{username}@example.com",
+                "phone_number": None,
+                "address": None,
+            },
+        )
+
+
+def generate_friendships(
+    user_ids: list[int], friends_per_user: int, rng: random.Random
+) -> Iterator[dict[str, Any]]:
+    """
+    Generate a friendship graph whose degrees follow a power law, using
+    preferential attachment: each user befriends `friends_per_user` earlier
+    users, picked with a probability proportional to their friend count.
+
+    :param list[int] user_ids: The users to connect, in order of arrival.
+    :param int friends_per_user: The friendships added with each user.
+    :param random.Random rng: The random number generator.
+    :return Iterator[dict[str, Any]]: The `friendships` records, in both directions.
+    """
+
+    # Each user appears here once per friendship, so a uniform pick is weighted by degree.
+    endpoints: list[int] = []
+    for index, user_id in enumerate(user_ids):
+        if index == 0:
+            continue
+
+        friends: set[int] = set()
+        target = min(friends_per_user, index)
+        while len(friends) < target:
+            if endpoints and rng.random() < 0.9:
+                friends.add(rng.choice(endpoints))
+
+            else:
+                friends.add(user_ids[rng.randrange(index)])
+
+        for friend_id in friends:
+            endpoints.extend((user_id, friend_id))
+            yield {"user_id1": user_id, "user_id2": friend_id}
+            yield {"user_id1": friend_id, "user_id2": user_id}
+
+
+def generate_posts(
+    user_ids: list[int],
+    count: int,
+    rng: random.Random,
+    days: int = 30,
+) -> Iterator[dict[str, Any]]:
+    """
+    Generate synthetic posts spread over the last `days` days, oldest first.
+    Authors are picked from a Zipf-like distribution, so a few users post a lot.
+
+    :param list[int] user_ids: The possible authors.
+    :param int count: The number of posts.
+    :param random.Random rng: The random number generator.
+    :param int days: The time span of the posts, defaults to 30
+    :return Iterator[dict[str, Any]]: The `posts` records, without IDs.
+    """
+
+    cumulative_weights = list(
+        accumulate(1 / rank for rank in range(1, len(user_ids) + 1))
+    )
+    authors = user_ids[:]
+    rng.shuffle(authors)
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    step = timedelta(days=days) / max(count, 1)
+    for index in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 20))
+        if rng.random() < 0.2:
+            words.append(f"#{rng.choice(WORDS)}")
+
+        yield {
+            "user_id": rng.choices(authors, cum_weights=cumulative_weights)[0],
+            "content": " ".join(words)[: info.Server.post_max_length],
+            "timestamp": (start + step * index).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+def seed(
+    database: sqlite3.Connection,
+    users: int,
+    posts: int,
+    friends_per_user: int,
+    password: str,
+    random_seed: int | None = None,
+) -> dict[str, int]:
+    """
+    Fill the database with synthetic users, friendships and posts.
+
+    :param sqlite3.Connection database: A connection in autocommit mode.
+    :param int users: The number of users to add.
+    :param int posts: The number of posts to add.
+    :param int friends_per_user: The friendships added with each user.
+    :param str password: The password record of the new users.
+    :param int | None random_seed: The seed for reproducible data, defaults to None
+    :return dict[str, int]: The number of records added to each table.
+    """
+
+    rng = random.Random(random_seed)
+    first_id = (database.execute("SELECT MAX(id) FROM users").fetchone()[0] or 0) + 1
+    user_ids = list(range(first_id, first_id + users))
+    records = list(generate_users(first_id, users, password, rng))
+    counts = {
+        "users": import_table(database, "users", (record[0] for record in records)),
+        "user_info": import_table(
+            database, "user_info", (record[1] for record in records)
+        ),
+        "friendships": import_table(
+            database,
+            "friendships",
+            generate_friendships(user_ids, friends_per_user, rng),
+        ),
+        "posts": import_table(database, "posts", generate_posts(user_ids, posts, rng)),
+    }
+    update_imported(database)
+    return counts
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from socialnetwork.core import info
+
+# Returned by `TTLCache.get()` when there is no fresh value for a key.
+MISSING: Any = object()
+
+
+class TTLCache:
+    """
+    A thread-safe cache that keeps values for `ttl` seconds, evicting the
+    least recently used values when it holds more than `max_size`.
+    """
+
+    def __init__(
+        self, ttl: float = info.Server.cache_ttl, max_size: int = info.Server.cache_size
+    ) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._values: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get a value from the cache.
+
+        :param Hashable key: The key of the value.
+        :return Any: The value, or MISSING if it is not cached or has expired.
+        """
+
+        with self._lock:
+            record = self._values.get(key)
+            if record is None or record[1] <= time.monotonic():
+                self.misses += 1
+                return MISSING
+
+            self._values.move_to_end(key)
+            self.hits += 1
+            return record[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Put a value in the cache.
+
+        :param Hashable key: The key of the value.
+        :param Any value: The value.
+        """
+
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + self.ttl)
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """
+        Remove values from the cache.
+
+        :param Hashable keys: The keys of the values.
+        """
+
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all values from the cache.
+        """
+
+        with self._lock:
+            self._values.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the statistics of the cache.
+
+        :return dict[str, int]: The number of hits, misses and cached values.
+        """
+
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._values)}
+
+
+# The caches in front of the `UserManager` lookups, keyed by user ID.
+user_levels = TTLCache()
+user_info = TTLCache()
+friends_lists = TTLCache()
@@ -0,0 +1,85 @@
+import gzip
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Request, Response
+from werkzeug.wsgi import ClosingIterator
+
+from socialnetwork.core import info
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    Check if the client accepts gzip-compressed responses.
+
+    :param Request request: The request.
+    :return bool: True if the client accepts gzip, False otherwise.
+    """
+
+    return "gzip" in request.accept_encodings
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compress a streamed response, flushing after every chunk so that the
+    client can show each chunk as soon as it arrives.
+
+    :param Iterable[bytes] chunks: The chunks of the response.
+    :return Iterator[bytes]: The gzip stream.
+    """
+
+    compressor = zlib.compressobj(
+        info.Server.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    for chunk in chunks:
+        compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """
+    Compress a response with gzip, if the client accepts it and it is
+    worth compressing: a compressible type, and not too small.
+
+    :param Request request: The request.
+    :param Response response: The response.
+    :return Response: The response, compressed or not.
+    """
+
+    if (
+        response.mimetype not in info.Server.gzip_mimetypes
+        or response.content_encoding
+        or response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or not accepts_gzip(request)
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if response.is_streamed:
+        # The size of a streamed page is unknown, and it is usually large.
+        # Keep closing the original stream, e.g. a template stream, when the response is closed.
+        response.response = ClosingIterator(
+            gzip_stream(response.iter_encoded()),
+            getattr(response.response, "close", None),
+        )
+        response.headers.pop("Content-Length", None)
+
+    else:
+        data = response.get_data()
+        if len(data) < info.Server.gzip_min_size:
+            return response
+
+        response.set_data(gzip.compress(data, info.Server.gzip_level, mtime=0))
+
+    response.content_encoding = "gzip"
+    # The compressed body differs from the uncompressed one, but means the same.
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
@@ -1,6 +1,298 @@
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, TypeVar
 
-from socialnetwork.core import info
+from socialnetwork.core import info, metrics, migrations
+
+T = TypeVar("T")
+WriteJob = Callable[[sqlite3.Cursor], T]
+
+
+def connection_pragmas() -> dict[str, str | int]:
+    """
+    Get the PRAGMAs to apply to every new connection.
+
+    :return dict[str, str | int]: The PRAGMA names and their values.
+    """
+
+    return {
+        "busy_timeout": info.Server.database_busy_timeout,
+        "synchronous": info.Server.database_synchronous,
+        "mmap_size": info.Server.database_mmap_size,
+        "cache_size": info.Server.database_cache_size,
+        **info.Server.database_pragmas,
+    }
+
+
+def configure_database() -> None:
+    """
+    Apply the database-wide settings. This should be called once on startup.
+    """
+
+    # The journal mode is persistent, so there is no need to set it per connection.
+    connection = sqlite3.connect(info.Filepath.database)
+    connection.execute(f"PRAGMA journal_mode = {info.Server.database_journal_mode}")
+    connection.close()
+
+
+class ConnectionPool:
+    """
+    A registry of reusable SQLite connections.
+
+    Each thread holds at most one connection at a time, so every manager
+    created while handling a request shares the same connection. Released
+    connections are kept idle (up to `max_idle`) and handed out again
+    instead of opening a new one.
+    """
+
+    def __init__(self, max_idle: int = info.Server.database_pool_size) -> None:
+        self.max_idle = max_idle
+        self._idle: list[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats: dict[str, int] = {
+            "created": 0,
+            "reused": 0,
+            "released": 0,
+            "closed": 0,
+            "in_use": 0,
+        }
+
+    @staticmethod
+    def connect(isolation_level: str | None = "") -> sqlite3.Connection:
+        """
+        Open a new connection and apply the configured PRAGMAs.
+
+        :param str | None isolation_level: The isolation level of the connection, defaults to ""
+        :return sqlite3.Connection: The new connection.
+        """
+
+        # Connections may be handed to another thread after being released,
+        # but never used by two threads at the same time.
+        connection = sqlite3.connect(
+            info.Filepath.database,
+            check_same_thread=False,
+            isolation_level=isolation_level,
+            factory=(
+                metrics.ProfiledConnection
+                if info.Server.profile_queries
+                else sqlite3.Connection
+            ),
+        )
+        for pragma, value in connection_pragmas().items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
+
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Get the connection of the current thread, taking one from the
+        pool (or opening a new one) if the thread does not hold one yet.
+
+        :return sqlite3.Connection: The connection of the current thread.
+        """
+
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+
+        with self._lock:
+            if self._idle:
+                connection = self._idle.pop()
+                self._stats["reused"] += 1
+
+            self._stats["in_use"] += 1
+
+        if connection is None:
+            connection = self.connect()
+            with self._lock:
+                self._stats["created"] += 1
+
+        self._local.connection = connection
+        return connection
+
+    def release(self) -> None:
+        """
+        Return the connection of the current thread to the pool.
+        Uncommitted changes are rolled back.
+        """
+
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            return
+
+        self._local.connection = None
+        connection.rollback()
+        with self._lock:
+            self._stats["in_use"] -= 1
+            self._stats["released"] += 1
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+
+            self._stats["closed"] += 1
+
+        connection.close()
+
+    def close_all(self) -> None:
+        """
+        Close all idle connections and the connection of the current thread.
+        """
+
+        self.release()
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._stats["closed"] += len(idle)
+
+        for connection in idle:
+            connection.close()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the statistics of the pool.
+
+        :return dict[str, int]: The connection counters and the number of idle connections.
+        """
+
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle)}
+
+
+class WriteQueue:
+    """
+    Serialize database writes through a single background thread.
+
+    Queued jobs are grouped into one transaction (a group commit), each
+    in its own savepoint so that a failing job does not undo the others.
+    The statements of each job, and the commit, are recorded in the
+    profile of the request that queued it.
+    """
+
+    def __init__(self, batch_size: int = info.Server.database_write_batch_size) -> None:
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue[
+            tuple[WriteJob, Future, metrics.RequestProfile | None] | None
+        ] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="database-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, job: WriteJob[T]) -> Future[T]:
+        """
+        Queue a write job.
+
+        :param WriteJob job: A function that performs the writes using the given cursor.
+        :return Future: The future result of the job.
+        """
+
+        future: Future[T] = Future()
+        self._ensure_started()
+        self._queue.put((job, future, metrics.current_request()))
+        return future
+
+    def execute(self, job: WriteJob[T]) -> T:
+        """
+        Queue a write job and wait until it is committed.
+
+        :param WriteJob job: A function that performs the writes using the given cursor.
+        :return T: The return value of the job.
+        """
+
+        return self.submit(job).result()
+
+    def stop(self) -> None:
+        """
+        Commit the queued jobs and stop the writer thread.
+        """
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _next_batch(
+        self,
+    ) -> tuple[list[tuple[WriteJob, Future, metrics.RequestProfile | None]], bool]:
+        batch: list[tuple[WriteJob, Future, metrics.RequestProfile | None]] = []
+        item = self._queue.get()
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+
+            try:
+                item = self._queue.get_nowait()
+
+            except queue.Empty:
+                return batch, False
+
+        return batch, True
+
+    def _run(self) -> None:
+        connection = ConnectionPool.connect(isolation_level=None)
+        cursor = connection.cursor()
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+
+            results: list[tuple[Future, object, BaseException | None]] = []
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                for job, future, profile in batch:
+                    cursor.execute("SAVEPOINT job")
+                    try:
+                        with metrics.profiling(profile):
+                            results.append((future, job(cursor), None))
+
+                    except Exception as error:
+                        cursor.execute("ROLLBACK TO job")
+                        results.append((future, None, error))
+
+                    cursor.execute("RELEASE job")
+
+                started = time.perf_counter()
+                cursor.execute("COMMIT")
+                duration = time.perf_counter() - started
+                # Every request of the batch waited for the commit.
+                for _, _, profile in batch:
+                    with metrics.profiling(profile):
+                        metrics.record_query("COMMIT", duration)
+
+            except Exception as error:
+                if connection.in_transaction:
+                    connection.rollback()
+
+                for _, future, _ in batch:
+                    future.set_exception(error)
+
+                continue
+
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+
+                else:
+                    future.set_exception(error)
+
+        connection.close()
+
+
+pool = ConnectionPool()
+writer = WriteQueue()
 
 
 class DatabaseManager:
@@ -11,56 +303,81 @@ class DatabaseManager:
     """
 
     def __init__(self) -> None:
-        self.database = sqlite3.connect(info.Filepath.database)
+        self.database = pool.acquire()
+
+    def _write(self, job: WriteJob[T]) -> T:
+        """
+        Run a write job and commit it, through the write queue if it is enabled.
+
+        :param WriteJob job: A function that performs the writes using the given cursor.
+        :return T: The return value of the job.
+        """
+
+        if info.Server.database_write_queue:
+            return writer.execute(job)
+
+        try:
+            result = job(self.database.cursor())
+
+        except Exception:
+            self.database.rollback()
+            raise
+
+        self.database.commit()
+        return result
 
     def initialize_database(self) -> None:
         """
-        Create the database.
+        Create the database, or upgrade it to the latest schema version.
         """
 
-        cursor = self.database.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                password TEXT NOT NULL,
-                is_admin BOOLEAN NOT NULL,
-                welcomed BOOLEAN NOT NULL
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_info (
-                user_id INTEGER PRIMARY KEY,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                email TEXT,
-                phone_number TEXT,
-                address TEXT,
-                FOREIGN KEY(user_id) REFERENCES users(id)
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(user_id) REFERENCES users(id)
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS friendships (
-                user_id1 INTEGER, user_id2 INTEGER,
-                PRIMARY KEY (user_id1, user_id2),
-                FOREIGN KEY(user_id1) REFERENCES users(id),
-                FOREIGN KEY(user_id2) REFERENCES users(id)
-            )
-            """
-        )
+        self.migrate()
+
+    def get_schema_version(self) -> int:
+        """
+        Get the schema version of the database.
+
+        :return int: The version of the last applied migration.
+        """
+
+        return self.database.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> list[int]:
+        """
+        Apply the pending migrations, each in its own transaction.
+
+        Throws migrations.MigrationError if the data prevents a migration.
+
+        :return list[int]: The versions of the applied migrations.
+        """
+
+        for name, function in migrations.FUNCTIONS.items():
+            self.database.create_function(name, 1, function, deterministic=True)
+
+        applied: list[int] = []
+        for migration in migrations.MIGRATIONS:
+            if migration.version <= self.get_schema_version():
+                continue
+
+            cursor = self.database.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if migration.check is not None:
+                    query, error = migration.check
+                    values = [str(row[0]) for row in cursor.execute(query)]
+                    if values:
+                        raise migrations.MigrationError(error.format(", ".join(values)))
+
+                for statement in migration.statements:
+                    cursor.execute(statement)
+
+                cursor.execute(f"PRAGMA user_version = {migration.version}")
+
+            except Exception:
+                self.database.rollback()
+                raise
+
+            self.database.commit()
+            applied.append(migration.version)
+
+        return applied
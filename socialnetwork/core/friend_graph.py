@@ -0,0 +1,258 @@
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable, Optional
+
+
+class FriendGraph:
+    """
+    An in-memory copy of the friendship graph.
+
+    Each user maps to a sorted array of the user IDs of their friends, so
+    that lookups are binary searches and intersections are linear merges.
+    The arrays are replaced instead of modified, so they can be read
+    without holding the lock.
+    """
+
+    def __init__(self) -> None:
+        self._adjacency: dict[int, array] = {}
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def load(self, database: sqlite3.Connection) -> None:
+        """
+        Replace the graph with the friendships in the database.
+
+        :param sqlite3.Connection database: The database connection.
+        """
+
+        adjacency: dict[int, array] = {}
+        # The primary key of `friendships` makes this an ordered index scan.
+        for user_id1, user_id2 in database.execute(
+            "SELECT user_id1, user_id2 FROM friendships ORDER BY user_id1, user_id2"
+        ):
+            friends = adjacency.get(user_id1)
+            if friends is None:
+                friends = adjacency[user_id1] = array("q")
+
+            friends.append(user_id2)
+
+        with self._lock:
+            self._adjacency = adjacency
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def load_once(self, database: sqlite3.Connection) -> None:
+        """
+        Load the graph if it was never loaded, with the other threads
+        waiting for it instead of loading it too.
+
+        :param sqlite3.Connection database: The database connection.
+        """
+
+        with self._load_lock:
+            if not self.loaded:
+                self.load(database)
+
+    def claim_reload(self, ttl: float) -> bool:
+        """
+        Check if the graph is older than `ttl`, and if so, leave the reload
+        to the caller while the other threads keep reading the stale graph.
+
+        :param float ttl: The maximum age of the graph, in seconds.
+        :return bool: True if the caller should reload the graph.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            if not self.loaded or now - self.loaded_at <= ttl:
+                return False
+
+            self.loaded_at = now
+            return True
+
+    def add_edge(self, user_id1: int, user_id2: int) -> None:
+        """
+        Add a friendship between two users.
+
+        :param int user_id1: The user ID of the first user.
+        :param int user_id2: The user ID of the second user.
+        """
+
+        with self._lock:
+            for user_id, friend_id in ((user_id1, user_id2), (user_id2, user_id1)):
+                friends = array("q", self.friends(user_id))
+                index = bisect_left(friends, friend_id)
+                if index == len(friends) or friends[index] != friend_id:
+                    friends.insert(index, friend_id)
+                    self._adjacency[user_id] = friends
+
+    def remove_edge(self, user_id1: int, user_id2: int) -> None:
+        """
+        Remove a friendship between two users.
+
+        :param int user_id1: The user ID of the first user.
+        :param int user_id2: The user ID of the second user.
+        """
+
+        with self._lock:
+            for user_id, friend_id in ((user_id1, user_id2), (user_id2, user_id1)):
+                friends = array("q", self.friends(user_id))
+                index = bisect_left(friends, friend_id)
+                if index < len(friends) and friends[index] == friend_id:
+                    del friends[index]
+                    self._adjacency[user_id] = friends
+
+    def friends(self, user_id: int) -> array:
+        """
+        Get the friends of a user.
+
+        :param int user_id: The user ID.
+        :return array: The sorted user IDs of the user's friends.
+        """
+
+        return self._adjacency.get(user_id, array("q"))
+
+    def users(self) -> list[int]:
+        """
+        Get the users with at least one friend.
+
+        :return list[int]: The sorted user IDs.
+        """
+
+        with self._lock:
+            return sorted(
+                user_id for user_id, friends in self._adjacency.items() if friends
+            )
+
+    def edges(self) -> Iterable[tuple[int, int]]:
+        """
+        Iterate over the friendships, each in both directions, ordered by user ID.
+
+        :return Iterable[tuple[int, int]]: The (user ID, friend's user ID) pairs.
+        """
+
+        for user_id in self.users():
+            for friend_id in self.friends(user_id):
+                yield user_id, friend_id
+
+    def are_friends(self, user_id1: int, user_id2: int) -> bool:
+        """
+        Check if two users are friends.
+
+        :param int user_id1: The user ID of the first user.
+        :param int user_id2: The user ID of the second user.
+        :return bool: True if the users are friends, False otherwise.
+        """
+
+        friends = self.friends(user_id1)
+        index = bisect_left(friends, user_id2)
+        return index < len(friends) and friends[index] == user_id2
+
+    def degree(self, user_id: int) -> int:
+        """
+        Get the number of friends of a user.
+
+        :param int user_id: The user ID.
+        :return int: The number of friends.
+        """
+
+        return len(self.friends(user_id))
+
+    def mutual_friends(self, user_id1: int, user_id2: int) -> list[int]:
+        """
+        Get the friends two users have in common.
+
+        :param int user_id1: The user ID of the first user.
+        :param int user_id2: The user ID of the second user.
+        :return list[int]: The sorted user IDs of the mutual friends.
+        """
+
+        friends1, friends2 = self.friends(user_id1), self.friends(user_id2)
+        mutual: list[int] = []
+        index1 = index2 = 0
+        while index1 < len(friends1) and index2 < len(friends2):
+            if friends1[index1] < friends2[index2]:
+                index1 += 1
+
+            elif friends1[index1] > friends2[index2]:
+                index2 += 1
+
+            else:
+                mutual.append(friends1[index1])
+                index1 += 1
+                index2 += 1
+
+        return mutual
+
+    def distance(
+        self, user_id1: int, user_id2: int, max_distance: int = 6
+    ) -> Optional[int]:
+        """
+        Get the number of friendships between two users, using a
+        breadth-first search from both users at the same time.
+
+        :param int user_id1: The user ID of the first user.
+        :param int user_id2: The user ID of the second user.
+        :param int max_distance: Stop searching after this distance, defaults to 6
+        :return Optional[int]: The distance, or None if the users are not connected.
+        """
+
+        if user_id1 == user_id2:
+            return 0
+
+        visited = ({user_id1: 0}, {user_id2: 0})
+        frontiers = ([user_id1], [user_id2])
+        distance = 0
+        while frontiers[0] and frontiers[1] and distance < max_distance:
+            # Expand the smaller frontier.
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = visited[side], visited[1 - side]
+            next_frontier: list[int] = []
+            distance += 1
+            for user_id in frontiers[side]:
+                for friend_id in self.friends(user_id):
+                    if friend_id in other:
+                        return seen[user_id] + 1 + other[friend_id]
+
+                    if friend_id not in seen:
+                        seen[friend_id] = seen[user_id] + 1
+                        next_frontier.append(friend_id)
+
+            frontiers = (
+                (next_frontier, frontiers[1])
+                if side == 0
+                else (frontiers[0], next_frontier)
+            )
+
+        return None
+
+    def suggestions(self, user_id: int, limit: int = 10) -> list[tuple[int, int]]:
+        """
+        Get the friends of the user's friends who are not yet their friends,
+        ranked by the number of mutual friends.
+
+        :param int user_id: The user ID.
+        :param int limit: The maximum number of suggestions, defaults to 10
+        :return list[tuple[int, int]]: The user IDs and their number of mutual friends.
+        """
+
+        friends = self.friends(user_id)
+        counts: Counter[int] = Counter()
+        for friend_id in friends:
+            counts.update(self.friends(friend_id))
+
+        del counts[user_id]
+        for friend_id in friends:
+            del counts[friend_id]
+
+        # Break ties by user ID so that the suggestions are stable.
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+graph = FriendGraph()
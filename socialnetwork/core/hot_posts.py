@@ -0,0 +1,175 @@
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+from typing import Any, Optional
+
+from socialnetwork.core import info
+
+
+class HotPost:
+    """
+    A compact, read-only copy of a post.
+    """
+
+    __slots__ = ("id", "username", "content", "timestamp")
+
+    def __init__(
+        self, post_id: int, username: str, content: str, timestamp: str
+    ) -> None:
+        self.id = post_id
+        # Most users post many times, so share one copy of each username.
+        self.username = sys.intern(username)
+        self.content = content
+        self.timestamp = timestamp
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.timestamp, self.id
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "username": self.username,
+            "content": self.content,
+            "timestamp": self.timestamp,
+        }
+
+
+class HotPostBuffer:
+    """
+    The newest `size` posts, kept in memory to serve the first page of
+    the newsfeed without joining the posts and users tables.
+
+    Posts are appended as they are posted. Posts written by other
+    processes are found by comparing the newest post ID in the database
+    with `max_id`, the ID up to which every post has been seen.
+    """
+
+    def __init__(self, size: int = info.Server.hot_posts_size) -> None:
+        self.size = size
+        self.max_id = 0
+        self.loaded = False
+        # Sorted by (timestamp, ID), the order of the newsfeed, oldest first.
+        self._posts: list[HotPost] = []
+        self._keys: list[tuple[str, int]] = []
+        self._ids: set[int] = set()
+        self._lock = threading.Lock()
+
+    def _query(
+        self, database: sqlite3.Connection, where: str, parameters: tuple
+    ) -> list[HotPost]:
+        return [
+            HotPost(*post)
+            for post in database.execute(
+                f"""
+                SELECT posts.id, users.username, posts.content, posts.timestamp
+                FROM posts
+                INNER JOIN users
+                ON posts.user_id = users.id
+                {where}
+                """,
+                parameters,
+            )
+        ]
+
+    def load(self, database: sqlite3.Connection) -> None:
+        """
+        Replace the buffer with the newest posts in the database.
+
+        :param sqlite3.Connection database: The database connection.
+        """
+
+        max_id = database.execute("SELECT MAX(id) FROM posts").fetchone()[0] or 0
+        posts = self._query(
+            database,
+            "ORDER BY posts.timestamp DESC, posts.id DESC LIMIT ?",
+            (self.size,),
+        )
+        posts.reverse()
+        with self._lock:
+            self._posts = posts
+            self._keys = [post.key for post in posts]
+            self._ids = {post.id for post in posts}
+            self.max_id = max_id
+            self.loaded = True
+
+    def add(self, post: HotPost) -> None:
+        """
+        Add a new post, unless it is not among the newest posts.
+
+        :param HotPost post: The post.
+        """
+
+        with self._lock:
+            self._add(post)
+            if post.id == self.max_id + 1:
+                self.max_id = post.id
+
+    def _add(self, post: HotPost) -> None:
+        if post.id in self._ids:
+            return
+
+        index = bisect_left(self._keys, post.key)
+        if index == 0 and len(self._posts) >= self.size:
+            return
+
+        self._posts.insert(index, post)
+        self._keys.insert(index, post.key)
+        self._ids.add(post.id)
+        if len(self._posts) > self.size:
+            self._ids.discard(self._posts[0].id)
+            del self._posts[0]
+            del self._keys[0]
+
+    def refresh(self, database: sqlite3.Connection) -> None:
+        """
+        Add the posts written by other processes, or load the buffer if
+        it has not been loaded yet.
+
+        :param sqlite3.Connection database: The database connection.
+        """
+
+        if not self.loaded:
+            self.load(database)
+            return
+
+        max_id = database.execute("SELECT MAX(id) FROM posts").fetchone()[0] or 0
+        if max_id <= self.max_id:
+            return
+
+        posts = self._query(
+            database,
+            "WHERE posts.id > ? ORDER BY posts.id LIMIT ?",
+            (self.max_id, self.size + 1),
+        )
+        if len(posts) > self.size:
+            self.load(database)
+            return
+
+        with self._lock:
+            for post in posts:
+                self._add(post)
+
+            self.max_id = max(self.max_id, max_id)
+
+    def latest(
+        self, database: sqlite3.Connection, limit: int
+    ) -> Optional[list[dict[str, Any]]]:
+        """
+        Get the newest posts, newest first.
+
+        :param sqlite3.Connection database: The database connection.
+        :param int limit: The maximum number of posts.
+        :return Optional[list[dict[str, Any]]]: The posts, or None if the buffer is too small.
+        """
+
+        if limit > self.size:
+            return None
+
+        self.refresh(database)
+        with self._lock:
+            return [post.to_dict() for post in reversed(self._posts[-limit:])]
+
+
+buffer = HotPostBuffer()
@@ -1,4 +1,5 @@
 import os
+import secrets
 from pathlib import Path
 
 
@@ -19,6 +20,75 @@ class Server:
     host: str = "0.0.0.0"
     port: int = 5000
     debug: bool = True
+    workers: int = os.cpu_count() or 1  # The processes started by `--production`.
+    graceful_timeout: int = 30  # Seconds a stopping worker may finish its requests.
+    asgi_threads: int = 32  # The threads running the WSGI routes on an ASGI server.
     log_format: str = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
+    posts_per_page: int = 20
+    post_max_length: int = 140
+    people_per_page: int = 50
+    people_suggestions: int = 5
+    admin_matrix_tile: int = 50  # The rows and columns per adjacency matrix page.
+    # Posts of users with more friends than this are not copied to their
+    # friends' timelines, but read from the posts table instead.
+    timeline_fanout_limit: int = 1000
+    # The number of recent posts copied to each other's timelines on befriending.
+    timeline_backfill: int = 100
+    sse_buffer_size: int = 100  # The maximum unsent events per client.
+    sse_heartbeat: int = 15  # in seconds
+    # How often each `--production` worker checks for posts of the other workers.
+    sse_poll_interval: float = 1.0  # in seconds
+    cache_ttl: int = 60  # in seconds
+    cache_size: int = 10000  # The maximum values per cache.
+    post_card_cache_size: int = 5000  # The maximum rendered posts to keep.
+    hot_posts_size: int = 1000  # The newest posts kept in memory for the newsfeed.
+    # The periods of the trending hashtags and mentions, in seconds.
+    trending_windows: tuple[int, ...] = (60 * 60, 24 * 60 * 60)
+    trending_resolution: int = 5 * 60  # in seconds, the time counted as one bucket
+    # Each process saves its trending counts and reloads everyone's this often.
+    trending_sync_interval: int = 60  # in seconds
+    trending_size: int = 10  # The hashtags and mentions shown.
+    stream_chunk_size: int = 4096  # The characters per chunk of streamed pages.
+    static_max_age: int = 365 * 24 * 60 * 60  # in seconds, for fingerprinted files
+    gzip_static_mimetypes: tuple[str, ...] = (
+        "text/css",
+        "text/javascript",
+        "image/svg+xml",
+        "image/vnd.microsoft.icon",
+    )
+    gzip_mimetypes: tuple[str, ...] = ("text/html", "application/json")
+    gzip_min_size: int = 1024  # in bytes, smaller responses are sent as they are
+    gzip_level: int = 6
+    # Each process reloads its friendship graph this often, to see the
+    # friendships added by the other processes.
+    friend_graph_ttl: int = 60  # in seconds
+    database_pool_size: int = 8  # The maximum number of idle connections to keep.
+    database_pragmas: dict[str, str | int] = {"temp_store": "MEMORY"}
+    database_journal_mode: str = "WAL"
+    database_synchronous: str = "NORMAL"
+    database_mmap_size: int = 256 * 1024 * 1024  # in bytes
+    database_cache_size: int = -16 * 1024  # negative values are in KiB
+    database_busy_timeout: int = 5000  # in milliseconds
+    database_write_queue: bool = True  # Serialize writes through a single thread.
+    database_write_batch_size: int = 64  # The maximum writes per group commit.
+    bulk_batch_size: int = 10000  # The rows per transaction of the bulk imports.
+    password_iterations: int = 100000  # Existing hashes are upgraded on login.
+    hash_workers: int = os.cpu_count() or 1  # Set to 0 to hash in the request thread.
+    hash_max_pending: int = 4 * (os.cpu_count() or 1)
+    # Request timing and SQL profiling, exposed on /metrics.
+    profile_queries: bool = True
+    # The upper bounds of the request duration histogram buckets, in seconds.
+    metrics_buckets: tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+    metrics_allowed_addresses: tuple[str, ...] = ("127.0.0.1", "::1")
+    slow_request_threshold: float = 0.5  # in seconds
+    n_plus_one_threshold: int = 10  # Repeats of a statement within one request.
+    login_rate_limit: int = 10  # Attempts allowed per username or IP address...
+    login_rate_window: int = 60  # ...in this many seconds.
+    session_backend: str = "sqlite"  # "sqlite", "memory", "cookie" or "filesystem"
+    session_lifetime: int = 7 * 24 * 60 * 60  # in seconds
+    session_memory_size: int = 10000  # The maximum sessions kept by "memory".
+    # Set the environment variable when running more than one process, since
+    # cookies signed by one process must be accepted by the others.
+    secret_key: str = os.environ.get("SOCIALNETWORK_SECRET_KEY", secrets.token_hex(32))
     with open(Filepath.admin_magic, "r") as fopen:
         admin_magic: str = fopen.readline().lstrip().rstrip()
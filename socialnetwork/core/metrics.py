@@ -0,0 +1,321 @@
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+from socialnetwork.core import info
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Format labels for the Prometheus text format.
+
+    :param Labels labels: The label names and values.
+    :return str: The labels in braces, or an empty string if there are none.
+    """
+
+    if not labels:
+        return ""
+
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class CounterMetric:
+    """
+    A thread-safe Prometheus counter, with one value per set of labels.
+    """
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Increase the counter.
+
+        :param float amount: The amount to add, defaults to 1.0
+        :param str labels: The labels of the value to increase.
+        """
+
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        """
+        Render the counter in the Prometheus text format.
+
+        :return list[str]: The lines of the counter.
+        """
+
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(labels)} {value:g}")
+
+        return lines
+
+
+class HistogramMetric:
+    """
+    A thread-safe Prometheus histogram, with one set of buckets per set of labels.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float]) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        # The bucket counts are not cumulative until rendered.
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record a value.
+
+        :param float value: The value.
+        :param str labels: The labels of the histogram to record the value in.
+        """
+
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            record = self._values.get(key)
+            if record is None:
+                record = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+
+            record[0][index] += 1
+            record[1][0] += value
+
+    def render(self) -> list[str]:
+        """
+        Render the histogram in the Prometheus text format.
+
+        :return list[str]: The lines of the histogram.
+        """
+
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    bucket_labels = (
+                        *labels,
+                        ("le", "+Inf" if bound == float("inf") else f"{bound:g}"),
+                    )
+                    lines.append(
+                        f"{self.name}_bucket{format_labels(bucket_labels)} {cumulative}"
+                    )
+
+                lines.append(f"{self.name}_sum{format_labels(labels)} {total[0]:g}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+
+        return lines
+
+
+def render_gauges(
+    name: str, description: str, values: dict[Labels, float]
+) -> list[str]:
+    """
+    Render gauge values read from elsewhere in the Prometheus text format.
+
+    :param str name: The metric name.
+    :param str description: The metric description.
+    :param dict[Labels, float] values: The values, keyed by their labels.
+    :return list[str]: The lines of the gauge.
+    """
+
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+    for labels, value in values.items():
+        lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+    return lines
+
+
+request_duration = HistogramMetric(
+    "socialnetwork_request_duration_seconds",
+    "The time spent handling requests.",
+    info.Server.metrics_buckets,
+)
+requests = CounterMetric(
+    "socialnetwork_requests_total", "The requests handled, by status code."
+)
+queries = CounterMetric(
+    "socialnetwork_database_queries_total", "The SQL statements executed."
+)
+query_duration = CounterMetric(
+    "socialnetwork_database_query_seconds_total",
+    "The time spent executing SQL statements.",
+)
+n_plus_one = CounterMetric(
+    "socialnetwork_n_plus_one_requests_total",
+    "The requests that repeated a SQL statement too many times.",
+)
+slow_requests = CounterMetric(
+    "socialnetwork_slow_requests_total",
+    "The requests slower than info.Server.slow_request_threshold.",
+)
+
+
+class RequestProfile:
+    """
+    The SQL statements executed while handling one request.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.queries: list[tuple[str, float]] = []
+
+    @property
+    def query_time(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def repeated_queries(
+        self, threshold: int = info.Server.n_plus_one_threshold
+    ) -> list[tuple[str, int]]:
+        """
+        Get the statements executed at least `threshold` times, which
+        usually means that a loop runs one query per item (an N+1 query).
+
+        :param int threshold: The minimum executions, defaults to info.Server.n_plus_one_threshold
+        :return list[tuple[str, int]]: The statements and their number of executions.
+        """
+
+        counts = Counter(sql for sql, _ in self.queries)
+        return [
+            (sql, count) for sql, count in counts.most_common() if count >= threshold
+        ]
+
+    def slowest_queries(self, limit: int = 5) -> list[tuple[str, float]]:
+        """
+        Get the slowest statements.
+
+        :param int limit: The maximum number of statements, defaults to 5
+        :return list[tuple[str, float]]: The statements and their duration in seconds.
+        """
+
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+_local = threading.local()
+
+
+def start_request() -> RequestProfile:
+    """
+    Start profiling the SQL statements of the current thread.
+
+    :return RequestProfile: The new profile.
+    """
+
+    profile = _local.profile = RequestProfile()
+    return profile
+
+
+def current_request() -> Optional[RequestProfile]:
+    """
+    Get the profile of the current thread, without stopping it.
+
+    :return Optional[RequestProfile]: The profile, or None if none was started.
+    """
+
+    return getattr(_local, "profile", None)
+
+
+def finish_request() -> Optional[RequestProfile]:
+    """
+    Stop profiling the SQL statements of the current thread.
+
+    :return Optional[RequestProfile]: The profile, or None if none was started.
+    """
+
+    profile: Optional[RequestProfile] = getattr(_local, "profile", None)
+    _local.profile = None
+    return profile
+
+
+@contextmanager
+def profiling(profile: Optional[RequestProfile]) -> Iterator[None]:
+    """
+    Record the SQL statements of the current thread in the given profile,
+    such as those of a write queued by a request in another thread.
+
+    :param Optional[RequestProfile] profile: The profile, or None to record nothing.
+    """
+
+    previous: Optional[RequestProfile] = getattr(_local, "profile", None)
+    _local.profile = profile
+    try:
+        yield
+
+    finally:
+        _local.profile = previous
+
+
+def record_query(sql: str, duration: float) -> None:
+    """
+    Record an executed SQL statement in the profile of the current thread.
+
+    :param str sql: The statement.
+    :param float duration: The execution time in seconds.
+    """
+
+    profile: Optional[RequestProfile] = getattr(_local, "profile", None)
+    if profile is not None:
+        profile.queries.append((re.sub(r"\s+", " ", sql).strip(), duration))
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    A cursor that records the statements it executes.
+    """
+
+    def execute(self, sql: str, parameters: Any = (), /) -> "ProfiledCursor":
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql: str, parameters: Any, /) -> "ProfiledCursor":
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    A connection that records the statements it executes, including
+    those of its cursors.
+    """
+
+    def cursor(self, factory: Any = ProfiledCursor) -> sqlite3.Cursor:  # type: ignore[override]
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters: Any, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, parameters)
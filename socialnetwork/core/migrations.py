@@ -0,0 +1,306 @@
+import json
+from typing import Callable, NamedTuple, Optional
+
+from socialnetwork.core import trending
+
+
+class MigrationError(ValueError):
+    """
+    A migration cannot be applied to the data in the database.
+    """
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: tuple[str, ...]
+    # A query returning the values that prevent the migration, if any, and
+    # the error explaining them, where "{}" is replaced with the values.
+    check: Optional[tuple[str, str]] = None
+
+
+# The SQL functions of one argument that the migrations may call. They are
+# registered on the connection that applies the migrations.
+FUNCTIONS: dict[str, Callable[[str], str]] = {
+    "extract_hashtags": lambda content: json.dumps(trending.extract_hashtags(content)),
+    "extract_mentions": lambda content: json.dumps(trending.extract_mentions(content)),
+}
+
+# The schema versions of the database, in order. The version of a database
+# is stored in its `user_version` PRAGMA, and only the migrations newer than
+# it are applied. Never edit a migration that has been released; add a new one.
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        1,
+        "Create the users, user_info, posts and friendships tables.",
+        (
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                password TEXT NOT NULL,
+                is_admin BOOLEAN NOT NULL,
+                welcomed BOOLEAN NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_info (
+                user_id INTEGER PRIMARY KEY,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                email TEXT,
+                phone_number TEXT,
+                address TEXT,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS friendships (
+                user_id1 INTEGER, user_id2 INTEGER,
+                PRIMARY KEY (user_id1, user_id2),
+                FOREIGN KEY(user_id1) REFERENCES users(id),
+                FOREIGN KEY(user_id2) REFERENCES users(id)
+            )
+            """,
+        ),
+    ),
+    Migration(
+        2,
+        "Index posts by timestamp and author, and users by username.",
+        (
+            "CREATE INDEX IF NOT EXISTS posts_timestamp ON posts (timestamp DESC)",
+            """
+            CREATE INDEX IF NOT EXISTS posts_user_id_timestamp
+            ON posts (user_id, timestamp)
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users (username)",
+        ),
+        # Usernames were not unique before this migration.
+        (
+            "SELECT username FROM users GROUP BY username HAVING COUNT(*) > 1",
+            "Usernames must be unique, but these are used by more than one user: {}."
+            " Rename or merge those users, then start the server again.",
+        ),
+    ),
+    Migration(
+        3,
+        "Index posts by (timestamp, id) for keyset pagination of the newsfeed.",
+        (
+            # Scanned backwards, this index yields posts in (timestamp, id)
+            # descending order without a sort step, unlike `posts_timestamp`.
+            "CREATE INDEX IF NOT EXISTS posts_timestamp_id ON posts (timestamp, id)",
+            "DROP INDEX IF EXISTS posts_timestamp",
+        ),
+    ),
+    Migration(
+        4,
+        "Add a full-text search index of the posts.",
+        (
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts
+            USING fts5(content, content='posts', content_rowid='id')
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts
+            BEGIN
+                INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts
+            BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts
+            BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+                INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content);
+            END
+            """,
+            # Index the posts that existed before this migration.
+            "INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')",
+        ),
+    ),
+    Migration(
+        5,
+        "Add the home timelines of the users.",
+        (
+            """
+            CREATE TABLE IF NOT EXISTS timelines (
+                user_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, post_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            # Fill the timelines with the posts that existed before this migration.
+            """
+            INSERT OR IGNORE INTO timelines (user_id, post_id)
+            SELECT user_id, id FROM posts
+            """,
+            """
+            INSERT OR IGNORE INTO timelines (user_id, post_id)
+            SELECT friendships.user_id1, posts.id
+            FROM friendships
+            INNER JOIN posts
+            ON posts.user_id = friendships.user_id2
+            """,
+        ),
+    ),
+    Migration(
+        6,
+        "Add the sessions table for the SQLite session store.",
+        (
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)",
+        ),
+    ),
+    Migration(
+        7,
+        "Add the hashtags and mentions of the posts, and the trending counts.",
+        (
+            # Keyed by tag first, so the posts of a hashtag are read in order.
+            """
+            CREATE TABLE IF NOT EXISTS hashtags (
+                tag TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (tag, post_id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mentions (
+                user_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, post_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            # The counts per time bucket of info.Server.trending_resolution seconds.
+            """
+            CREATE TABLE IF NOT EXISTS trending_counts (
+                bucket INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, kind, name)
+            ) WITHOUT ROWID
+            """,
+            # Fill the hashtags and mentions with the posts that existed
+            # before this migration.
+            """
+            INSERT OR IGNORE INTO hashtags (tag, post_id)
+            SELECT tags.value, posts.id
+            FROM posts, json_each(extract_hashtags(posts.content)) AS tags
+            WHERE instr(posts.content, '#') > 0
+            """,
+            """
+            INSERT OR IGNORE INTO mentions (user_id, post_id)
+            SELECT users.id, posts.id
+            FROM posts, json_each(extract_mentions(posts.content)) AS usernames
+            INNER JOIN users
+            ON users.username = usernames.value
+            WHERE instr(posts.content, '@') > 0
+            """,
+        ),
+    ),
+    Migration(
+        8,
+        "Key the timelines, hashtags and mentions by the timestamp of the posts.",
+        (
+            # Imported posts may be older than posts with a lower ID, so
+            # these are read in (timestamp, post_id) order, like the newsfeed.
+            """
+            CREATE TABLE timelines_by_time (
+                user_id INTEGER NOT NULL,
+                timestamp DATETIME NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, timestamp, post_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO timelines_by_time (user_id, timestamp, post_id)
+            SELECT timelines.user_id, posts.timestamp, timelines.post_id
+            FROM timelines
+            INNER JOIN posts
+            ON posts.id = timelines.post_id
+            """,
+            "DROP TABLE timelines",
+            "ALTER TABLE timelines_by_time RENAME TO timelines",
+            """
+            CREATE TABLE hashtags_by_time (
+                tag TEXT NOT NULL,
+                timestamp DATETIME NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (tag, timestamp, post_id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO hashtags_by_time (tag, timestamp, post_id)
+            SELECT hashtags.tag, posts.timestamp, hashtags.post_id
+            FROM hashtags
+            INNER JOIN posts
+            ON posts.id = hashtags.post_id
+            """,
+            "DROP TABLE hashtags",
+            "ALTER TABLE hashtags_by_time RENAME TO hashtags",
+            """
+            CREATE TABLE mentions_by_time (
+                user_id INTEGER NOT NULL,
+                timestamp DATETIME NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, timestamp, post_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(post_id) REFERENCES posts(id)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO mentions_by_time (user_id, timestamp, post_id)
+            SELECT mentions.user_id, posts.timestamp, mentions.post_id
+            FROM mentions
+            INNER JOIN posts
+            ON posts.id = mentions.post_id
+            """,
+            "DROP TABLE mentions",
+            "ALTER TABLE mentions_by_time RENAME TO mentions",
+        ),
+    ),
+    Migration(
+        9,
+        "Log the rebuilds of the trending counts.",
+        (
+            # The running servers compare the number of rebuilds with the
+            # one they last loaded, to discard the counts a rebuild included.
+            """
+            CREATE TABLE IF NOT EXISTS trending_rebuilds (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ),
+    ),
+)
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from socialnetwork.core import info
+
+
+class HasherBusyError(Exception):
+    """
+    Raised when too many passwords are already waiting to be hashed.
+    """
+
+
+def pbkdf2_hex(password: str, salt: str, iterations: int) -> str:
+    """
+    Hash the password with PBKDF2-HMAC-SHA256 and return its hex digest.
+
+    :param str password: The password to hash.
+    :param str salt: The salt of the password.
+    :param int iterations: The number of iterations.
+    :return str: The hashed password.
+    """
+
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), salt.encode(), iterations=iterations, dklen=32
+    ).hex()
+
+
+class PasswordHasher:
+    """
+    Hash passwords in a pool of worker processes, so that slow hashing
+    does not hold the request threads or the GIL.
+
+    At most `max_pending` passwords are hashed or waiting at a time;
+    more requests are rejected with a HasherBusyError.
+    """
+
+    def __init__(
+        self,
+        workers: int = info.Server.hash_workers,
+        max_pending: int = info.Server.hash_max_pending,
+    ) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats: dict[str, float] = {
+            "hashed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+        }
+
+    def _get_executor(self) -> Executor | None:
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+            return self._executor
+
+    def start(self) -> None:
+        """
+        Start the worker processes now instead of on the first hash, so
+        that they are forked before the caller starts any threads.
+        """
+
+        executor = self._get_executor()
+        if executor is not None:
+            # The processes are started with the first task.
+            executor.submit(int).result()
+
+    def hash(self, password: str, salt: str, iterations: int) -> str:
+        """
+        Hash a password.
+
+        Throws HasherBusyError if the hasher is saturated.
+
+        :param str password: The password to hash.
+        :param str salt: The salt of the password.
+        :param int iterations: The number of iterations.
+        :return str: The hashed password.
+        """
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+
+            raise HasherBusyError("Too many login attempts. Please try again later.")
+
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self._stats["in_flight"] += 1
+
+            executor = self._get_executor()
+            if executor is None:
+                return pbkdf2_hex(password, salt, iterations)
+
+            return executor.submit(pbkdf2_hex, password, salt, iterations).result()
+
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._slots.release()
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["hashed"] += 1
+                self._stats["total_ms"] += elapsed
+                self._stats["max_ms"] = max(self._stats["max_ms"], elapsed)
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes.
+        """
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Get the statistics of the hasher.
+
+        :return dict[str, float]: The hashing counters and latencies in milliseconds.
+        """
+
+        with self._lock:
+            hashed = self._stats["hashed"]
+            return {
+                **self._stats,
+                "mean_ms": self._stats["total_ms"] / hashed if hashed else 0.0,
+            }
+
+
+hasher = PasswordHasher()
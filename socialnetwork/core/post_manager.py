@@ -1,6 +1,108 @@
-from typing import Optional
+import re
+import sqlite3
+from datetime import date, timedelta
+from typing import Any, Iterator, Mapping, NamedTuple, Optional
 
-from socialnetwork.core.database_manager import DatabaseManager
+from socialnetwork.core import broadcaster, hot_posts, info, trending
+from socialnetwork.core.database_manager import DatabaseManager, pool
+
+# The position of a post in the newsfeed, as (timestamp, post ID).
+Cursor = tuple[str, int]
+# The position of a post in the search results, as (rank, post ID).
+SearchCursor = tuple[float, int]
+
+
+def encode_cursor(post: dict[str, Any], key: str = "timestamp") -> str:
+    """
+    Encode the position of a post into a cursor string for the next page.
+
+    :param dict[str, Any] post: The last post of the current page.
+    :param str key: The field the page is sorted by, defaults to "timestamp"
+    :return str: The cursor string.
+    """
+
+    return f"{post[key]}|{post['id']}"
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor string from `encode_cursor()`.
+
+    Throws ValueError if the cursor is malformed.
+
+    :param str cursor: The cursor string.
+    :return Cursor: The timestamp and ID of the last post of the previous page.
+    """
+
+    timestamp, separator, post_id = cursor.rpartition("|")
+    if not separator:
+        raise ValueError("Invalid cursor.")
+
+    return timestamp, int(post_id)
+
+
+class PostFilters(NamedTuple):
+    """
+    The filters and order of the newsfeed. Every combination is served by
+    an index: the posts by (timestamp, id), or by (user_id, timestamp)
+    for authors and friends.
+    """
+
+    # The username of the author.
+    author: Optional[str] = None
+    # The oldest timestamp, inclusive.
+    since: Optional[str] = None
+    # The newest timestamp, exclusive.
+    until: Optional[str] = None
+    # Only get posts of this user and their friends.
+    friends_of: Optional[int] = None
+    ascending: bool = False
+
+
+def parse_filters(args: Mapping[str, str], user_id: int) -> PostFilters:
+    """
+    Read the newsfeed filters from the query parameters `author`,
+    `since` and `until` (dates as YYYY-MM-DD, both inclusive),
+    `feed=friends` and `order` ("asc" or "desc").
+
+    Throws ValueError if a parameter is malformed.
+
+    :param Mapping[str, str] args: The query parameters.
+    :param int user_id: The ID of the user, for the friends feed.
+    :return PostFilters: The filters.
+    """
+
+    order = args.get("order") or "desc"
+    if order not in ("asc", "desc"):
+        raise ValueError("Invalid order.")
+
+    since = args.get("since")
+    until = args.get("until")
+    return PostFilters(
+        author=args.get("author") or None,
+        since=date.fromisoformat(since).isoformat() if since else None,
+        until=(date.fromisoformat(until) + timedelta(days=1)).isoformat()
+        if until
+        else None,
+        friends_of=user_id if args.get("feed") == "friends" else None,
+        ascending=order == "asc",
+    )
+
+
+def to_match_query(query: str) -> str | None:
+    """
+    Convert a search query into an FTS5 query that matches posts
+    containing every word of the query, or words starting with it.
+
+    :param str query: The search query of the user.
+    :return str | None: The FTS5 query, or None if the query has no words.
+    """
+
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+
+    return " ".join(f'"{word}"*' for word in words)
 
 
 class PostManager(DatabaseManager):
@@ -11,65 +113,717 @@ class PostManager(DatabaseManager):
     def __init__(self) -> None:
         super().__init__()
 
-    def post_message(self, user_id: int, message: str) -> None:
+    def post_message(self, user_id: int, message: str) -> int:
         """
-        Post a message to the database.
+        Post a message to the database, and add it to the timelines
+        of the user and their friends.
 
         :param int user_id: The ID of the user who owns the post.
         :param str message: The message to post.
+        :return int: The ID of the new post.
         """
 
-        cursor = self.database.cursor()
-
         message = message.lstrip().rstrip()
-        cursor.execute(
+        hashtags = trending.extract_hashtags(message)
+        mentions = self._get_user_ids(trending.extract_mentions(message))
+        post_id = self._write(
+            lambda cursor: self._post_message(
+                cursor, user_id, message, hashtags, list(mentions.values())
+            )
+        )
+        trending.trends.record(hashtags, mentions)
+        trends_sync.ensure_started()
+
+        post = self.get_post(post_id)
+        if post is not None:
+            hot_posts.buffer.add(
+                hot_posts.HotPost(
+                    post["id"], post["username"], post["content"], post["timestamp"]
+                )
+            )
+            if broadcaster.posts.has_subscribers():
+                broadcaster.posts.publish(user_id, post, key=post_id)
+
+        return post_id
+
+    @staticmethod
+    def _post_message(
+        cursor: sqlite3.Cursor,
+        user_id: int,
+        message: str,
+        hashtags: list[str],
+        mention_ids: list[int],
+    ) -> int:
+        post_id: int = cursor.execute(
             "INSERT INTO posts (user_id, content) VALUES (?, ?);",
             (user_id, message),
+        ).lastrowid  # type: ignore
+        timestamp: str = cursor.execute(
+            "SELECT timestamp FROM posts WHERE id = ?", (post_id,)
+        ).fetchone()[0]
+        cursor.executemany(
+            "INSERT INTO hashtags (tag, timestamp, post_id) VALUES (?, ?, ?)",
+            ((tag, timestamp, post_id) for tag in hashtags),
+        )
+        cursor.executemany(
+            "INSERT INTO mentions (user_id, timestamp, post_id) VALUES (?, ?, ?)",
+            ((mention_id, timestamp, post_id) for mention_id in mention_ids),
+        )
+        cursor.execute(
+            "INSERT INTO timelines (user_id, timestamp, post_id) VALUES (?, ?, ?)",
+            (user_id, timestamp, post_id),
+        )
+
+        # Users with too many friends are read by their friends on demand instead.
+        cursor.execute(
+            """
+            INSERT INTO timelines (user_id, timestamp, post_id)
+            SELECT user_id2, ?, ?
+            FROM friendships
+            WHERE user_id1 = ?
+            AND (
+                SELECT COUNT(*)
+                FROM (SELECT 1 FROM friendships WHERE user_id1 = ? LIMIT ?)
+            ) <= ?
+            """,
+            (
+                timestamp,
+                post_id,
+                user_id,
+                user_id,
+                info.Server.timeline_fanout_limit + 1,
+                info.Server.timeline_fanout_limit,
+            ),
         )
 
-        self.database.commit()
+        return post_id
 
-    def get_posts(self, user_id: Optional[int] = None) -> list[dict[str, str]]:
+    def _get_user_ids(self, usernames: list[str]) -> dict[str, int]:
+        if not usernames:
+            return {}
+
+        return dict(
+            self.database.execute(
+                f"""
+                SELECT username, id
+                FROM users
+                WHERE username IN ({", ".join("?" * len(usernames))})
+                """,
+                usernames,
+            )
+        )
+
+    def get_post(self, post_id: int) -> Optional[dict[str, str]]:
         """
-        Get all posts or posts of a specific user.
+        Get a post.
+
+        :param int post_id: The post ID.
+        :return Optional[dict[str, str]]: The post, or None if it does not exist.
+        """
+
+        post = self.database.execute(
+            """
+            SELECT posts.id, users.username, posts.content, posts.timestamp
+            FROM posts
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE posts.id = ?
+            """,
+            (post_id,),
+        ).fetchone()
+        if post is None:
+            return None
+
+        return {
+            "id": post[0],
+            "username": post[1],
+            "content": post[2],
+            "timestamp": post[3],
+        }
+
+    def load_hot_posts(self) -> None:
+        """
+        Load the newest posts into memory, so that the first newsfeed
+        request does not have to.
+        """
+
+        hot_posts.buffer.load(self.database)
+
+    def get_latest_post_id(self) -> int:
+        """
+        Get the ID of the newest post.
+
+        :return int: The post ID, or 0 if there are no posts.
+        """
+
+        return self.database.execute("SELECT MAX(id) FROM posts").fetchone()[0] or 0
+
+    def publish_posts(
+        self, after_id: int, limit: int = info.Server.sse_buffer_size
+    ) -> int:
+        """
+        Publish the posts written after a post to `broadcaster.posts`,
+        including those written by other processes. Posts that were
+        already published are skipped.
+
+        :param int after_id: The ID of the last post that was checked.
+        :param int limit: The maximum number of posts, defaults to info.Server.sse_buffer_size
+        :return int: The ID of the last post that was checked now.
+        """
+
+        posts = self.database.execute(
+            """
+            SELECT posts.id, posts.user_id, users.username, posts.content, posts.timestamp
+            FROM posts
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE posts.id > ?
+            ORDER BY posts.id
+            LIMIT ?
+            """,
+            (after_id, limit),
+        ).fetchall()
+        for post in posts:
+            broadcaster.posts.publish(
+                post[1],
+                {
+                    "id": post[0],
+                    "username": post[2],
+                    "content": post[3],
+                    "timestamp": post[4],
+                },
+                key=post[0],
+            )
+
+        return posts[-1][0] if posts else after_id
+
+    def get_posts(
+        self,
+        user_id: Optional[int] = None,
+        cursor: Optional[Cursor] = None,
+        limit: Optional[int] = info.Server.posts_per_page,
+        filters: PostFilters = PostFilters(),
+    ) -> list[dict[str, str]]:
+        """
+        Get a page of all posts or posts of a specific user, newest first
+        unless the filters say otherwise.
 
         :param Optional[int] user_id: The user ID, defaults to None
+        :param Optional[Cursor] cursor: Only get posts after this position, defaults to None
+        :param Optional[int] limit: The maximum number of posts, or None for no limit, defaults to info.Server.posts_per_page
+        :param PostFilters filters: The filters and order, defaults to every post, newest first
         :return list[dict[str,str]]: A list of posts.
         """
 
-        cursor = self.database.cursor()
+        return list(self.iter_posts(user_id, cursor, limit, filters))
+
+    def iter_posts(
+        self,
+        user_id: Optional[int] = None,
+        cursor: Optional[Cursor] = None,
+        limit: Optional[int] = info.Server.posts_per_page,
+        filters: PostFilters = PostFilters(),
+    ) -> Iterator[dict[str, str]]:
+        """
+        Like `get_posts()`, but read the posts from the database cursor as
+        they are iterated, instead of all at once.
+
+        :param Optional[int] user_id: The user ID, defaults to None
+        :param Optional[Cursor] cursor: Only get posts after this position, defaults to None
+        :param Optional[int] limit: The maximum number of posts, or None for no limit, defaults to info.Server.posts_per_page
+        :param PostFilters filters: The filters and order, defaults to every post, newest first
+        :return Iterator[dict[str,str]]: The posts.
+        """
+
+        if user_id is None and limit is not None:
+            # The first page of the newsfeed is served from memory.
+            if filters == PostFilters() and cursor is None:
+                posts = hot_posts.buffer.latest(self.database, limit)
+                if posts is not None:
+                    return iter(posts)
 
-        if user_id is None:
-            cursor.execute(
+            # The unfiltered friends feed is precomputed.
+            if filters.friends_of is not None and filters == PostFilters(
+                friends_of=filters.friends_of
+            ):
+                return self.iter_timeline(filters.friends_of, cursor, limit)
+
+        sql, parameters = self._build_posts_query(user_id, cursor, limit, filters)
+        posts = self.database.execute(sql, parameters)
+
+        return (
+            {
+                "id": post[0],
+                "username": post[1],
+                "content": post[2],
+                "timestamp": post[3],
+            }
+            for post in posts
+        )
+
+    @staticmethod
+    def _build_posts_query(
+        user_id: Optional[int],
+        cursor: Optional[Cursor],
+        limit: Optional[int],
+        filters: PostFilters,
+    ) -> tuple[str, list[Any]]:
+        conditions: list[str] = []
+        parameters: list[Any] = []
+        if user_id is not None:
+            conditions.append("posts.user_id = ?")
+            parameters.append(user_id)
+
+        if filters.author is not None:
+            conditions.append(
+                "posts.user_id = (SELECT id FROM users WHERE username = ?)"
+            )
+            parameters.append(filters.author)
+
+        if filters.friends_of is not None:
+            # Read through (user_id, timestamp) once per friend, then sort.
+            conditions.append(
                 """
-                SELECT posts.id, users.username, posts.content, posts.timestamp
-                FROM posts
-                INNER JOIN users
-                ON posts.user_id = users.id
-                ORDER BY posts.timestamp DESC
+                posts.user_id IN (
+                    SELECT user_id2 FROM friendships WHERE user_id1 = ?
+                    UNION ALL
+                    SELECT ?
+                )
                 """
             )
-        else:
-            cursor.execute(
+            parameters.extend((filters.friends_of, filters.friends_of))
+
+        if filters.since is not None:
+            conditions.append("posts.timestamp >= ?")
+            parameters.append(filters.since)
+
+        if filters.until is not None:
+            conditions.append("posts.timestamp < ?")
+            parameters.append(filters.until)
+
+        if cursor is not None:
+            conditions.append(
+                f"(posts.timestamp, posts.id) {'>' if filters.ascending else '<'} (?, ?)"
+            )
+            parameters.extend(cursor)
+
+        order = "ASC" if filters.ascending else "DESC"
+        parameters.append(-1 if limit is None else limit)
+        sql = f"""
+            SELECT posts.id, users.username, posts.content, posts.timestamp
+            FROM posts
+            INNER JOIN users
+            ON posts.user_id = users.id
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY posts.timestamp {order}, posts.id {order}
+            LIMIT ?
+            """
+        return sql, parameters
+
+    def explain_posts(
+        self,
+        user_id: Optional[int] = None,
+        cursor: Optional[Cursor] = None,
+        filters: PostFilters = PostFilters(),
+    ) -> list[str]:
+        """
+        Get the query plan SQLite uses for `get_posts()`, bypassing the
+        in-memory and precomputed feeds.
+
+        :param Optional[int] user_id: The user ID, defaults to None
+        :param Optional[Cursor] cursor: Only get posts after this position, defaults to None
+        :param PostFilters filters: The filters and order, defaults to every post, newest first
+        :return list[str]: The steps of the plan, e.g. "SEARCH posts USING INDEX ...".
+        """
+
+        sql, parameters = self._build_posts_query(
+            user_id, cursor, info.Server.posts_per_page, filters
+        )
+        return [
+            step[3]
+            for step in self.database.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        ]
+
+    def get_timeline(
+        self,
+        user_id: int,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> list[dict[str, str]]:
+        """
+        Get a page of the home timeline of a user, which contains the posts
+        of the user and their friends, newest first.
+
+        :param int user_id: The user ID.
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return list[dict[str,str]]: A list of posts.
+        """
+
+        return list(self.iter_timeline(user_id, cursor, limit))
+
+    def iter_timeline(
+        self,
+        user_id: int,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> Iterator[dict[str, str]]:
+        """
+        Like `get_timeline()`, but read the posts from the database cursor
+        as they are iterated, instead of all at once.
+
+        :param int user_id: The user ID.
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return Iterator[dict[str,str]]: The posts.
+        """
+
+        # Like the newsfeed, the timeline is paged by (timestamp, id), since
+        # imported posts may be older than posts with a lower ID.
+        before: tuple[Any, ...] = () if cursor is None else tuple(cursor)
+        posts = self.database.execute(
+            f"""
+            SELECT posts.id, users.username, posts.content, posts.timestamp
+            FROM posts
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE posts.id IN (
+                SELECT post_id FROM (
+                    SELECT timelines.post_id
+                    FROM timelines
+                    WHERE timelines.user_id = ?
+                    {"AND (timelines.timestamp, timelines.post_id) < (?, ?)" if before else ""}
+                    ORDER BY timelines.timestamp DESC, timelines.post_id DESC
+                    LIMIT ?
+                )
+                UNION
+                SELECT id FROM (
+                    SELECT posts.id
+                    FROM friendships
+                    INNER JOIN posts
+                    ON posts.user_id = friendships.user_id2
+                    WHERE friendships.user_id1 = ?
+                    {"AND (posts.timestamp, posts.id) < (?, ?)" if before else ""}
+                    AND (
+                        SELECT COUNT(*)
+                        FROM (
+                            SELECT 1 FROM friendships AS others
+                            WHERE others.user_id1 = friendships.user_id2
+                            LIMIT ?
+                        )
+                    ) > ?
+                    ORDER BY posts.timestamp DESC, posts.id DESC
+                    LIMIT ?
+                )
+            )
+            ORDER BY posts.timestamp DESC, posts.id DESC
+            LIMIT ?
+            """,
+            (
+                user_id,
+                *before,
+                limit,
+                user_id,
+                *before,
+                info.Server.timeline_fanout_limit + 1,
+                info.Server.timeline_fanout_limit,
+                limit,
+                limit,
+            ),
+        )
+
+        return (
+            {
+                "id": post[0],
+                "username": post[1],
+                "content": post[2],
+                "timestamp": post[3],
+            }
+            for post in posts
+        )
+
+    def get_hashtag_posts(
+        self,
+        tag: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> list[dict[str, str]]:
+        """
+        Get a page of the posts with a hashtag, newest first.
+
+        :param str tag: The hashtag, with or without the "#".
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return list[dict[str,str]]: A list of posts.
+        """
+
+        return list(self.iter_hashtag_posts(tag, cursor, limit))
+
+    def iter_hashtag_posts(
+        self,
+        tag: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> Iterator[dict[str, str]]:
+        """
+        Like `get_hashtag_posts()`, but read the posts from the database
+        cursor as they are iterated, instead of all at once.
+
+        :param str tag: The hashtag, with or without the "#".
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return Iterator[dict[str,str]]: The posts.
+        """
+
+        # Like the timelines, the hashtags are paged by (timestamp, id).
+        before: tuple[Any, ...] = () if cursor is None else tuple(cursor)
+        posts = self.database.execute(
+            f"""
+            SELECT posts.id, users.username, posts.content, posts.timestamp
+            FROM hashtags
+            INNER JOIN posts
+            ON posts.id = hashtags.post_id
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE hashtags.tag = ?
+            {"AND (hashtags.timestamp, hashtags.post_id) < (?, ?)" if before else ""}
+            ORDER BY hashtags.timestamp DESC, hashtags.post_id DESC
+            LIMIT ?
+            """,
+            (tag.removeprefix("#").lower(), *before, limit),
+        )
+
+        return (
+            {
+                "id": post[0],
+                "username": post[1],
+                "content": post[2],
+                "timestamp": post[3],
+            }
+            for post in posts
+        )
+
+    def get_mention_posts(
+        self,
+        username: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> list[dict[str, str]]:
+        """
+        Get a page of the posts mentioning a user, newest first.
+
+        :param str username: The username, with or without the "@".
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return list[dict[str,str]]: A list of posts.
+        """
+
+        return list(self.iter_mention_posts(username, cursor, limit))
+
+    def iter_mention_posts(
+        self,
+        username: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = info.Server.posts_per_page,
+    ) -> Iterator[dict[str, str]]:
+        """
+        Like `get_mention_posts()`, but read the posts from the database
+        cursor as they are iterated, instead of all at once.
+
+        :param str username: The username, with or without the "@".
+        :param Optional[Cursor] cursor: Only get posts older than this position, defaults to None
+        :param int limit: The maximum number of posts, defaults to info.Server.posts_per_page
+        :return Iterator[dict[str,str]]: The posts.
+        """
+
+        # Like the hashtags, the mentions are paged by (timestamp, id).
+        before: tuple[Any, ...] = () if cursor is None else tuple(cursor)
+        posts = self.database.execute(
+            f"""
+            SELECT posts.id, users.username, posts.content, posts.timestamp
+            FROM mentions
+            INNER JOIN posts
+            ON posts.id = mentions.post_id
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE mentions.user_id = (SELECT id FROM users WHERE username = ?)
+            {"AND (mentions.timestamp, mentions.post_id) < (?, ?)" if before else ""}
+            ORDER BY mentions.timestamp DESC, mentions.post_id DESC
+            LIMIT ?
+            """,
+            (username.removeprefix("@"), *before, limit),
+        )
+
+        return (
+            {
+                "id": post[0],
+                "username": post[1],
+                "content": post[2],
+                "timestamp": post[3],
+            }
+            for post in posts
+        )
+
+    def get_trending(
+        self, kind: str, window: int, limit: int = info.Server.trending_size
+    ) -> list[tuple[str, int]]:
+        """
+        Get the most used hashtags or mentioned usernames of a period, from
+        the counts kept in memory.
+
+        :param str kind: trending.HASHTAG or trending.MENTION.
+        :param int window: The period in seconds, one of info.Server.trending_windows.
+        :param int limit: The maximum number of names, defaults to info.Server.trending_size
+        :return list[tuple[str, int]]: The names and their counts, highest first.
+        """
+
+        # The counts are saved and reloaded in the background, not by readers.
+        trends_sync.ensure_started()
+        return trending.trends.top(kind, window, limit)
+
+    def load_trends(self) -> None:
+        """
+        Load the trending counts saved by every process.
+        """
+
+        # Read first, a rebuild in between makes the next sync discard
+        # the counts of this process instead of counting them twice.
+        generation = self._get_trends_generation(self.database.cursor())
+        trending.trends.load(
+            self.database.execute(
                 """
-                SELECT posts.id, users.username, posts.content, posts.timestamp
-                FROM posts
-                INNER JOIN users
-                ON posts.user_id = users.id
-                WHERE users.id = ?
-                ORDER BY posts.timestamp DESC
+                SELECT bucket, kind, name, count
+                FROM trending_counts
+                WHERE bucket > ?
+                ORDER BY bucket
                 """,
-                (user_id,),
+                (trending.trends.expired_bucket(),),
             )
+        )
+        trending.trends.generation = generation
 
-        posts = cursor.fetchall()
+    def sync_trends(self) -> None:
+        """
+        Save the trending counts of this process, and load those of every process.
+        """
 
-        return [
+        counts = trending.trends.take_pending()
+        expired = trending.trends.expired_bucket()
+        generation = trending.trends.generation
+        try:
+            self._write(
+                lambda cursor: self._save_trends(cursor, counts, expired, generation)
+            )
+
+        except Exception:
+            trending.trends.restore_pending(counts)
+            raise
+
+        self.load_trends()
+
+    @staticmethod
+    def _get_trends_generation(cursor: sqlite3.Cursor) -> int:
+        return cursor.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM trending_rebuilds"
+        ).fetchone()[0]
+
+    @classmethod
+    def _save_trends(
+        cls,
+        cursor: sqlite3.Cursor,
+        counts: list[tuple[int, str, str, int]],
+        expired: int,
+        generation: Optional[int],
+    ) -> None:
+        # The counts taken before a rebuild were counted by it.
+        if generation in (None, cls._get_trends_generation(cursor)):
+            cursor.executemany(
+                """
+                INSERT INTO trending_counts (bucket, kind, name, count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (bucket, kind, name) DO UPDATE SET count = count + excluded.count
+                """,
+                counts,
+            )
+
+        cursor.execute("DELETE FROM trending_counts WHERE bucket <= ?", (expired,))
+
+    def search_posts(
+        self,
+        query: str,
+        limit: Optional[int] = info.Server.posts_per_page,
+        cursor: Optional[SearchCursor] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Search the posts, best matches first.
+
+        :param str query: The search query.
+        :param Optional[int] limit: The maximum number of posts, or None for no limit, defaults to info.Server.posts_per_page
+        :param Optional[SearchCursor] cursor: Only get posts ranked after this position, defaults to None
+        :return list[dict[str, Any]]: A list of posts, including their rank.
+        """
+
+        return list(self.iter_search_posts(query, limit, cursor))
+
+    def iter_search_posts(
+        self,
+        query: str,
+        limit: Optional[int] = info.Server.posts_per_page,
+        cursor: Optional[SearchCursor] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Like `search_posts()`, but read the posts from the database cursor
+        as they are iterated, instead of all at once.
+
+        :param str query: The search query.
+        :param Optional[int] limit: The maximum number of posts, or None for no limit, defaults to info.Server.posts_per_page
+        :param Optional[SearchCursor] cursor: Only get posts ranked after this position, defaults to None
+        :return Iterator[dict[str, Any]]: The posts, including their rank.
+        """
+
+        match_query = to_match_query(query)
+        if match_query is None:
+            return iter(())
+
+        parameters: list[Any] = [match_query]
+        if cursor is not None:
+            parameters.extend(cursor)
+
+        parameters.append(-1 if limit is None else limit)
+        posts = self.database.execute(
+            f"""
+            SELECT posts.id, users.username, posts.content, posts.timestamp, posts_fts.rank
+            FROM posts_fts
+            INNER JOIN posts
+            ON posts.id = posts_fts.rowid
+            INNER JOIN users
+            ON posts.user_id = users.id
+            WHERE posts_fts MATCH ?
+            {"AND (posts_fts.rank, posts_fts.rowid) > (?, ?)" if cursor else ""}
+            ORDER BY posts_fts.rank, posts_fts.rowid
+            LIMIT ?
+            """,
+            parameters,
+        )
+
+        return (
             {
                 "id": post[0],
                 "username": post[1],
                 "content": post[2],
                 "timestamp": post[3],
+                "rank": post[4],
             }
             for post in posts
-        ]
+        )
+
+
+def _sync_trends() -> None:
+    try:
+        PostManager().sync_trends()
+
+    finally:
+        pool.release()
+
+
+trends_sync = trending.SyncThread(_sync_trends)
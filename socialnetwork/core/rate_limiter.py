@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """
+    Allow at most `limit` attempts per key within a sliding window of `window` seconds.
+    """
+
+    def __init__(self, limit: int, window: float) -> None:
+        self.limit = limit
+        self.window = window
+        self._attempts: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = time.monotonic()
+
+    def allow(self, key: str) -> bool:
+        """
+        Record an attempt, and check if it is within the limit.
+
+        :param str key: The key to limit, e.g. an IP address or a username.
+        :return bool: True if the attempt is allowed, False otherwise.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_cleanup > self.window:
+                self._cleanup(now)
+
+            attempts = self._attempts.setdefault(key, deque())
+            while attempts and now - attempts[0] > self.window:
+                attempts.popleft()
+
+            if len(attempts) >= self.limit:
+                return False
+
+            attempts.append(now)
+            return True
+
+    def _cleanup(self, now: float) -> None:
+        # Forget the keys without recent attempts so that the limiter does not grow forever.
+        self._attempts = {
+            key: attempts
+            for key, attempts in self._attempts.items()
+            if attempts and now - attempts[-1] <= self.window
+        }
+        self._last_cleanup = now
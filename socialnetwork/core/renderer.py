@@ -1,9 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+from itertools import chain, islice
 from time import strftime
-from typing import Any
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
 
+from flask import current_app, make_response
 from flask import render_template as _render_template
+from flask import request, session
+from flask import stream_template as _stream_template
+from markupsafe import Markup
+from werkzeug.wrappers import Response as WerkzeugResponse
+from werkzeug.wsgi import ClosingIterator
 
-from socialnetwork.core import info
+from socialnetwork.core import cache, info
+
+# Posts cannot be edited, so their rendered cards never go stale.
+post_cards = cache.TTLCache(ttl=float("inf"), max_size=info.Server.post_card_cache_size)
+
+
+class CachedPage(NamedTuple):
+    body: str
+    etag: str
+    last_modified: datetime
+
+
+_pages: dict[tuple[str, str], CachedPage] = {}
+
+T = TypeVar("T")
+
+
+class Page(Generic[T]):
+    """
+    A page of items that are read as the template iterates over them,
+    e.g. from a database cursor. Once iterated, it knows where the next
+    page starts.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        limit: Optional[int],
+        next_position: Callable[[T], Any],
+    ) -> None:
+        """
+        :param Iterable[T] items: The items of the page.
+        :param Optional[int] limit: The page size, or None if there is no next page.
+        :param Callable[[T], Any] next_position: Get the position of the next page from the last item.
+        """
+
+        self._items = iter(items)
+        self._peeked: list[T] = []
+        self._next_position = next_position
+        self.limit = limit
+        self.count = 0
+        self.last: Optional[T] = None
+
+    def __bool__(self) -> bool:
+        # Read the first item early, so that `{% if not items %}` works before the loop.
+        if self.count == 0 and not self._peeked:
+            self._peeked = list(islice(self._items, 1))
+
+        return self.count > 0 or bool(self._peeked)
+
+    def __iter__(self) -> Iterator[T]:
+        peeked, self._peeked = self._peeked, []
+        for item in chain(peeked, self._items):
+            self.count += 1
+            self.last = item
+            yield item
+
+    @property
+    def next_position(self) -> Any:
+        """
+        The position of the next page, or None if this is the last page.
+        Only known after the page has been iterated.
+        """
+
+        if self.last is None or self.limit is None or self.count < self.limit:
+            return None
+
+        return self._next_position(self.last)
+
+
+def render_post(post: dict[str, Any]) -> Markup:
+    """
+    Render the card of a post, or get it from the cache.
+
+    :param dict[str, Any] post: The post.
+    :return Markup: The HTML of the post card.
+    """
+
+    card = post_cards.get(post["id"])
+    if card is cache.MISSING:
+        card = Markup(
+            current_app.jinja_env.get_template("post_card.html").render(post=post)
+        )
+        post_cards.set(post["id"], card)
+
+    return card
 
 
 def get_template(template_name: str, **kwargs: Any) -> str:
@@ -18,5 +121,75 @@ def get_template(template_name: str, **kwargs: Any) -> str:
         template_name,
         BRAND_NAME=info.Brand.name,
         COPYRIGHT_YEAR=strftime("%Y"),
+        render_post=render_post,
         **kwargs
     )
+
+
+def stream_template(template_name: str, **kwargs: Any) -> WerkzeugResponse:
+    """
+    Like `get_template()`, but send the page while it is being rendered,
+    so that the browser gets the top of the page before the rest is ready.
+    Pass lazily read items as a `Page` to render them as they are read.
+
+    :param str template_name: The template name.
+    :return WerkzeugResponse: The streamed response.
+    """
+
+    chunks = _stream_template(
+        template_name,
+        BRAND_NAME=info.Brand.name,
+        COPYRIGHT_YEAR=strftime("%Y"),
+        render_post=render_post,
+        **kwargs
+    )
+
+    def buffered() -> Iterator[str]:
+        # Jinja yields many tiny chunks, so join them to save on writes.
+        buffer: list[str] = []
+        size = 0
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= info.Server.stream_chunk_size:
+                yield "".join(buffer)
+                buffer, size = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+
+    # Close the template too if the client disconnects before the end of the page.
+    return current_app.response_class(
+        ClosingIterator(buffered(), chunks.close), mimetype="text/html"
+    )
+
+
+def get_static_page(template_name: str) -> str | WerkzeugResponse:
+    """
+    Get a page that is the same for every visitor. The page is only
+    rendered once, and is sent with an ETag and a Last-Modified date
+    so that the browser can revalidate it with a conditional request.
+
+    :param str template_name: The template name.
+    :return str | WerkzeugResponse: The response, which is "304 Not Modified" if the browser's copy is current.
+    """
+
+    # Flashed messages are shown once, so such pages cannot be cached.
+    if session.get("_flashes"):
+        return get_template(template_name)
+
+    key = (template_name, strftime("%Y"))
+    page = _pages.get(key)
+    if page is None:
+        body = get_template(template_name)
+        page = _pages[key] = CachedPage(
+            body,
+            hashlib.sha1(body.encode()).hexdigest(),
+            datetime.now(timezone.utc).replace(microsecond=0),
+        )
+
+    response = make_response(page.body)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,230 @@
+import abc
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import Flask, Request
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from werkzeug.wrappers import Response
+
+from socialnetwork.core import info
+from socialnetwork.core.database_manager import DatabaseManager
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    A session whose data is kept on the server, identified by a random session ID.
+    """
+
+    def __init__(
+        self,
+        initial: Optional[dict[str, Any]] = None,
+        sid: Optional[str] = None,
+        expires: float = 0.0,
+    ) -> None:
+        def on_update(self: "ServerSideSession") -> None:
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.new = sid is None
+        self.sid = secrets.token_urlsafe(32) if sid is None else sid
+        self.expires = expires
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface, abc.ABC):
+    """
+    The base class of the server-side session stores.
+
+    Sessions are only written when they change, or when more than half
+    of their lifetime has passed, so most requests only read them.
+    """
+
+    def __init__(self, lifetime: int = info.Server.session_lifetime) -> None:
+        self.lifetime = lifetime
+
+    @abc.abstractmethod
+    def load(self, sid: str) -> Optional[tuple[dict[str, Any], float]]:
+        """
+        Load a session from the store.
+
+        :param str sid: The session ID.
+        :return Optional[tuple[dict[str, Any], float]]: The session data and its expiry time, or None.
+        """
+
+    @abc.abstractmethod
+    def store(self, sid: str, data: dict[str, Any], expires: float) -> None:
+        """
+        Save a session to the store.
+
+        :param str sid: The session ID.
+        :param dict[str, Any] data: The session data.
+        :param float expires: The UNIX time when the session expires.
+        """
+
+    @abc.abstractmethod
+    def delete(self, sid: str) -> None:
+        """
+        Delete a session from the store.
+
+        :param str sid: The session ID.
+        """
+
+    def open_session(self, app: Flask, request: Request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            record = self.load(sid)
+            if record is not None and record[1] > time.time():
+                return ServerSideSession(record[0], sid=sid, expires=record[1])
+
+        return ServerSideSession()
+
+    def save_session(
+        self, app: Flask, session: ServerSideSession, response: Response  # type: ignore[override]
+    ) -> None:
+        if not session:
+            if session.modified and not session.new:
+                self.delete(session.sid)
+                response.delete_cookie(
+                    self.get_cookie_name(app),
+                    domain=self.get_cookie_domain(app),
+                    path=self.get_cookie_path(app),
+                )
+
+            return
+
+        now = time.time()
+        if not session.modified and session.expires - now > self.lifetime / 2:
+            return
+
+        self.store(session.sid, dict(session), now + self.lifetime)
+        if session.new or session.modified:
+            response.set_cookie(
+                self.get_cookie_name(app),
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=self.get_cookie_domain(app),
+                path=self.get_cookie_path(app),
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+class MemorySessionInterface(ServerSideSessionInterface):
+    """
+    Keep the sessions in the memory of the process, evicting the least
+    recently used sessions when there are more than `max_sessions`.
+    """
+
+    def __init__(
+        self,
+        lifetime: int = info.Server.session_lifetime,
+        max_sessions: int = info.Server.session_memory_size,
+    ) -> None:
+        super().__init__(lifetime)
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[tuple[dict[str, Any], float]]:
+        with self._lock:
+            record = self._sessions.get(sid)
+            if record is None:
+                return None
+
+            if record[1] <= time.time():
+                del self._sessions[sid]
+                return None
+
+            self._sessions.move_to_end(sid)
+            return dict(record[0]), record[1]
+
+    def store(self, sid: str, data: dict[str, Any], expires: float) -> None:
+        with self._lock:
+            self._sessions[sid] = (data, expires)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLiteSessionInterface(ServerSideSessionInterface):
+    """
+    Keep the sessions in the `sessions` table of the app database, so
+    that they are shared by every worker process.
+    """
+
+    # Expired sessions are deleted once every this many writes.
+    purge_interval: int = 1000
+
+    def __init__(self, lifetime: int = info.Server.session_lifetime) -> None:
+        super().__init__(lifetime)
+        self.serializer = TaggedJSONSerializer()
+        self._writes = 0
+
+    def load(self, sid: str) -> Optional[tuple[dict[str, Any], float]]:
+        record = (
+            DatabaseManager()
+            .database.execute("SELECT data, expires FROM sessions WHERE id = ?", (sid,))
+            .fetchone()
+        )
+        if record is None:
+            return None
+
+        return self.serializer.loads(record[0]), record[1]
+
+    def store(self, sid: str, data: dict[str, Any], expires: float) -> None:
+        serialized = self.serializer.dumps(data)
+        self._writes += 1
+        purge = self._writes % self.purge_interval == 0
+
+        def job(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)",
+                (sid, serialized, expires),
+            )
+            if purge:
+                cursor.execute(
+                    "DELETE FROM sessions WHERE expires <= ?", (time.time(),)
+                )
+
+        DatabaseManager()._write(job)
+
+    def delete(self, sid: str) -> None:
+        DatabaseManager()._write(
+            lambda cursor: cursor.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+        )
+
+
+def get_session_interface(
+    backend: str = info.Server.session_backend,
+) -> SessionInterface:
+    """
+    Get the session interface of a session backend.
+
+    Throws ValueError if the backend is unknown.
+
+    :param str backend: "memory", "sqlite" or "cookie", defaults to info.Server.session_backend
+    :return SessionInterface: The session interface.
+    """
+
+    if backend == "memory":
+        return MemorySessionInterface()
+
+    if backend == "sqlite":
+        return SQLiteSessionInterface()
+
+    if backend == "cookie":
+        # Flask's default: the session is signed and stored in the cookie itself.
+        return SecureCookieSessionInterface()
+
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,303 @@
+import heapq
+import re
+import threading
+import time
+from collections import Counter, deque
+from logging import getLogger
+from typing import Callable, Iterable, Optional
+
+from socialnetwork.core import info
+
+logger = getLogger(__name__)
+
+# The kinds of names that are counted.
+HASHTAG = "hashtag"
+MENTION = "mention"
+
+_hashtag_pattern = re.compile(r"(?<![\w#])#(\w+)")
+_mention_pattern = re.compile(r"(?<![\w@])@(\w+)")
+
+
+def extract_hashtags(content: str) -> list[str]:
+    """
+    Get the hashtags of a post, lowercased and without duplicates.
+
+    :param str content: The content of the post.
+    :return list[str]: The hashtags, without the "#", in order of appearance.
+    """
+
+    return list(dict.fromkeys(tag.lower() for tag in _hashtag_pattern.findall(content)))
+
+
+def extract_mentions(content: str) -> list[str]:
+    """
+    Get the usernames mentioned in a post, without duplicates.
+
+    :param str content: The content of the post.
+    :return list[str]: The usernames, without the "@", in order of appearance.
+    """
+
+    return list(dict.fromkeys(_mention_pattern.findall(content)))
+
+
+def current_bucket(now: Optional[float] = None) -> int:
+    """
+    Get the number of the time bucket counts are added to.
+
+    :param Optional[float] now: The UNIX time, defaults to the current time
+    :return int: The bucket, the UNIX time divided by info.Server.trending_resolution.
+    """
+
+    return int(time.time() if now is None else now) // info.Server.trending_resolution
+
+
+class SlidingWindowCounter:
+    """
+    The counts of names over the last `window` buckets.
+
+    The counts are kept per bucket, along with their totals. As buckets
+    leave the window, their counts are subtracted from the totals, so
+    adding a count and expiring a bucket never re-count the window.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.totals: Counter[str] = Counter()
+        # Oldest first.
+        self._buckets: deque[tuple[int, Counter[str]]] = deque()
+
+    def add(self, name: str, bucket: int, count: int = 1) -> None:
+        """
+        Count a name.
+
+        :param str name: The name.
+        :param int bucket: The time bucket of the count.
+        :param int count: The amount to add, defaults to 1
+        """
+
+        if self._buckets and bucket <= self._buckets[-1][0] - self.window:
+            return
+
+        # Counts usually go to the newest bucket, but may arrive late.
+        for index in range(len(self._buckets) - 1, -1, -1):
+            number, counts = self._buckets[index]
+            if number == bucket:
+                break
+
+            if number < bucket:
+                counts = Counter()
+                self._buckets.insert(index + 1, (bucket, counts))
+                break
+
+        else:
+            counts = Counter()
+            self._buckets.appendleft((bucket, counts))
+
+        counts[name] += count
+        self.totals[name] += count
+        self.expire(self._buckets[-1][0])
+
+    def expire(self, bucket: int) -> None:
+        """
+        Forget the buckets that are outside the window ending at `bucket`.
+
+        :param int bucket: The current time bucket.
+        """
+
+        while self._buckets and self._buckets[0][0] <= bucket - self.window:
+            _, counts = self._buckets.popleft()
+            self.totals.subtract(counts)
+            for name in counts:
+                if self.totals[name] <= 0:
+                    del self.totals[name]
+
+    def top(self, limit: int) -> list[tuple[str, int]]:
+        """
+        Get the names with the highest counts.
+
+        :param int limit: The maximum number of names.
+        :return list[tuple[str, int]]: The names and their counts, highest first.
+        """
+
+        return heapq.nlargest(limit, self.totals.items(), key=lambda item: item[1])
+
+
+class Trends:
+    """
+    The counts of hashtags and mentions over the windows of
+    info.Server.trending_windows, kept in memory.
+
+    Each process counts the posts it writes, and a `SyncThread` saves its
+    new counts in the `trending_counts` table and reloads everyone's counts
+    from it every info.Server.trending_sync_interval seconds.
+
+    `generation` is the number of rebuilds of the saved counts when they
+    were last loaded. The counts not saved before a rebuild were already
+    counted by it, so they are discarded instead of saved.
+    """
+
+    def __init__(self, windows: Iterable[int] = info.Server.trending_windows) -> None:
+        self.windows = tuple(windows)
+        self.generation: Optional[int] = None
+        self._counters: dict[tuple[str, int], SlidingWindowCounter] = {}
+        # The counts not saved yet, by (bucket, kind, name).
+        self._pending: Counter[tuple[int, str, str]] = Counter()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._counters = {
+            (kind, window): SlidingWindowCounter(
+                -(-window // info.Server.trending_resolution)
+            )
+            for kind in (HASHTAG, MENTION)
+            for window in self.windows
+        }
+
+    def _add(self, bucket: int, kind: str, name: str, count: int) -> None:
+        for window in self.windows:
+            self._counters[kind, window].add(name, bucket, count)
+
+    def record(
+        self,
+        hashtags: Iterable[str],
+        mentions: Iterable[str],
+        bucket: Optional[int] = None,
+    ) -> None:
+        """
+        Count the hashtags and mentions of a new post.
+
+        :param Iterable[str] hashtags: The hashtags.
+        :param Iterable[str] mentions: The mentioned usernames.
+        :param Optional[int] bucket: The time bucket, defaults to the current one
+        """
+
+        if bucket is None:
+            bucket = current_bucket()
+
+        with self._lock:
+            for kind, names in ((HASHTAG, hashtags), (MENTION, mentions)):
+                for name in names:
+                    self._add(bucket, kind, name, 1)
+                    self._pending[bucket, kind, name] += 1
+
+    def expired_bucket(self) -> int:
+        """
+        Get the newest time bucket that is outside every window.
+
+        :return int: The bucket.
+        """
+
+        return current_bucket() - max(
+            counter.window for counter in self._counters.values()
+        )
+
+    def take_pending(self) -> list[tuple[int, str, str, int]]:
+        """
+        Get the counts recorded since the last call, to save them.
+
+        :return list[tuple[int, str, str, int]]: The bucket, kind, name and count of each.
+        """
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+
+        return [(*key, count) for key, count in pending.items()]
+
+    def restore_pending(self, counts: Iterable[tuple[int, str, str, int]]) -> None:
+        """
+        Give back the counts of `take_pending()` that could not be saved,
+        so that they are saved with the next ones.
+
+        :param Iterable[tuple[int, str, str, int]] counts: The bucket, kind, name and count of each.
+        """
+
+        with self._lock:
+            for bucket, kind, name, count in counts:
+                self._pending[bucket, kind, name] += count
+
+    def load(self, counts: Iterable[tuple[int, str, str, int]]) -> None:
+        """
+        Replace the counts with the saved ones, keeping those not saved yet.
+
+        :param Iterable[tuple[int, str, str, int]] counts: The bucket, kind, name and count of each, oldest first.
+        """
+
+        with self._lock:
+            self._reset()
+            for bucket, kind, name, count in counts:
+                if kind in (HASHTAG, MENTION):
+                    self._add(bucket, kind, name, count)
+
+            for (bucket, kind, name), count in sorted(self._pending.items()):
+                self._add(bucket, kind, name, count)
+
+    def top(
+        self, kind: str, window: int, limit: int = info.Server.trending_size
+    ) -> list[tuple[str, int]]:
+        """
+        Get the most used hashtags or mentioned usernames.
+
+        :param str kind: HASHTAG or MENTION.
+        :param int window: The window in seconds, one of info.Server.trending_windows.
+        :param int limit: The maximum number of names, defaults to info.Server.trending_size
+        :return list[tuple[str, int]]: The names and their counts, highest first.
+        """
+
+        with self._lock:
+            counter = self._counters[kind, window]
+            counter.expire(current_bucket())
+            return counter.top(limit)
+
+
+class SyncThread:
+    """
+    A background thread calling `sync` every info.Server.trending_sync_interval
+    seconds. It is started on first use, so that each forked worker starts
+    its own.
+    """
+
+    def __init__(self, sync: Callable[[], None]) -> None:
+        self.sync = sync
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        """
+        Start the thread if it is not running.
+        """
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._stopped,),
+                    name="trends-sync",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the thread, without a last sync.
+        """
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped.set()
+
+        if thread is not None and thread.is_alive():
+            thread.join()
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.wait(info.Server.trending_sync_interval):
+            try:
+                self.sync()
+
+            except Exception:
+                logger.exception("Could not sync the trending counts.")
+
+
+trends = Trends()
@@ -1,9 +1,11 @@
-import hashlib
+import hmac
 import random
+import sqlite3
 from enum import Enum
 from string import ascii_letters
-from typing import Any
+from typing import Any, Iterator, Optional
 
+from socialnetwork.core import cache, friend_graph, info, password_hasher
 from socialnetwork.core.database_manager import DatabaseManager
 
 
@@ -26,17 +28,38 @@ def validate_password(password: str) -> dict[str, bool | str]:
     return {"status": True, "message": "Password is valid."}
 
 
-def hash_password(password: str, salt: str) -> str:
+# The iterations of password hashes stored without an iteration count.
+LEGACY_PASSWORD_ITERATIONS = 100000
+
+
+def hash_password(
+    password: str, salt: str, iterations: int = info.Server.password_iterations
+) -> str:
     """
     Hash the password and return its hex digest.
 
+    Throws password_hasher.HasherBusyError if too many passwords are being hashed.
+
     :param str password: The password to hash.
+    :param str salt: The salt of the password.
+    :param int iterations: The number of iterations, defaults to info.Server.password_iterations
     :returns: The hashed password.
     """
 
-    return hashlib.pbkdf2_hmac(
-        "sha256", password.encode(), salt.encode(), iterations=100000, dklen=32
-    ).hex()
+    return password_hasher.hasher.hash(password, salt, iterations)
+
+
+def make_password_record(password: str) -> str:
+    """
+    Hash a password with a new salt, for storing in the database.
+
+    :param str password: The plaintext password.
+    :return str: The hash, salt and iterations, separated by colons.
+    """
+
+    salt: str = "".join(random.choices(ascii_letters, k=16))
+    iterations = info.Server.password_iterations
+    return ":".join((hash_password(password, salt, iterations), salt, str(iterations)))
 
 
 class UserManager(DatabaseManager):
@@ -79,19 +102,19 @@ class UserManager(DatabaseManager):
             raise ValueError("Username already exists.")
 
         # Hash the password.
-        salt: str = "".join(random.choices(ascii_letters, k=16))
-        password = hash_password(password, salt)
+        password = make_password_record(password)
 
-        cursor.execute(
-            "INSERT INTO users (username, password, is_admin, welcomed) VALUES (?, ?, ?, ?)",
-            (username, ":".join((password, salt)), is_admin, False),
+        user_id: int | None = self._write(
+            lambda cursor: cursor.execute(
+                "INSERT INTO users (username, password, is_admin, welcomed) VALUES (?, ?, ?, ?)",
+                (username, password, is_admin, False),
+            ).lastrowid
         )
-        self.database.commit()
 
-        if cursor.lastrowid is None:
+        if user_id is None:
             raise ValueError("Failed to register user.")
 
-        return cursor.lastrowid
+        return user_id
 
     def get_user_info(self, user_id: int) -> dict[str, str]:
         """
@@ -101,6 +124,10 @@ class UserManager(DatabaseManager):
         :return dict[str, str]: The row from the database containing the user's information.
         """
 
+        user_info = cache.user_info.get(user_id)
+        if user_info is not cache.MISSING:
+            return dict(user_info)
+
         cursor = self.database.cursor()
 
         cursor.execute("SELECT * FROM user_info WHERE user_id = ?", (user_id,))
@@ -108,7 +135,7 @@ class UserManager(DatabaseManager):
         if record is None:
             raise ValueError("User does not exist.")
 
-        return {
+        user_info = {
             "user_id": record[0],
             "first_name": record[1],
             "last_name": record[2],
@@ -116,6 +143,9 @@ class UserManager(DatabaseManager):
             "phone_number": record[4],
             "address": record[5],
         }
+        cache.user_info.set(user_id, user_info)
+
+        return dict(user_info)
 
     def update_user_info(self, user_id: int, **kwargs) -> None:
         """
@@ -124,8 +154,11 @@ class UserManager(DatabaseManager):
         :param int user_id: The user ID of the user.
         """
 
-        cursor = self.database.cursor()
+        self._write(lambda cursor: self._update_user_info(cursor, user_id, **kwargs))
+        cache.user_info.invalidate(user_id)
 
+    @staticmethod
+    def _update_user_info(cursor: sqlite3.Cursor, user_id: int, **kwargs) -> None:
         cursor.execute("SELECT * FROM user_info WHERE user_id = ?", (user_id,))
         if cursor.fetchone():
             cursor.execute(
@@ -161,7 +194,6 @@ class UserManager(DatabaseManager):
             )
 
         cursor.execute("UPDATE users SET welcomed = ? WHERE id = ?", (True, user_id))
-        self.database.commit()
 
     def validate_user(self, username: str, password: str) -> int | None:
         """
@@ -179,18 +211,38 @@ class UserManager(DatabaseManager):
         if record is None:
             raise ValueError("Invalid username/password.")
 
-        password = hash_password(password, record[2].partition(":")[2])
+        # Older records do not store their iteration count.
+        stored_hash, salt, *iterations = record[2].split(":")
+        iteration_count = (
+            int(iterations[0]) if iterations else LEGACY_PASSWORD_ITERATIONS
+        )
+
+        if not hmac.compare_digest(
+            stored_hash, hash_password(password, salt, iteration_count)
+        ):
+            raise ValueError("Invalid username/password.")
 
-        if record[2].partition(":")[0] == password:
-            return record[0]
+        # Upgrade the hash now that we know the password.
+        if iteration_count != info.Server.password_iterations:
+            new_record = make_password_record(password)
+            self._write(
+                lambda cursor: cursor.execute(
+                    "UPDATE users SET password = ? WHERE id = ?",
+                    (new_record, record[0]),
+                )
+            )
 
-        raise ValueError("Invalid username/password.")
+        return record[0]
 
     def get_user_level(self, user_id: int) -> UserLevel:
         """
         Get the user level of the user.
         """
 
+        user_level = cache.user_levels.get(user_id)
+        if user_level is not cache.MISSING:
+            return user_level
+
         cursor = self.database.cursor()
 
         cursor.execute("SELECT is_admin FROM users WHERE id = ?", (user_id,))
@@ -198,21 +250,23 @@ class UserManager(DatabaseManager):
         if record is None:
             raise ValueError("User does not exist.")
 
-        return UserLevel.ADMIN if record[0] else UserLevel.NORMAL
+        user_level = UserLevel.ADMIN if record[0] else UserLevel.NORMAL
+        cache.user_levels.set(user_id, user_level)
+
+        return user_level
 
     def set_user_level(self, user_id: int, user_level: UserLevel) -> None:
         """
         Set the user level of the user.
         """
 
-        cursor = self.database.cursor()
-
-        cursor.execute(
-            "UPDATE users SET is_admin = ? WHERE id = ?",
-            (user_level == UserLevel.ADMIN, user_id),
+        self._write(
+            lambda cursor: cursor.execute(
+                "UPDATE users SET is_admin = ? WHERE id = ?",
+                (user_level == UserLevel.ADMIN, user_id),
+            )
         )
-
-        self.database.commit()
+        cache.user_levels.invalidate(user_id)
 
     def get_friends_list(self, user_id: int) -> list[int]:
         """
@@ -222,6 +276,10 @@ class UserManager(DatabaseManager):
         :return list: A list of user IDs that are friends with the user.
         """
 
+        friends = cache.friends_lists.get(user_id)
+        if friends is not cache.MISSING:
+            return list(friends)
+
         cursor = self.database.cursor()
 
         cursor.execute(
@@ -233,46 +291,223 @@ class UserManager(DatabaseManager):
             (user_id,),
         )
 
-        return [record[0] for record in cursor.fetchall()]
+        friends = [record[0] for record in cursor.fetchall()]
+        cache.friends_lists.set(user_id, friends)
+
+        return list(friends)
+
+    def count_users(self) -> int:
+        """
+        Get the number of registered users.
+
+        :return int: The number of users.
+        """
+
+        return self.database.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def get_usernames(
+        self, offset: int = 0, limit: Optional[int] = None
+    ) -> list[tuple[int, str]]:
+        """
+        Get a page of the user IDs and usernames, ordered by user ID.
+
+        :param int offset: The number of users to skip, defaults to 0
+        :param Optional[int] limit: The maximum number of users, or None for no limit, defaults to None
+        :return list[tuple[int, str]]: The user IDs and usernames.
+        """
+
+        return self.database.execute(
+            "SELECT id, username FROM users ORDER BY id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
 
     def get_all_users(self) -> list[dict[str, str]]:
         """
         Get a list of all users from the database.
 
-        :return list: A list of user IDs.
+        :return list: A list of the users' information.
         """
 
         cursor = self.database.cursor()
 
         cursor.execute(
             """
-            SELECT id
-            FROM users
+            SELECT user_id, first_name, last_name, email, phone_number, address
+            FROM user_info
+            ORDER BY user_id
             """
         )
 
-        return [self.get_user_info(record[0]) for record in cursor.fetchall()]
+        return [
+            {
+                "user_id": record[0],
+                "first_name": record[1],
+                "last_name": record[2],
+                "email": record[3],
+                "phone_number": record[4],
+                "address": record[5],
+            }
+            for record in cursor.fetchall()
+        ]
+
+    def get_people(
+        self,
+        viewer_id: int,
+        name: Optional[str] = None,
+        after_id: Optional[int] = None,
+        limit: int = info.Server.people_per_page,
+        user_ids: Optional[list[int]] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Get a page of users, along with their relationship to the viewer.
+
+        :param int viewer_id: The user ID of the user viewing the list.
+        :param Optional[str] name: Only get users whose name or username contains this, defaults to None
+        :param Optional[int] after_id: Only get users with a greater user ID, defaults to None
+        :param int limit: The maximum number of users, defaults to info.Server.people_per_page
+        :param Optional[list[int]] user_ids: Only get these users, defaults to None
+        :return list[dict[str, Any]]: A list of the users' information, with `is_friend` and `is_self`.
+        """
+
+        return list(self.iter_people(viewer_id, name, after_id, limit, user_ids))
+
+    def iter_people(
+        self,
+        viewer_id: int,
+        name: Optional[str] = None,
+        after_id: Optional[int] = None,
+        limit: int = info.Server.people_per_page,
+        user_ids: Optional[list[int]] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Like `get_people()`, but read the users from the database cursor as
+        they are iterated, instead of all at once.
+
+        :param int viewer_id: The user ID of the user viewing the list.
+        :param Optional[str] name: Only get users whose name or username contains this, defaults to None
+        :param Optional[int] after_id: Only get users with a greater user ID, defaults to None
+        :param int limit: The maximum number of users, defaults to info.Server.people_per_page
+        :param Optional[list[int]] user_ids: Only get these users, defaults to None
+        :return Iterator[dict[str, Any]]: The users' information, with `is_friend` and `is_self`.
+        """
+
+        conditions: list[str] = []
+        parameters: list[Any] = [viewer_id, viewer_id]
+        if user_ids is not None:
+            conditions.append(f"users.id IN ({', '.join('?' * len(user_ids))})")
+            parameters.extend(user_ids)
+
+        if after_id is not None:
+            conditions.append("users.id > ?")
+            parameters.append(after_id)
+
+        if name:
+            pattern = "%{}%".format(
+                name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            conditions.append(
+                """(
+                    users.username LIKE ? ESCAPE '\\'
+                    OR user_info.first_name || ' ' || user_info.last_name LIKE ? ESCAPE '\\'
+                )"""
+            )
+            parameters.extend((pattern, pattern))
+
+        parameters.append(limit)
+        records = self.database.execute(
+            f"""
+            SELECT
+                users.id,
+                COALESCE(user_info.first_name, users.username),
+                COALESCE(user_info.last_name, ''),
+                user_info.email,
+                user_info.phone_number,
+                user_info.address,
+                friendships.user_id2 IS NOT NULL,
+                users.id = ?
+            FROM users
+            LEFT JOIN user_info
+            ON user_info.user_id = users.id
+            LEFT JOIN friendships
+            ON friendships.user_id1 = ? AND friendships.user_id2 = users.id
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY users.id
+            LIMIT ?
+            """,
+            parameters,
+        )
+
+        return (
+            {
+                "user_id": record[0],
+                "first_name": record[1],
+                "last_name": record[2],
+                "email": record[3],
+                "phone_number": record[4],
+                "address": record[5],
+                "is_friend": bool(record[6]),
+                "is_self": bool(record[7]),
+            }
+            for record in records
+        )
+
+    def get_friend_graph(self) -> friend_graph.FriendGraph:
+        """
+        Get the in-memory friendship graph, loading it if needed or if
+        it is older than `info.Server.friend_graph_ttl`. Only one thread
+        reloads it, while the others keep reading the stale graph.
+
+        :return friend_graph.FriendGraph: The friendship graph.
+        """
+
+        graph = friend_graph.graph
+        if not graph.loaded:
+            graph.load_once(self.database)
+
+        elif graph.claim_reload(info.Server.friend_graph_ttl):
+            graph.load(self.database)
+
+        return graph
 
     def friend_add(self, user_id1: int, user_id2: int) -> None:
         """
-        Add a friendship between two users.
+        Add a friendship between two users, if they are not friends yet.
 
         :param int user_id1: The user ID of the first user.
         :param int user_id2: The user ID of the second user.
         """
 
-        cursor = self.database.cursor()
+        self._write(lambda cursor: self._friend_add(cursor, user_id1, user_id2))
+        cache.friends_lists.invalidate(user_id1, user_id2)
+        if friend_graph.graph.loaded:
+            friend_graph.graph.add_edge(user_id1, user_id2)
 
-        for combination in ((user_id1, user_id2), (user_id2, user_id1)):
-            cursor.execute(
-                """
-                INSERT INTO friendships (user_id1, user_id2)
-                VALUES (?, ?)
-                """,
-                combination,
-            )
+    @staticmethod
+    def _friend_add(cursor: sqlite3.Cursor, user_id1: int, user_id2: int) -> None:
+        combinations = ((user_id1, user_id2), (user_id2, user_id1))
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO friendships (user_id1, user_id2)
+            VALUES (?, ?)
+            """,
+            combinations,
+        )
 
-        self.database.commit()
+        # Add the recent posts of each user to the other's timeline.
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO timelines (user_id, timestamp, post_id)
+            SELECT ?, timestamp, id
+            FROM posts
+            WHERE user_id = ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+            """,
+            (
+                combination + (info.Server.timeline_backfill,)
+                for combination in combinations
+            ),
+        )
 
     def friend_remove(self, user_id1: int, user_id2: int) -> None:
         """
@@ -282,15 +517,28 @@ class UserManager(DatabaseManager):
         :param int user_id2: The user ID of the second user.
         """
 
-        cursor = self.database.cursor()
+        self._write(lambda cursor: self._friend_remove(cursor, user_id1, user_id2))
+        cache.friends_lists.invalidate(user_id1, user_id2)
+        if friend_graph.graph.loaded:
+            friend_graph.graph.remove_edge(user_id1, user_id2)
 
-        for combination in ((user_id1, user_id2), (user_id2, user_id1)):
-            cursor.execute(
-                """
-                DELETE FROM friendships
-                WHERE user_id1 = ? AND user_id2 = ?
-                """,
-                combination,
+    @staticmethod
+    def _friend_remove(cursor: sqlite3.Cursor, user_id1: int, user_id2: int) -> None:
+        combinations = ((user_id1, user_id2), (user_id2, user_id1))
+        cursor.executemany(
+            """
+            DELETE FROM friendships
+            WHERE user_id1 = ? AND user_id2 = ?
+            """,
+            combinations,
+        )
+        cursor.executemany(
+            """
+            DELETE FROM timelines
+            WHERE user_id = ?
+            AND (timestamp, post_id) IN (
+                SELECT timestamp, id FROM posts WHERE user_id = ?
             )
-
-        self.database.commit()
+            """,
+            combinations,
+        )
@@ -0,0 +1,267 @@
+"""
+A pre-forking HTTP server for running the app on every CPU core.
+
+The app is imported and its templates compiled once in the master
+process, then forked into workers that all accept connections from the
+same listening socket. Send SIGHUP to the master to replace the workers
+without dropping connections, and SIGTERM or SIGINT to stop it.
+
+The new workers are forked from the same master, so SIGHUP does not load
+code changes: restart the master for those.
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Iterable
+
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, make_server
+from werkzeug.wsgi import ClosingIterator
+
+from socialnetwork.core import (
+    broadcaster,
+    database_manager,
+    info,
+    password_hasher,
+    post_manager,
+)
+
+logger = getLogger(__name__)
+
+
+class RequestCounter:
+    """
+    A WSGI middleware that counts the requests being handled, including
+    responses that are still being streamed.
+    """
+
+    def __init__(self, app: Callable[..., Iterable[bytes]]) -> None:
+        self.app = app
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def _finish(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def __call__(self, environ: dict[str, Any], start_response: Any) -> Iterable[bytes]:
+        with self._lock:
+            self.active += 1
+
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finish)
+
+        except BaseException:
+            self._finish()
+            raise
+
+
+class PreforkServer:
+    """
+    A master process that keeps `workers` worker processes running.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        host: str = info.Server.host,
+        port: int = info.Server.port,
+        workers: int = info.Server.workers,
+        graceful_timeout: float = info.Server.graceful_timeout,
+    ) -> None:
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self._pids: set[int] = set()
+        self._retiring: dict[int, float] = {}
+        self._restart_workers = False
+        self._stop = False
+
+    def preload(self) -> None:
+        """
+        Prepare everything the workers share before forking them.
+        """
+
+        database_manager.configure_database()
+        for version in database_manager.DatabaseManager().migrate():
+            logger.info(f"Applied database migration {version}.")
+
+        # The workers inherit the newest posts and the trending counts.
+        post_manager.PostManager().load_hot_posts()
+        post_manager.PostManager().load_trends()
+
+        # Compile the templates once, instead of once per worker.
+        for template_name in self.app.jinja_env.list_templates():
+            self.app.jinja_env.get_template(template_name)
+
+        # Forked processes must not share SQLite connections or threads.
+        database_manager.pool.close_all()
+        database_manager.writer.stop()
+        password_hasher.hasher.shutdown()
+
+    def run(self) -> None:
+        """
+        Start the workers, and supervise them until told to stop.
+        """
+
+        self.preload()
+        listener = socket.create_server(
+            (self.host, self.port), backlog=2048, reuse_port=False
+        )
+        listener.set_inheritable(True)
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_restart_workers", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stop", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stop", True))
+
+        logger.info(
+            f"Starting {self.workers} workers on http://{self.host}:{self.port}/."
+        )
+        for _ in range(self.workers):
+            self._spawn(listener)
+
+        while not self._stop:
+            time.sleep(0.2)
+            self._reap(listener)
+            if self._restart_workers:
+                self._restart_workers = False
+                self._restart(listener)
+
+        logger.info("Stopping the workers.")
+        self._retire(set(self._pids))
+        while self._pids:
+            time.sleep(0.2)
+            self._reap(listener)
+
+        listener.close()
+
+    def _spawn(self, listener: socket.socket) -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                Worker(self.app, listener, self.graceful_timeout).run()
+
+            except BaseException:
+                logger.exception("Worker crashed.")
+                exit_code = 1
+
+            finally:
+                os._exit(exit_code)
+
+        self._pids.add(pid)
+
+    def _restart(self, listener: socket.socket) -> None:
+        # The new workers start accepting connections before the old ones stop.
+        logger.info("Restarting the workers.")
+        old_pids = set(self._pids) - set(self._retiring)
+        for _ in range(self.workers):
+            self._spawn(listener)
+
+        self._retire(old_pids)
+
+    def _retire(self, pids: set[int]) -> None:
+        for pid in pids:
+            if pid not in self._retiring:
+                self._retiring[pid] = time.monotonic() + self.graceful_timeout
+                os.kill(pid, signal.SIGTERM)
+
+    def _reap(self, listener: socket.socket) -> None:
+        while self._pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+
+            self._pids.discard(pid)
+            if self._retiring.pop(pid, None) is None and not self._stop:
+                logger.warning(f"Worker {pid} exited with {status}, replacing it.")
+                self._spawn(listener)
+
+        # Kill the workers that did not finish their requests in time.
+        for pid, deadline in list(self._retiring.items()):
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                self._retiring[pid] = float("inf")
+
+
+class Worker:
+    """
+    A worker process, serving requests on multiple threads.
+
+    New posts are only published to the live updates of the worker that
+    wrote them, so each worker also publishes the posts it finds in the
+    database every info.Server.sse_poll_interval seconds.
+    """
+
+    def __init__(
+        self, app: Flask, listener: socket.socket, graceful_timeout: float
+    ) -> None:
+        self.app = RequestCounter(app)
+        self.listener = listener
+        self.graceful_timeout = graceful_timeout
+        self._stopped = threading.Event()
+
+    def _poll_posts(self) -> None:
+        # Only the posts written while someone is listening are published.
+        last_id: int | None = None
+        while not self._stopped.wait(info.Server.sse_poll_interval):
+            if not broadcaster.posts.has_subscribers():
+                last_id = None
+                continue
+
+            try:
+                manager = post_manager.PostManager()
+                if last_id is None:
+                    last_id = manager.get_latest_post_id()
+
+                else:
+                    last_id = manager.publish_posts(last_id)
+
+            except Exception:
+                logger.exception("Could not check for new posts.")
+
+        database_manager.pool.release()
+
+    def run(self) -> None:
+        """
+        Serve requests until SIGTERM, then let the running requests finish.
+        """
+
+        # Only the master reacts to Ctrl+C and SIGHUP.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        # Fork the hashing processes before this process has any threads.
+        password_hasher.hasher.start()
+
+        server: BaseWSGIServer = make_server(
+            self.listener.getsockname()[0],
+            self.listener.getsockname()[1],
+            self.app,  # type: ignore[arg-type]
+            threaded=True,
+            fd=self.listener.fileno(),
+        )
+        # `shutdown()` waits for `serve_forever()`, so it cannot run in the handler's thread.
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown).start(),
+        )
+        poller = threading.Thread(target=self._poll_posts, daemon=True)
+        poller.start()
+        server.serve_forever()
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.app.active and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        self._stopped.set()
+        poller.join()
+        post_manager.trends_sync.stop()
+        post_manager.PostManager().sync_trends()
+        database_manager.writer.stop()
+        password_hasher.hasher.shutdown()
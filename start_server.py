@@ -1,16 +1,53 @@
+import argparse
+import os
 from logging import getLogger
 
 import socialnetwork
-from socialnetwork.core import database_manager, info
+from socialnetwork.core import database_manager, info, password_hasher, post_manager
 
 logger = getLogger(__name__)
 app = socialnetwork.app
 
 if __name__ == "__main__":
-    # Prepare the database if it doesn't exist.
+    parser = argparse.ArgumentParser(description="Start the social network server.")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="run multiple worker processes instead of the development server",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=info.Server.workers,
+        help="the number of worker processes with --production",
+    )
+    arguments = parser.parse_args()
+
+    # Prepare the database if it doesn't exist, or upgrade it if it is outdated.
     if not info.Filepath.database.exists():
         logger.info("Database does not exist. Creating it now.")
-        database_manager.DatabaseManager().initialize_database()
 
-    logger.info("Starting the server.")
-    app.run(host=info.Server.host, port=info.Server.port, debug=info.Server.debug)
+    if arguments.production and hasattr(os, "fork"):
+        from socialnetwork.prefork import PreforkServer
+
+        PreforkServer(app, workers=arguments.workers).run()
+
+    else:
+        database_manager.configure_database()
+        for version in database_manager.DatabaseManager().migrate():
+            logger.info(f"Applied database migration {version}.")
+
+        post_manager.PostManager().load_hot_posts()
+        post_manager.PostManager().load_trends()
+        database_manager.pool.release()
+
+        logger.info("Starting the server.")
+        app.run(
+            host=info.Server.host,
+            port=info.Server.port,
+            debug=info.Server.debug and not arguments.production,
+        )
+        post_manager.trends_sync.stop()
+        post_manager.PostManager().sync_trends()
+        database_manager.writer.stop()
+        password_hasher.hasher.shutdown()
@@ -0,0 +1,98 @@
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+from flask.testing import FlaskClient
+
+import socialnetwork
+from socialnetwork.core import (
+    broadcaster,
+    bulk,
+    cache,
+    database_manager,
+    friend_graph,
+    hot_posts,
+    info,
+    post_manager,
+    renderer,
+    trending,
+)
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """
+    Give every test an empty, migrated database, and the in-memory state
+    of a freshly started process.
+    """
+
+    monkeypatch.setattr(info.Filepath, "database", tmp_path / "socialnetwork.db")
+    monkeypatch.setattr(hot_posts, "buffer", hot_posts.HotPostBuffer())
+    monkeypatch.setattr(friend_graph, "graph", friend_graph.FriendGraph())
+    monkeypatch.setattr(trending, "trends", trending.Trends())
+    monkeypatch.setattr(broadcaster, "posts", broadcaster.Broadcaster())
+    for values in (
+        cache.user_levels,
+        cache.user_info,
+        cache.friends_lists,
+        renderer.post_cards,
+    ):
+        values.clear()
+
+    renderer._pages.clear()
+    database_manager.pool.close_all()
+    database_manager.configure_database()
+    database_manager.DatabaseManager().migrate()
+    yield info.Filepath.database
+
+    post_manager.trends_sync.stop()
+    database_manager.writer.stop()
+    database_manager.pool.close_all()
+
+
+@pytest.fixture
+def connection(database: Path) -> Iterator[sqlite3.Connection]:
+    """
+    A separate connection in autocommit mode, for preparing and checking data.
+    """
+
+    connection = database_manager.ConnectionPool.connect(isolation_level=None)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def add_users(connection: sqlite3.Connection) -> Callable[..., list[int]]:
+    """
+    Add users named "user<ID>", without hashing a password for each.
+    """
+
+    def add_users(count: int) -> list[int]:
+        first_id = (
+            connection.execute("SELECT MAX(id) FROM users").fetchone()[0] or 0
+        ) + 1
+        bulk.import_table(
+            connection,
+            "users",
+            (
+                {"id": user_id, "username": f"user{user_id}", "password": "x:y:1"}
+                for user_id in range(first_id, first_id + count)
+            ),
+        )
+        return list(range(first_id, first_id + count))
+
+    return add_users
+
+
+@pytest.fixture
+def client() -> FlaskClient:
+    """
+    A test client of the app, logged in as the user with ID 1.
+    """
+
+    client = socialnetwork.app.test_client()
+    with client.session_transaction() as session:
+        session.update(logged_in=True, user_id=1, username="user1")
+
+    return client
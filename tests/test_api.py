@@ -0,0 +1,103 @@
+import sqlite3
+from typing import Callable
+
+import pytest
+from flask.testing import FlaskClient
+
+import socialnetwork
+from socialnetwork.core import post_manager, user_manager
+
+
+@pytest.fixture
+def users(add_users: Callable[..., list[int]]) -> list[int]:
+    return add_users(2)
+
+
+def test_login_is_required(users: list[int]) -> None:
+    response = socialnetwork.app.test_client().get("/api/v1/posts")
+
+    assert response.status_code == 401
+
+
+def test_unchanged_posts_are_not_modified(
+    client: FlaskClient, users: list[int]
+) -> None:
+    post_manager.PostManager().post_message(1, "Hello")
+    response = client.get("/api/v1/posts")
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+
+    cached = client.get(
+        "/api/v1/posts", headers={"If-None-Match": response.headers["ETag"]}
+    )
+
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == response.headers["ETag"]
+    assert cached.data == b""
+
+
+def test_new_posts_change_the_etag(client: FlaskClient, users: list[int]) -> None:
+    post_manager.PostManager().post_message(1, "Hello")
+    etag = client.get("/api/v1/posts").headers["ETag"]
+
+    post_manager.PostManager().post_message(2, "World")
+    response = client.get("/api/v1/posts", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [post["content"] for post in response.json["posts"]] == ["World", "Hello"]
+
+
+def test_new_friends_change_the_friends_feed_etag(
+    client: FlaskClient, users: list[int]
+) -> None:
+    post_manager.PostManager().post_message(2, "Hello")
+    response = client.get("/api/v1/posts?feed=friends")
+    assert response.json["posts"] == []
+
+    user_manager.UserManager().friend_add(1, 2)
+    response = client.get(
+        "/api/v1/posts?feed=friends",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+
+    assert response.status_code == 200
+    assert [post["content"] for post in response.json["posts"]] == ["Hello"]
+
+
+def test_create_post(client: FlaskClient, users: list[int]) -> None:
+    response = client.post("/api/v1/posts", json={"message": "  Hello  "})
+
+    assert response.status_code == 201
+    assert post_manager.PostManager().get_post(response.json["id"])["content"] == (
+        "Hello"
+    )
+    assert client.post("/api/v1/posts", json={"message": " "}).status_code == 400
+    assert client.post("/api/v1/posts", data="Hello").status_code == 400
+
+
+def test_friends_can_be_added_and_removed_twice(
+    client: FlaskClient, users: list[int], connection: sqlite3.Connection
+) -> None:
+    # The friends list is cached before another worker adds the friendship.
+    assert user_manager.UserManager().get_friends_list(1) == []
+    connection.executemany(
+        "INSERT INTO friendships (user_id1, user_id2) VALUES (?, ?)", [(1, 2), (2, 1)]
+    )
+
+    for _ in range(2):
+        response = client.put("/api/v1/friends/2")
+        assert response.status_code == 200
+        assert response.json == {"friend_id": 2, "is_friend": True}
+
+    for _ in range(2):
+        response = client.delete("/api/v1/friends/2")
+        assert response.status_code == 200
+        assert response.json == {"friend_id": 2, "is_friend": False}
+
+    assert connection.execute("SELECT COUNT(*) FROM friendships").fetchone()[0] == 0
+
+
+def test_unknown_friends_are_not_found(client: FlaskClient, users: list[int]) -> None:
+    assert client.put("/api/v1/friends/3").status_code == 404
+    assert client.delete("/api/v1/friends/3").status_code == 404
@@ -0,0 +1,56 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+
+from socialnetwork import asgi
+from socialnetwork.core import metrics
+
+
+async def get(path: str) -> list[dict[str, Any]]:
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [],
+    }
+    messages: list[dict[str, Any]] = []
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict[str, Any]) -> None:
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    return messages
+
+
+def test_wsgi_requests_run_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    requests = metrics.CounterMetric("requests", "The requests.")
+    monkeypatch.setattr(metrics, "requests", requests)
+
+    def slow_view() -> str:
+        time.sleep(0.3)
+        return "Slow"
+
+    monkeypatch.setitem(asgi.flask_app.view_functions, "about", slow_view)
+
+    async def get_all() -> list[list[dict[str, Any]]]:
+        return await asyncio.gather(*(get("/about") for _ in range(4)))
+
+    started = time.monotonic()
+    responses = asyncio.run(get_all())
+
+    assert time.monotonic() - started < 0.3 * 2
+    for messages in responses:
+        assert messages[0]["status"] == 200
+        assert b"".join(message.get("body", b"") for message in messages) == b"Slow"
+
+    # The responses are closed, so their profiles are recorded.
+    assert requests.render()[2:] == [
+        'requests{endpoint="about",method="GET",status="200"} 4'
+    ]
@@ -0,0 +1,23 @@
+import asyncio
+import sqlite3
+from typing import Callable
+
+from socialnetwork.core import async_manager, database_manager, post_manager
+
+
+def test_iterators_are_read_before_the_connection_is_released(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(1)
+    connection.executemany(
+        "INSERT INTO posts (user_id, content) VALUES (1, ?)",
+        [(f"Post {index}",) for index in range(5)],
+    )
+
+    in_use = database_manager.pool.stats()["in_use"]
+
+    posts = asyncio.run(async_manager.AsyncPostManager().iter_posts(limit=None))
+
+    assert database_manager.pool.stats()["in_use"] == in_use
+    assert posts == post_manager.PostManager().get_posts(limit=None)
+    assert len(posts) == 5
@@ -0,0 +1,54 @@
+import sqlite3
+from typing import Callable
+
+from socialnetwork.core import broadcaster, post_manager
+
+
+def test_events_reach_interested_subscribers() -> None:
+    hub = broadcaster.Broadcaster()
+    everyone = hub.subscribe()
+    friends = hub.subscribe(frozenset({2}))
+
+    hub.publish(1, {"id": 1})
+
+    assert everyone.get(timeout=0) == {"id": 1}
+    assert friends.get(timeout=0) is None
+
+
+def test_events_with_the_same_key_are_sent_once() -> None:
+    hub = broadcaster.Broadcaster(max_keys=2)
+    subscription = hub.subscribe()
+
+    assert hub.publish(1, {"id": 1}, key=1)
+    assert not hub.publish(1, {"id": 1}, key=1)
+    hub.publish(1, {"id": 2}, key=2)
+    hub.publish(1, {"id": 3}, key=3)
+    # Only the last `max_keys` keys are remembered.
+    assert hub.publish(1, {"id": 1}, key=1)
+
+    events = [subscription.get(timeout=0) for _ in range(5)]
+    assert events == [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 1}, None]
+
+
+def test_posts_of_other_processes_are_published_once(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(2)
+    subscription = broadcaster.posts.subscribe(frozenset({2}))
+    manager = post_manager.PostManager()
+    local_id = manager.post_message(2, "Written here")
+    # Posts written by another process are only in the database.
+    connection.executemany(
+        "INSERT INTO posts (user_id, content) VALUES (?, ?)",
+        [(1, "Not a friend"), (2, "Written elsewhere")],
+    )
+
+    assert manager.publish_posts(0) == local_id + 2
+    assert manager.publish_posts(local_id + 2) == local_id + 2
+
+    events = [subscription.get(timeout=0) for _ in range(3)]
+    assert [event and event["content"] for event in events] == [
+        "Written here",
+        "Written elsewhere",
+        None,
+    ]
@@ -0,0 +1,114 @@
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from socialnetwork import __main__
+from socialnetwork.core import bulk
+
+TABLES = ("timelines", "hashtags", "mentions", "trending_counts")
+
+
+def snapshot(connection: sqlite3.Connection) -> dict[str, list[tuple]]:
+    return {
+        table: sorted(connection.execute(f"SELECT * FROM {table}")) for table in TABLES
+    }
+
+
+def assert_same_as_rebuild(connection: sqlite3.Connection) -> None:
+    updated = snapshot(connection)
+
+    bulk.rebuild_timelines(connection)
+    bulk.rebuild_tags(connection)
+
+    assert updated == snapshot(connection)
+
+
+def test_seed_is_the_same_as_a_rebuild(connection: sqlite3.Connection) -> None:
+    counts = bulk.seed(connection, 50, 500, 3, "x:y:1", random_seed=1)
+
+    assert counts["posts"] == 500
+    assert connection.execute("SELECT COUNT(*) FROM hashtags").fetchone()[0] > 0
+    assert_same_as_rebuild(connection)
+
+
+def test_imports_only_update_what_they_change(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(3)
+    bulk.import_table(
+        connection,
+        "friendships",
+        [{"user_id1": 1, "user_id2": 2}, {"user_id1": 2, "user_id2": 1}],
+    )
+    bulk.import_table(
+        connection,
+        "posts",
+        [
+            {"user_id": 1, "content": "Hello #world"},
+            {"id": 10, "user_id": 2, "content": "Hi @user1 and @alice"},
+            {"user_id": 3, "content": "Nobody reads this"},
+        ],
+    )
+    bulk.update_imported(connection)
+    assert_same_as_rebuild(connection)
+
+    # A new friendship adds the old posts of the friend, and a new user
+    # gets the old posts mentioning them.
+    bulk.import_table(
+        connection,
+        "friendships",
+        [{"user_id1": 1, "user_id2": 3}, {"user_id1": 3, "user_id2": 1}],
+    )
+    bulk.import_table(connection, "users", [{"username": "alice", "password": "x"}])
+    bulk.update_imported(connection)
+
+    assert (1, 11) in connection.execute("SELECT user_id, post_id FROM timelines")
+    assert (4, 10) in connection.execute("SELECT user_id, post_id FROM mentions")
+    assert_same_as_rebuild(connection)
+
+
+def test_failed_batches_are_not_tracked(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(1)
+    bulk.import_table(connection, "posts", [{"user_id": 1, "content": "Kept"}])
+    try:
+        bulk.import_table(connection, "posts", [{"id": 1, "content": "Duplicate"}])
+
+    except sqlite3.Error:
+        pass
+
+    assert connection.execute("SELECT id FROM imported_posts").fetchall() == [(1,)]
+
+
+def test_failed_imports_update_the_committed_batches(
+    connection: sqlite3.Connection,
+    add_users: Callable[..., list[int]],
+    tmp_path: Path,
+) -> None:
+    add_users(1)
+    path = tmp_path / "posts.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps(record)
+            for record in (
+                {"id": 1, "user_id": 1, "content": "Kept #tag"},
+                {"id": 1, "user_id": 1, "content": "Duplicate"},
+            )
+        )
+    )
+    arguments = argparse.Namespace(
+        table="posts", file=str(path), batch_size=1, rebuild=False, format=None
+    )
+
+    with pytest.raises(sqlite3.IntegrityError):
+        __main__.import_command(arguments)
+
+    assert connection.execute("SELECT post_id FROM timelines").fetchall() == [(1,)]
+    assert connection.execute("SELECT tag, post_id FROM hashtags").fetchall() == [
+        ("tag", 1)
+    ]
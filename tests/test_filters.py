@@ -0,0 +1,159 @@
+import itertools
+import re
+import sqlite3
+from typing import Any, Optional
+
+import pytest
+
+from socialnetwork.core import bulk, post_manager
+
+OPTIONS: dict[str, dict[str, Any]] = {
+    "author": {"author": "user3"},
+    "since": {"since": "2024-01-10"},
+    "until": {"until": "2024-01-20"},
+    "friends_of": {"friends_of": 1},
+    "ascending": {"ascending": True},
+}
+COMBINATIONS = [
+    names
+    for count in range(len(OPTIONS) + 2)
+    for names in itertools.combinations([*OPTIONS, "cursor"], count)
+]
+
+
+def make_filters(names: tuple[str, ...]) -> post_manager.PostFilters:
+    return post_manager.PostFilters(
+        **{key: value for name in names for key, value in OPTIONS.get(name, {}).items()}
+    )
+
+
+@pytest.fixture
+def posts(connection: sqlite3.Connection) -> list[dict[str, Any]]:
+    bulk.seed(connection, 10, 300, 2, "x:y:1", random_seed=1)
+    # Spread the posts over January 2024, several per second.
+    connection.execute(
+        """
+        UPDATE posts
+        SET timestamp = datetime('2024-01-01', (id / 3 * 9000) || ' seconds')
+        """
+    )
+    # The timelines and tags copy the timestamps of their posts.
+    bulk.rebuild_timelines(connection)
+    bulk.rebuild_tags(connection)
+    return [
+        {
+            "id": row[0],
+            "user_id": row[1],
+            "username": row[2],
+            "content": row[3],
+            "timestamp": row[4],
+        }
+        for row in connection.execute(
+            """
+            SELECT posts.id, posts.user_id, users.username,
+                   posts.content, posts.timestamp
+            FROM posts
+            INNER JOIN users
+            ON posts.user_id = users.id
+            """
+        )
+    ]
+
+
+@pytest.mark.parametrize("names", COMBINATIONS, ids=lambda names: ",".join(names))
+def test_query_plans_use_indexes(
+    posts: list[dict[str, Any]], names: tuple[str, ...]
+) -> None:
+    filters = make_filters(names)
+    cursor = ("2024-01-15 00:00:00", 150) if "cursor" in names else None
+
+    plan = post_manager.PostManager().explain_posts(cursor=cursor, filters=filters)
+
+    assert not [step for step in plan if re.match(r"SCAN \w+$", step)], plan
+    assert all(
+        re.match(r"(SEARCH|SCAN) posts USING (COVERING )?INDEX ", step)
+        for step in plan
+        if re.match(r"(SEARCH|SCAN) posts\b", step)
+    ), plan
+    # The posts of each friend are read through (user_id, timestamp), and
+    # SQLite cannot merge the ranges in order, so only those are sorted.
+    if filters.friends_of is None:
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+
+@pytest.mark.parametrize("names", COMBINATIONS, ids=lambda names: ",".join(names))
+def test_filtered_pages(
+    connection: sqlite3.Connection,
+    posts: list[dict[str, Any]],
+    names: tuple[str, ...],
+) -> None:
+    filters = make_filters(names)
+    friends = {1} | {
+        row[0]
+        for row in connection.execute(
+            "SELECT user_id2 FROM friendships WHERE user_id1 = 1"
+        )
+    }
+    # Cursors point at a post, like those of `encode_cursor()`.
+    middle = next(post for post in posts if post["id"] == 150)
+    cursor: Optional[post_manager.Cursor] = (
+        (middle["timestamp"], middle["id"]) if "cursor" in names else None
+    )
+    expected = [
+        {key: post[key] for key in ("id", "username", "content", "timestamp")}
+        for post in sorted(
+            posts,
+            key=lambda post: (post["timestamp"], post["id"]),
+            reverse=not filters.ascending,
+        )
+        if (filters.author is None or post["username"] == filters.author)
+        and (filters.since is None or post["timestamp"] >= filters.since)
+        and (filters.until is None or post["timestamp"] < filters.until)
+        and (filters.friends_of is None or post["user_id"] in friends)
+        and (
+            cursor is None
+            or (
+                (post["timestamp"], post["id"]) > cursor
+                if filters.ascending
+                else (post["timestamp"], post["id"]) < cursor
+            )
+        )
+    ]
+
+    manager = post_manager.PostManager()
+    assert manager.get_posts(cursor=cursor, limit=None, filters=filters) == expected
+    assert manager.get_posts(cursor=cursor, limit=5, filters=filters) == expected[:5]
+
+
+def test_parse_filters() -> None:
+    filters = post_manager.parse_filters(
+        {
+            "author": "alice",
+            "since": "2024-01-01",
+            "until": "2024-01-31",
+            "feed": "friends",
+            "order": "asc",
+        },
+        7,
+    )
+
+    # Both dates are inclusive.
+    assert filters == post_manager.PostFilters(
+        "alice", "2024-01-01", "2024-02-01", 7, True
+    )
+    assert post_manager.parse_filters({"author": "", "order": ""}, 7) == (
+        post_manager.PostFilters()
+    )
+
+
+@pytest.mark.parametrize(
+    "args", [{"order": "sideways"}, {"since": "yesterday"}, {"until": "2024-13-01"}]
+)
+def test_parse_filters_rejects_malformed_parameters(args: dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        post_manager.parse_filters(args, 7)
+
+
+def test_newsfeed_rejects_malformed_filters(client: Any) -> None:
+    assert client.get("/?order=sideways").status_code == 400
+    assert client.get("/api/v1/posts?since=yesterday").status_code == 400
@@ -0,0 +1,42 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import pytest
+
+from socialnetwork.core import friend_graph, info, user_manager
+
+
+def test_only_one_thread_reloads_the_graph(
+    add_users: Callable[..., list[int]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    add_users(2)
+    user_manager.UserManager().friend_add(1, 2)
+    loads: list[float] = []
+    load = friend_graph.FriendGraph.load
+
+    def slow_load(self: friend_graph.FriendGraph, database: sqlite3.Connection) -> None:
+        loads.append(time.monotonic())
+        time.sleep(0.2)
+        load(self, database)
+
+    monkeypatch.setattr(friend_graph.FriendGraph, "load", slow_load)
+    monkeypatch.setattr(info.Server, "friend_graph_ttl", 0.1)
+    barrier = threading.Barrier(8)
+
+    def get_graph(_: int) -> bool:
+        barrier.wait()
+        return user_manager.UserManager().get_friend_graph().are_friends(1, 2)
+
+    # The first load makes everyone wait, but a reload is left to one thread.
+    for _ in range(2):
+        time.sleep(0.1)
+        with ThreadPoolExecutor(8) as executor:
+            started = time.monotonic()
+            assert all(executor.map(get_graph, range(8)))
+
+        assert len(loads) == 1
+        assert time.monotonic() - started < 0.2 * 2
+        loads.clear()
@@ -0,0 +1,73 @@
+from typing import Callable
+
+import pytest
+from flask.testing import FlaskClient
+
+import socialnetwork
+from socialnetwork.core import info, metrics, post_manager
+
+
+@pytest.fixture
+def requests(monkeypatch: pytest.MonkeyPatch) -> metrics.CounterMetric:
+    counter = metrics.CounterMetric("requests", "The requests.")
+    monkeypatch.setattr(metrics, "requests", counter)
+    return counter
+
+
+def test_streamed_responses_are_recorded_when_sent(
+    client: FlaskClient,
+    add_users: Callable[..., list[int]],
+    requests: metrics.CounterMetric,
+) -> None:
+    add_users(1)
+    post_manager.PostManager().post_message(1, "Hello")
+
+    response = client.get("/?author=user1", buffered=False)
+    assert requests.render()[2:] == []
+
+    assert b"Hello" in b"".join(response.response)
+    response.close()
+
+    assert requests.render()[2:] == [
+        'requests{endpoint="index",method="GET",status="200"} 1'
+    ]
+    assert metrics.current_request() is None
+
+
+def test_event_streams_are_not_timed(
+    monkeypatch: pytest.MonkeyPatch,
+    requests: metrics.CounterMetric,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    request_duration = metrics.HistogramMetric("duration", "The duration.", [1.0])
+    monkeypatch.setattr(metrics, "request_duration", request_duration)
+    monkeypatch.setattr(info.Server, "slow_request_threshold", 0.0)
+    profile = metrics.start_request()
+    for _ in range(info.Server.n_plus_one_threshold):
+        metrics.record_query("SELECT 1", 0.0)
+
+    socialnetwork.record_profile(
+        profile, "api.post_events", "GET", "/api/v1/posts/events", "200", False
+    )
+
+    assert requests.render()[2:] == [
+        'requests{endpoint="api.post_events",method="GET",status="200"} 1'
+    ]
+    assert request_duration.render()[2:] == []
+    assert "Possible N+1 queries" in caplog.text
+    assert "Slow request" not in caplog.text
+
+
+def test_queued_writes_are_recorded_in_the_request_profile(
+    monkeypatch: pytest.MonkeyPatch, add_users: Callable[..., list[int]]
+) -> None:
+    monkeypatch.setattr(info.Server, "database_write_queue", True)
+    add_users(1)
+    profile = metrics.start_request()
+
+    post_manager.PostManager().post_message(1, "Hello")
+
+    assert metrics.finish_request() is profile
+    statements = [sql for sql, _ in profile.queries]
+    assert any(sql.startswith("INSERT INTO posts") for sql in statements)
+    assert "COMMIT" in statements
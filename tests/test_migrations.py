@@ -0,0 +1,82 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from socialnetwork.core import database_manager, migrations
+
+
+def test_migrate_is_idempotent() -> None:
+    manager = database_manager.DatabaseManager()
+
+    assert manager.get_schema_version() == migrations.MIGRATIONS[-1].version
+    assert manager.migrate() == []
+
+
+def test_duplicate_usernames_stop_the_unique_index(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    old_database = tmp_path / "old.db"
+    connection = sqlite3.connect(old_database, isolation_level=None)
+    for statement in migrations.MIGRATIONS[0].statements:
+        connection.execute(statement)
+
+    connection.execute("PRAGMA user_version = 1")
+    connection.executemany(
+        "INSERT INTO users (username, password, is_admin, welcomed) VALUES (?, '', 0, 0)",
+        [("alice",), ("bob",), ("alice",)],
+    )
+    connection.close()
+
+    database_manager.pool.close_all()
+    monkeypatch.setattr(database_manager.info.Filepath, "database", old_database)
+    manager = database_manager.DatabaseManager()
+    with pytest.raises(migrations.MigrationError, match="alice"):
+        manager.migrate()
+
+    # The failed migration is rolled back, and can be retried once fixed.
+    assert manager.get_schema_version() == 1
+    manager.database.execute("UPDATE users SET username = 'alice2' WHERE id = 3")
+    manager.database.commit()
+    assert manager.migrate()[0] == 2
+
+
+def test_tags_are_backfilled_with_the_timestamps_of_their_posts(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    old_database = tmp_path / "old.db"
+    connection = sqlite3.connect(old_database, isolation_level=None)
+    for migration in migrations.MIGRATIONS[:6]:
+        for statement in migration.statements:
+            connection.execute(statement)
+
+    connection.execute("PRAGMA user_version = 6")
+    connection.executemany(
+        "INSERT INTO users (username, password, is_admin, welcomed) VALUES (?, '', 0, 0)",
+        [("alice",), ("bob",)],
+    )
+    connection.executemany(
+        "INSERT INTO posts (user_id, content, timestamp) VALUES (?, ?, ?)",
+        [
+            (1, "#Old #old news for @bob and @nobody", "2020-01-01"),
+            (2, "Plain", "2019-01-01"),
+        ],
+    )
+    connection.execute("INSERT INTO timelines (user_id, post_id) VALUES (1, 1)")
+    connection.close()
+
+    database_manager.pool.close_all()
+    monkeypatch.setattr(database_manager.info.Filepath, "database", old_database)
+    manager = database_manager.DatabaseManager()
+    assert manager.migrate()[:2] == [7, 8]
+
+    database = manager.database
+    assert database.execute("SELECT * FROM timelines").fetchall() == [
+        (1, "2020-01-01", 1)
+    ]
+    assert database.execute("SELECT * FROM hashtags").fetchall() == [
+        ("old", "2020-01-01", 1)
+    ]
+    assert database.execute("SELECT * FROM mentions").fetchall() == [
+        (2, "2020-01-01", 1)
+    ]
@@ -0,0 +1,67 @@
+import sqlite3
+from typing import Callable, Optional
+
+import pytest
+from flask.testing import FlaskClient
+
+from socialnetwork.core import post_manager
+
+
+def add_posts(connection: sqlite3.Connection, timestamps: list[str]) -> None:
+    connection.executemany(
+        "INSERT INTO posts (user_id, content, timestamp) VALUES (1, ?, ?)",
+        [(f"post {index}", timestamp) for index, timestamp in enumerate(timestamps)],
+    )
+
+
+def read_pages(filters: post_manager.PostFilters, page_size: int) -> list[int]:
+    manager = post_manager.PostManager()
+    post_ids: list[int] = []
+    cursor: Optional[post_manager.Cursor] = None
+    while True:
+        page = manager.get_posts(cursor=cursor, limit=page_size, filters=filters)
+        post_ids.extend(post["id"] for post in page)
+        if len(page) < page_size:
+            return post_ids
+
+        cursor = post_manager.decode_cursor(post_manager.encode_cursor(page[-1]))
+
+
+def test_cursor_round_trip() -> None:
+    cursor = post_manager.encode_cursor({"id": 7, "timestamp": "2024-01-02 03:04:05"})
+
+    assert post_manager.decode_cursor(cursor) == ("2024-01-02 03:04:05", 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "no separator", "2024-01-01|not a number"])
+def test_malformed_cursors_are_rejected(cursor: str) -> None:
+    with pytest.raises(ValueError):
+        post_manager.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 11, 20])
+@pytest.mark.parametrize("ascending", [False, True])
+def test_pages_cover_every_post_once(
+    connection: sqlite3.Connection,
+    add_users: Callable[..., list[int]],
+    page_size: int,
+    ascending: bool,
+) -> None:
+    add_users(1)
+    # Posts of the same second are ordered by ID, so no page boundary can
+    # skip or repeat them.
+    add_posts(connection, ["2024-01-01 00:00:00"] * 5 + ["2024-01-02 00:00:00"] * 6)
+    expected = list(range(1, 12)) if ascending else list(range(11, 0, -1))
+
+    post_ids = read_pages(post_manager.PostFilters(ascending=ascending), page_size)
+
+    assert post_ids == expected
+
+
+def test_newsfeed_rejects_a_malformed_cursor(
+    client: FlaskClient, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(1)
+
+    assert client.get("/?cursor=invalid").status_code == 400
+    assert client.get("/api/v1/posts?cursor=invalid").status_code == 400
@@ -0,0 +1,72 @@
+import sqlite3
+from typing import Callable
+
+import pytest
+
+from socialnetwork.core import post_manager
+
+
+def search(query: str) -> list[int]:
+    return [post["id"] for post in post_manager.PostManager().search_posts(query)]
+
+
+@pytest.fixture
+def posts(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> sqlite3.Connection:
+    add_users(1)
+    connection.executemany(
+        "INSERT INTO posts (user_id, content) VALUES (1, ?)",
+        [("Hello world",), ("Goodbye world",), ("Something else",)],
+    )
+    return connection
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("", None), ("  !? ", None), ("hello", '"hello"*'), ("a b", '"a"* "b"*')],
+)
+def test_match_query(query: str, expected: str | None) -> None:
+    assert post_manager.to_match_query(query) == expected
+
+
+def test_inserted_posts_are_found(posts: sqlite3.Connection) -> None:
+    assert sorted(search("world")) == [1, 2]
+    # Words are matched by prefix.
+    assert search("hel") == [1]
+    assert search("hello goodbye") == []
+    assert search("!?") == []
+
+
+def test_updated_posts_are_reindexed(posts: sqlite3.Connection) -> None:
+    posts.execute("UPDATE posts SET content = 'Hello moon' WHERE id = 1")
+
+    assert search("world") == [2]
+    assert search("moon") == [1]
+
+
+def test_deleted_posts_are_removed_from_the_index(posts: sqlite3.Connection) -> None:
+    posts.execute("DELETE FROM posts WHERE id = 2")
+
+    assert search("world") == [1]
+    assert search("goodbye") == []
+
+
+def test_posted_messages_are_found(posts: sqlite3.Connection) -> None:
+    post_id = post_manager.PostManager().post_message(1, "A brand new post")
+
+    assert search("brand") == [post_id]
+
+
+def test_search_pages_follow_the_rank(posts: sqlite3.Connection) -> None:
+    manager = post_manager.PostManager()
+    first_page = manager.search_posts("world", limit=1)
+    cursor = post_manager.decode_cursor(
+        post_manager.encode_cursor(first_page[0], "rank")
+    )
+
+    second_page = manager.search_posts(
+        "world", limit=1, cursor=(float(cursor[0]), cursor[1])
+    )
+
+    assert sorted(post["id"] for post in first_page + second_page) == [1, 2]
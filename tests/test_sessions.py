@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+import socialnetwork
+from socialnetwork.core import session_store
+
+SERVER_SIDE_BACKENDS = ["memory", "sqlite"]
+
+
+@pytest.mark.parametrize(
+    "backend, interface",
+    [
+        ("memory", session_store.MemorySessionInterface),
+        ("sqlite", session_store.SQLiteSessionInterface),
+        ("cookie", session_store.SecureCookieSessionInterface),
+    ],
+)
+def test_backends(backend: str, interface: type) -> None:
+    assert isinstance(session_store.get_session_interface(backend), interface)
+
+
+def test_unknown_backend() -> None:
+    with pytest.raises(ValueError):
+        session_store.get_session_interface("redis")
+
+
+def test_stores_must_implement_every_method() -> None:
+    class IncompleteSessionInterface(session_store.ServerSideSessionInterface):
+        def load(self, sid: str) -> None:
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteSessionInterface()  # type: ignore[abstract]
+
+
+@pytest.mark.parametrize("backend", SERVER_SIDE_BACKENDS)
+def test_store_load_and_delete(backend: str) -> None:
+    store = session_store.get_session_interface(backend)
+    assert isinstance(store, session_store.ServerSideSessionInterface)
+    expires = time.time() + 60
+
+    store.store("sid", {"user_id": 1}, expires)
+    assert store.load("sid") == ({"user_id": 1}, expires)
+
+    store.delete("sid")
+    assert store.load("sid") is None
+
+
+def test_memory_store_evicts_the_least_recently_used() -> None:
+    store = session_store.MemorySessionInterface(max_sessions=2)
+    expires = time.time() + 60
+    store.store("a", {}, expires)
+    store.store("b", {}, expires)
+    store.load("a")
+
+    store.store("c", {}, expires)
+
+    assert store.load("a") is not None
+    assert store.load("b") is None
+    assert store.load("c") is not None
+
+
+@pytest.mark.parametrize("backend", SERVER_SIDE_BACKENDS + ["cookie"])
+def test_sessions_persist_between_requests(
+    backend: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        socialnetwork.app,
+        "session_interface",
+        session_store.get_session_interface(backend),
+    )
+    client = socialnetwork.app.test_client()
+    with client.session_transaction() as session:
+        session.update(logged_in=True, user_id=1, username="user1")
+
+    with client.session_transaction() as session:
+        assert session["username"] == "user1"
+        session.clear()
+
+    with client.session_transaction() as session:
+        assert "username" not in session
+
+
+@pytest.mark.parametrize("backend", SERVER_SIDE_BACKENDS)
+def test_expired_sessions_are_not_opened(
+    backend: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = session_store.get_session_interface(backend)
+    monkeypatch.setattr(socialnetwork.app, "session_interface", store)
+    client = socialnetwork.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+
+    cookie = client.get_cookie(store.get_cookie_name(socialnetwork.app))
+    assert cookie is not None
+    store.store(cookie.value, {"user_id": 1}, time.time() - 1)  # type: ignore[attr-defined]
+
+    with client.session_transaction() as session:
+        assert "user_id" not in session
@@ -0,0 +1,122 @@
+import sqlite3
+from typing import Callable
+
+import pytest
+
+from socialnetwork.core import bulk, info, post_manager, user_manager
+
+
+def timeline_rows(connection: sqlite3.Connection, user_id: int) -> list[int]:
+    return [
+        row[0]
+        for row in connection.execute(
+            "SELECT post_id FROM timelines WHERE user_id = ? ORDER BY post_id",
+            (user_id,),
+        )
+    ]
+
+
+def timeline(user_id: int) -> list[int]:
+    return [post["id"] for post in post_manager.PostManager().get_timeline(user_id)]
+
+
+@pytest.fixture
+def users(add_users: Callable[..., list[int]]) -> list[int]:
+    return add_users(3)
+
+
+def test_posts_are_fanned_out_to_friends(
+    connection: sqlite3.Connection, users: list[int]
+) -> None:
+    user_manager.UserManager().friend_add(1, 2)
+
+    post_id = post_manager.PostManager().post_message(1, "Hello")
+
+    assert timeline_rows(connection, 1) == [post_id]
+    assert timeline_rows(connection, 2) == [post_id]
+    assert timeline_rows(connection, 3) == []
+    assert timeline(2) == [post_id]
+
+
+def test_befriending_backfills_recent_posts(
+    connection: sqlite3.Connection,
+    users: list[int],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(info.Server, "timeline_backfill", 2)
+    manager = post_manager.PostManager()
+    post_ids = [manager.post_message(1, f"Post {index}") for index in range(3)]
+    other_id = manager.post_message(2, "Other")
+
+    user_manager.UserManager().friend_add(1, 2)
+
+    assert timeline_rows(connection, 2) == sorted(post_ids[1:] + [other_id])
+    assert timeline_rows(connection, 1) == sorted(post_ids + [other_id])
+    assert timeline_rows(connection, 3) == []
+
+
+def test_unfriending_removes_posts(
+    connection: sqlite3.Connection, users: list[int]
+) -> None:
+    manager = user_manager.UserManager()
+    manager.friend_add(1, 2)
+    manager.friend_add(1, 3)
+    post_id = post_manager.PostManager().post_message(2, "Hello")
+    other_id = post_manager.PostManager().post_message(3, "Other")
+
+    manager.friend_remove(1, 2)
+
+    assert timeline_rows(connection, 1) == [other_id]
+    assert timeline_rows(connection, 2) == [post_id]
+    assert timeline(1) == [other_id]
+
+
+def test_popular_users_are_read_on_demand(
+    connection: sqlite3.Connection,
+    users: list[int],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(info.Server, "timeline_fanout_limit", 1)
+    manager = user_manager.UserManager()
+    manager.friend_add(1, 2)
+    manager.friend_add(1, 3)
+
+    post_id = post_manager.PostManager().post_message(1, "Hello")
+
+    # The post is only stored in the author's timeline, but still shown to friends.
+    assert timeline_rows(connection, 2) == []
+    assert timeline_rows(connection, 3) == []
+    assert timeline(2) == [post_id]
+    assert timeline(3) == [post_id]
+
+
+def test_imported_posts_are_paged_by_timestamp(
+    connection: sqlite3.Connection, users: list[int]
+) -> None:
+    user_manager.UserManager().friend_add(1, 2)
+    manager = post_manager.PostManager()
+    new_id = manager.post_message(1, "New #tag @user1")
+    # Imported posts get higher IDs than the posts already written, but may be older.
+    bulk.import_table(
+        connection,
+        "posts",
+        [
+            {"user_id": 2, "content": "Old #tag @user1", "timestamp": "2020-01-01"},
+            {"user_id": 1, "content": "Older #tag @user1", "timestamp": "2019-01-01"},
+        ],
+    )
+    bulk.update_imported(connection)
+    old_id, older_id = new_id + 1, new_id + 2
+
+    for pages in (
+        lambda cursor: manager.get_timeline(2, cursor, limit=1),
+        lambda cursor: manager.get_hashtag_posts("tag", cursor, limit=1),
+        lambda cursor: manager.get_mention_posts("user1", cursor, limit=1),
+    ):
+        cursor = None
+        post_ids = []
+        while page := pages(cursor):
+            post_ids.extend(post["id"] for post in page)
+            cursor = post_manager.decode_cursor(post_manager.encode_cursor(page[-1]))
+
+        assert post_ids == [new_id, old_id, older_id]
@@ -0,0 +1,187 @@
+import sqlite3
+import time
+from typing import Any, Callable
+
+import pytest
+from flask.testing import FlaskClient
+
+from socialnetwork.core import bulk, info, post_manager, trending
+
+
+def test_extract_names() -> None:
+    content = "#Python and #python, not a#b or ##x, thanks @alice @alice @bob!"
+
+    assert trending.extract_hashtags(content) == ["python"]
+    assert trending.extract_mentions(content) == ["alice", "bob"]
+
+
+def test_counts_leave_the_window() -> None:
+    counter = trending.SlidingWindowCounter(3)
+    counter.add("a", 10)
+    counter.add("b", 11, 2)
+    counter.add("a", 12)
+    assert dict(counter.top(5)) == {"a": 2, "b": 2}
+
+    # Bucket 10 is outside the window ending at 13.
+    counter.add("b", 13)
+    assert counter.top(5) == [("b", 3), ("a", 1)]
+
+    counter.expire(15)
+    assert counter.top(5) == [("b", 1)]
+
+    counter.expire(16)
+    assert counter.top(5) == []
+    assert not counter.totals
+
+
+def test_late_counts() -> None:
+    counter = trending.SlidingWindowCounter(3)
+    counter.add("a", 12)
+    counter.add("b", 11)
+    # Too old for the window.
+    counter.add("c", 9)
+
+    assert dict(counter.top(5)) == {"a": 1, "b": 1}
+
+    counter.expire(14)
+    assert counter.top(5) == [("a", 1)]
+
+
+def test_trends_of_each_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolution = info.Server.trending_resolution
+    trends = trending.Trends((resolution, 3 * resolution))
+    now = 1000 * resolution
+    monkeypatch.setattr(trending.time, "time", lambda: now)
+    trends.record(["old"], ["alice"], bucket=998)
+    trends.record(["new", "old"], [])
+
+    assert dict(trends.top(trending.HASHTAG, resolution)) == {"new": 1, "old": 1}
+    assert trends.top(trending.HASHTAG, 3 * resolution) == [("old", 2), ("new", 1)]
+    assert trends.top(trending.MENTION, 3 * resolution) == [("alice", 1)]
+
+    now += 2 * resolution
+    assert trends.top(trending.HASHTAG, resolution) == []
+    assert dict(trends.top(trending.HASHTAG, 3 * resolution)) == {"new": 1, "old": 1}
+    assert trends.top(trending.MENTION, 3 * resolution) == []
+
+
+def test_load_keeps_the_unsaved_counts() -> None:
+    trends = trending.Trends()
+    bucket = trending.current_bucket()
+    trends.record(["local"], [], bucket=bucket)
+
+    trends.load([(bucket, trending.HASHTAG, "saved", 2), (bucket, "other", "x", 1)])
+
+    window = max(info.Server.trending_windows)
+    assert trends.top(trending.HASHTAG, window) == [("saved", 2), ("local", 1)]
+    assert trends.take_pending() == [(bucket, trending.HASHTAG, "local", 1)]
+    assert trends.take_pending() == []
+
+
+@pytest.fixture
+def mentions(add_users: Callable[..., list[int]]) -> list[int]:
+    add_users(3)
+    manager = post_manager.PostManager()
+    return [
+        manager.post_message(1, "Hi @user2"),
+        manager.post_message(3, "Hello @user2 and @user1 #greetings"),
+        manager.post_message(1, "Nobody here, @nobody"),
+        manager.post_message(3, "Bye @user2"),
+    ]
+
+
+def test_mention_pages(mentions: list[int]) -> None:
+    manager = post_manager.PostManager()
+
+    first_page = manager.get_mention_posts("@user2", limit=2)
+    cursor = post_manager.decode_cursor(post_manager.encode_cursor(first_page[-1]))
+    second_page = manager.get_mention_posts("user2", cursor=cursor, limit=2)
+
+    assert [post["id"] for post in first_page + second_page] == [
+        mentions[3],
+        mentions[1],
+        mentions[0],
+    ]
+    assert [post["id"] for post in manager.get_mention_posts("user1")] == [mentions[1]]
+    assert manager.get_mention_posts("nobody") == []
+
+
+def test_trending_mentions_link_to_their_posts(
+    client: FlaskClient, mentions: list[int]
+) -> None:
+    page = client.get("/").get_data(as_text=True)
+    assert 'href="/?mentions=user2"' in page
+
+    page = client.get("/?mentions=user2").get_data(as_text=True)
+    assert "Posts mentioning @user2" in page
+    assert "Bye @user2" in page
+    assert "Nobody here" not in page
+
+    response = client.get("/api/v1/posts?mentions=user1")
+    assert [post["id"] for post in response.json["posts"]] == [mentions[1]]
+
+    response = client.get("/api/v1/trending")
+    assert response.json["mentions"][0] == {"username": "user2", "count": 3}
+    assert response.json["hashtags"] == [{"tag": "greetings", "count": 1}]
+
+
+def saved_counts(connection: sqlite3.Connection) -> dict[str, int]:
+    return dict(connection.execute("SELECT name, count FROM trending_counts"))
+
+
+def test_trends_are_saved_in_the_background(
+    client: FlaskClient,
+    connection: sqlite3.Connection,
+    add_users: Callable[..., list[int]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    add_users(1)
+
+    def fail(*_: Any) -> None:
+        raise sqlite3.OperationalError("disk I/O error")
+
+    # Pages only read the counts in memory.
+    save_trends = post_manager.PostManager._save_trends
+    monkeypatch.setattr(post_manager.PostManager, "_save_trends", fail)
+    post_manager.PostManager().post_message(1, "#hello")
+    assert client.get("/").status_code == 200
+    assert client.get("/api/v1/trending").json["hashtags"] == [
+        {"tag": "hello", "count": 1}
+    ]
+
+    # The counts of a failed save are saved with the next ones.
+    with pytest.raises(sqlite3.OperationalError):
+        post_manager.PostManager().sync_trends()
+
+    monkeypatch.setattr(post_manager.PostManager, "_save_trends", save_trends)
+    monkeypatch.setattr(info.Server, "trending_sync_interval", 0.01)
+    # Restart the thread with the shorter interval.
+    post_manager.trends_sync.stop()
+    post_manager.PostManager().post_message(1, "#hello again")
+    deadline = time.monotonic() + 5
+    while not saved_counts(connection) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert saved_counts(connection) == {"hello": 2}
+
+
+def test_rebuilds_discard_the_unsaved_counts(
+    connection: sqlite3.Connection, add_users: Callable[..., list[int]]
+) -> None:
+    add_users(1)
+    manager = post_manager.PostManager()
+    manager.post_message(1, "#hello")
+    manager.sync_trends()
+    manager.post_message(1, "#hello")
+
+    # The rebuild counts both posts, so the unsaved count is not added again.
+    bulk.rebuild_tags(connection)
+    manager.sync_trends()
+
+    assert saved_counts(connection) == {"hello": 2}
+    window = max(info.Server.trending_windows)
+    assert manager.get_trending(trending.HASHTAG, window) == [("hello", 2)]
+
+    manager.post_message(1, "#hello")
+    manager.sync_trends()
+    assert saved_counts(connection) == {"hello": 3}